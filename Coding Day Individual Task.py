@@ -1,128 +1,94 @@
 import flet as ft
+import math
+import os
 import threading
-import random
 import time
-from datetime import datetime
-from typing import Any, Dict
+from array import array
+from collections import deque
 
-# ---------------------------------------------------------------------
-# 1–2. DEVICE DICTIONARY + ALAP ADATOK
-# ---------------------------------------------------------------------
+import metrics
+from energy import day_bounds, month_bounds
+from power_accounting import power_draw
+from render_scheduler import ChangeCoalescer, RenderScheduler
+from smart_home_engine import (
+    VALUE_FIELDS,
+    SessionLink,
+    add_log,
+    devices,
+    energy_ledger,
+    event_store,
+    export_history,
+    format_event,
+    global_pubsub,
+    power_series,
+    rebuild_energy,
+    recent_events,
+    start_simulator,
+    stop_simulator,
+)
 
-devices: Dict[str, Dict[str, Any]] = {
-    "light1": {
-        "name": "Living Room Light",
-        "type": "light",
-        "state": False,
-        "power_w": 60,
-        "recent_actions": [],
-    },
-    "door1": {
-        "name": "Front Door",
-        "type": "door",
-        "state": True,    # True = LOCKED
-        "power_w": 0,
-        "recent_actions": [],
-    },
-    "thermo1": {
-        "name": "Thermostat",
-        "type": "thermo",
-        "temp": 22.0,
-        "power_w": 120,
-        "recent_actions": [],
-    },
-    "fan1": {
-        "name": "Ceiling Fan",
-        "type": "fan",
-        "speed": 0,
-        "power_w": 50,
-        "recent_actions": [],
-    },
-}
-
-event_log: list[dict] = []
 
 # ---------------------------------------------------------------------
-# 6. EGYSZERŰ PUB/SUB RENDSZER
+# 10. VALÓS IDEJŰ POWER LINE CHART
 # ---------------------------------------------------------------------
 
-class PubSub:
-    def __init__(self):
-        self.listeners = []
+def lttb(buf, start: int, n: int, threshold: int) -> list[int]:
+    """
+    Largest-Triangle-Three-Buckets lebontás: n mintából `threshold` darab
+    index, amely a görbe alakját megtartja. A minták a `buf` körpufferben
+    vannak `start`-tól; x tengelynek a (logikai) index számít.
+    """
+    if threshold >= n or threshold < 3:
+        return list(range(n))
 
-    def subscribe(self, callback):
-        self.listeners.append(callback)
+    size = len(buf)
+    selected = [0]
+    bucket = (n - 2) / (threshold - 2)
+    a, ay = 0, buf[start % size]
+    for b in range(threshold - 2):
+        lo = int(b * bucket) + 1
+        hi = int((b + 1) * bucket) + 1
 
-    def publish(self, data: dict):
-        for fn in self.listeners:
-            fn(data)
+        # A következő vödör átlaga a háromszög harmadik csúcsa
+        nxt_hi = min(int((b + 2) * bucket) + 1, n)
+        avg_x = (hi + nxt_hi - 1) / 2
+        avg_y = sum(buf[(start + i) % size] for i in range(hi, nxt_hi)) / (nxt_hi - hi)
 
-global_pubsub = PubSub()
+        best, best_y, best_area = lo, 0.0, -1.0
+        for i in range(lo, hi):
+            y = buf[(start + i) % size]
+            area = abs((a - avg_x) * (y - ay) - (a - i) * (avg_y - ay))
+            if area > best_area:
+                best, best_y, best_area = i, y, area
+        selected.append(best)
+        a, ay = best, best_y
+    selected.append(n - 1)
+    return selected
 
 
-# ---------------------------------------------------------------------
-# 9. ASYNC ESZKÖZ / POWER SZIMULÁTOR (HÁTTÉRTASKOK)
-# ---------------------------------------------------------------------
-
-def simulate_power():
-    """Háttérben fut: időnként 'mért' teljesítményt küld (5 mp-enként)."""
-    while True:
-        simulated_value = random.randint(80, 160)
-        global_pubsub.publish({"type": "power", "value": simulated_value})
-        time.sleep(5) 
+def nice_ceiling(v: float) -> float:
+    """A v-nél nem kisebb legkisebb 1 / 2 / 5 × 10^k érték (tengelyhatárnak)."""
+    if v <= 0:
+        return 1.0
+    scale = 10.0 ** math.floor(math.log10(v))
+    for step in (1, 2, 5, 10):
+        if step * scale >= v:
+            return step * scale
+    return 10 * scale
 
 
-def simulate_device_changes(page: ft.Page):
+class PowerChart(ft.LineChart):
     """
-    Háttértask: Véletlenszerűen változtatja a termosztát és a ventilátor
-    értékeit 5 másodpercenként.
+    Folyamatos power history line chart. Címkék nélkül a zsúfoltság elkerüléséért.
+    A minták körpufferben vannak, a pontobjektumok helyben frissülnek;
+    ha az ablak több mintát tart, mint amennyi pont kirajzolható,
+    LTTB-vel lebontjuk `max_points` pontra. Az add_value() O(1); a
+    pontok a következő sync()-kor (rajzolás előtt) frissülnek; az y
+    tengely ilyenkor igazodik az ablak csúcsához (0-tól, kerek felső
+    határral), mert a ház összfogyasztása eszközszámtól függően bármekkora.
     """
-    while True:
-        time.sleep(5) 
-        
-        # --- Termosztát ---
-        thermo = devices["thermo1"]
-        current_temp = thermo["temp"]
-        change = random.choice([-0.5, 0.0, 0.5])
-        new_temp = round(current_temp + change, 1)
-        new_temp = max(16.0, min(30.0, new_temp))
-        
-        if new_temp != current_temp:
-             add_log("thermo1", "Auto Change", f"Temp changed to {new_temp:.1f} °C")
-             thermo["temp"] = new_temp
-             
-        # --- Ventilátor ---
-        fan = devices["fan1"]
-        current_speed = fan["speed"]
-        change = random.choice([-1, 0, 1])
-        new_speed = current_speed + change
-        new_speed = max(0, min(3, new_speed))
-        
-        if new_speed != current_speed:
-            add_log("fan1", "Auto Change", f"Speed changed to {new_speed}")
-            fan["speed"] = new_speed
-            
-        if page.route == "/" or page.route.startswith("/details/"):
-             page.update()
-
 
-def start_simulator(page: ft.Page):
-    """Elindítja a teljesítmény- és az eszközváltozás szimulátorokat."""
-    t_power = threading.Thread(target=simulate_power, daemon=True)
-    t_power.start()
-    
-    t_device = threading.Thread(target=simulate_device_changes, args=(page,), daemon=True)
-    t_device.start()
-
-
-# ---------------------------------------------------------------------
-# 10. VALÓS IDEJŰ POWER LINE CHART
-# ---------------------------------------------------------------------
-
-class PowerChart(ft.LineChart):
-    """Egyszerű power history line chart. Címkék nélkül a zsúfoltság elkerüléséért."""
-
-    def __init__(self, width: int = 900, height: int = 300):
+    def __init__(self, width: int = 900, height: int = 300, window: int = 40, max_points: int | None = None):
         super().__init__(
             data_series=[],
             width=width,
@@ -145,47 +111,386 @@ class PowerChart(ft.LineChart):
                 width=1,
             ),
             
-            min_y=70,  
-            max_y=170, 
+            min_y=0,
+            max_y=100,
         )
-        self.values: list[float] = []
-
-    def add_value(self, v: float):
-        self.values.append(v)
-        # Futószalag effektus: Max 40 adatpont
-        if len(self.values) > 40:
-            self.values.pop(0)
-        
+        # Alapból a szélesség pixelben a felső korlát (ennél több pont úgysem látszik)
+        self.window = window
+        self.max_points = max_points or width or 300
+        self._buf = array("d", [0.0]) * window
+        self._count = 0
+        self._synced = 0
+        self._points: list[ft.LineChartDataPoint] = []
         self.data_series = [
             ft.LineChartData(
-                data_points=[
-                    ft.LineChartDataPoint(i, val) for i, val in enumerate(self.values)
-                ],
+                data_points=self._points,
                 color=ft.Colors.BLUE,
                 stroke_width=2,
             )
         ]
 
+    def _start(self) -> int:
+        return self._count - min(self._count, self.window)
+
+    @property
+    def values(self) -> list[float]:
+        start = self._start()
+        return [self._buf[(start + i) % self.window] for i in range(self._count - start)]
+
+    def add_value(self, v: float):
+        # Futószalag effektus: körpuffer, a legrégebbi minta felülíródik
+        self._buf[self._count % self.window] = v
+        self._count += 1
+
+    def load(self, values):
+        """Az ablak feltöltése előzményadatokkal (a korábbi minták törlődnek)."""
+        self._count = 0
+        for v in values:
+            self.add_value(v)
+        self._synced = -1
+
+    def sync(self):
+        """A pontobjektumok helyben frissítése az aktuális ablakból."""
+        if self._synced == self._count:
+            return
+        self._synced = self._count
+        start = self._start()
+        n = self._count - start
+
+        # Y tengely: 0-tól a látható csúcs fölötti kerek értékig (10% ráhagyással)
+        peak = max(self._buf) if n == self.window else max(self._buf[:n], default=0.0)
+        self.max_y = nice_ceiling(peak * 1.1)
+        self.horizontal_grid_lines.interval = self.max_y / 4
+
+        indices = lttb(self._buf, start, n, self.max_points) if n > self.max_points else range(n)
+        # Új pontobjektum csak az ablak feltöltődéséig keletkezik
+        while len(self._points) < len(indices):
+            self._points.append(ft.LineChartDataPoint(0, 0))
+        del self._points[len(indices):]
+        for point, i in zip(self._points, indices):
+            point.x = i
+            point.y = self._buf[(start + i) % self.window]
+
 
 # ---------------------------------------------------------------------
-# KÖZÖS SEGÉDFÜGGVÉNYEK (LOG, IDŐ, STB.)
+# 14. ESZKÖZ KÁRTYÁK (INKREMENTÁLIS FRISSÍTÉS)
 # ---------------------------------------------------------------------
 
-def add_log(device_id: str, action: str, details: str = ""):
-    """Hozzáad egy eseményt a globális eseménynaplóhoz."""
-    dev = devices.get(device_id)
-    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    entry = {
-        "time": ts,
-        "device_id": device_id,
-        "device_name": dev["name"] if dev else device_id,
-        "action": action,
-        "details": details,
-    }
-    event_log.append(entry)
-    
-    if dev and "recent_actions" in dev:
-        dev["recent_actions"].append(f"[{ts}] {action}: {details}")
+# Eszközönként a legutóbb kiszámolt kártya-tartalom: (verzió, státusz, fogyasztás, érték).
+# Egy változás szövegei egyszer készülnek el, minden munkamenet kártyája ezt kapja.
+_card_states: dict[str, tuple] = {}
+
+
+def card_state(dev_id: str) -> tuple:
+    dev = devices.snapshot()[dev_id]
+    version = dev["version"]
+    state = _card_states.get(dev_id)
+    if state is not None and state[0] == version:
+        return state
+    kind = dev["type"]
+    value = dev[VALUE_FIELDS.get(kind, "value")]
+    draw = power_draw(kind, dev["power_w"], value)
+    state = (version, DeviceCard._status(kind, value), f"Power: {draw:.0f} / {dev['power_w']:g} W", value)
+    # Versenyhelyzetben egy régebbi verzió is beíródhat: a következő olvasó újraszámolja
+    _card_states[dev_id] = state
+    return state
+
+
+class DeviceCard:
+    """
+    Egy eszköz overview kártyája. Egyszer épül fel, utána a refresh()
+    csak a ténylegesen megváltozott vezérlőket adja vissza frissítésre
+    (az eszköz verziószáma alapján).
+    """
+
+    def __init__(self, dev_id: str, on_change, on_details, on_change_end=None):
+        self.dev_id = dev_id
+        self.version = -1
+        dev = devices[dev_id]
+        self.kind = dev["type"]
+
+        self.status_text = ft.Text()
+        self.power_text = ft.Text()
+        self.slider: ft.Slider | None = None
+
+        if self.kind in ("light", "door"):
+            icon = (
+                ft.Icons.LIGHTBULB_ROUNDED
+                if self.kind == "light"
+                else ft.Icons.DOOR_SLIDING
+            )
+            body = [
+                self.status_text,
+                self.power_text,
+                ft.Row(
+                    [
+                        ft.ElevatedButton("Toggle", on_click=on_change),
+                        ft.TextButton("Details", on_click=on_details),
+                    ]
+                ),
+            ]
+            bgcolor = ft.Colors.AMBER_50 if self.kind == "light" else ft.Colors.BLUE_50
+        else:
+            icon = ft.Icons.DEVICE_THERMOSTAT if self.kind == "thermo" else ft.Icons.AIR
+            self.slider = ft.Slider(
+                min=16 if self.kind == "thermo" else 0,
+                max=30 if self.kind == "thermo" else 3,
+                divisions=14 if self.kind == "thermo" else 3,
+                on_change=on_change,
+                on_change_end=on_change_end,
+            )
+            body = [
+                self.status_text,   # Dinamikus Text vezérlő
+                self.slider,
+                ft.TextButton("Details", on_click=on_details),
+            ]
+            bgcolor = ft.Colors.RED_50 if self.kind == "thermo" else ft.Colors.CYAN_50
+
+        self.control = ft.Container(
+            ft.Card(
+                content=ft.Container(
+                    bgcolor=bgcolor,
+                    padding=20,
+                    border_radius=15,
+                    content=ft.Column(
+                        [
+                            ft.Row(
+                                [
+                                    ft.Icon(icon),
+                                    ft.Text(dev["name"], size=18, weight="bold"),
+                                ]
+                            ),
+                            *body,
+                        ],
+                        spacing=8,
+                        alignment=ft.MainAxisAlignment.START,
+                    ),
+                ),
+            ),
+            width=450,
+            expand=False,
+        )
+        self.refresh()
+
+    @staticmethod
+    def _status(kind: str, value) -> str:
+        if kind == "light":
+            return f"Status: {'ON' if value else 'OFF'}"
+        if kind == "door":
+            return f"Status: {'LOCKED' if value else 'UNLOCKED'}"
+        return DeviceCard._label(kind, value)
+
+    @staticmethod
+    def _label(kind: str, value: float) -> str:
+        if kind == "thermo":
+            return f"Temp: {value:.1f} °C"
+        return f"Speed: {int(value)}"
+
+    def preview(self, value: float) -> list[ft.Control]:
+        """Húzás közbeni érték a címkén, még véglegesítés nélkül."""
+        self.status_text.value = self._label(self.kind, value)
+        return [self.status_text] if self.status_text.page is not None else []
+
+    def refresh(self) -> list[ft.Control]:
+        """Az eszköz aktuális állapotát a kártyára írja; a változott vezérlők listája."""
+        # Egy pillanatképből, munkamenetek között megosztva (card_state)
+        version, status, power, value = card_state(self.dev_id)
+        if version == self.version:
+            return []
+        self.version = version
+        changed: list[ft.Control] = []
+
+        if self.status_text.value != status:
+            self.status_text.value = status
+            changed.append(self.status_text)
+
+        if self.power_text.value != power:
+            self.power_text.value = power
+            changed.append(self.power_text)
+
+        if self.slider is not None:
+            if self.slider.value != value:
+                self.slider.value = value
+                changed.append(self.slider)
+
+        # Még nincs az oldalon (első felépítés) -> nincs mit külön küldeni
+        return [c for c in changed if c.page is not None]
+
+
+# ---------------------------------------------------------------------
+# 15. VIRTUALIZÁLT, LAPOZOTT NAPLÓ TÁBLA
+# ---------------------------------------------------------------------
+
+class LogTable:
+    """
+    Az eseménytár lapozott nézete. A ListView fix sormagassággal
+    (item_extent) virtualizál, így csak a látható sorok rajzolódnak ki;
+    görgetéskor a következő lap keyset kurzorral töltődik be. Egyszerre
+    legfeljebb MAX_PAGES lap van betöltve: lefelé görgetve a legfelső,
+    felfelé a legalsó lap esik ki (felfelé az újabb lapok az `after`
+    kurzorral töltődnek vissza), a görgetési pozíció a ki- / beszúrt
+    sorokkal korrigálódik. A megnyitás költsége egyetlen lap lekérdezése,
+    a napló méretétől független.
+    """
+
+    PAGE_SIZE = 50
+    MAX_PAGES = 5
+    MAX_DEVICE_OPTIONS = 50
+    ROW_HEIGHT = 32
+    COLUMN_WIDTHS = (160, 180, 140, 300)
+
+    def __init__(self, render: RenderScheduler):
+        self.render = render
+        self.device_filter: str | None = None
+        self.action_filter: str | None = None
+        # Betöltött lapok: (első sor kulcsa, utolsó sor kulcsa, sorok száma), újabb elöl
+        self._pages: deque[tuple[tuple[float, int], tuple[float, int], int]] = deque()
+        self._exhausted = False     # alul nincs több (régebbi) sor
+        self._at_top = True         # felül a legújabb sor látszik
+        self._loading = threading.Lock()
+
+        self.list_view = ft.ListView(
+            item_extent=self.ROW_HEIGHT,
+            expand=True,
+            on_scroll=self._on_scroll,
+            on_scroll_interval=100,
+        )
+        self.header = self._row(("Time", "Device", "Action", "Details"), bold=True)
+
+        all_option = ft.dropdown.Option(key="", text="All")
+        if len(devices) <= self.MAX_DEVICE_OPTIONS:
+            device_filter = ft.Dropdown(
+                label="Device",
+                width=220,
+                value="",
+                options=[all_option]
+                + [ft.dropdown.Option(key=d_id, text=dev["name"]) for d_id, dev in devices.items()],
+                on_change=self._on_device_filter,
+            )
+        else:
+            # Nagy flottánál a legördülő lista mérete az eszközszámmal nőne
+            device_filter = ft.TextField(
+                label="Device ID",
+                width=220,
+                on_submit=self._on_device_filter,
+            )
+        self.filters = ft.Row(
+            [
+                device_filter,
+                ft.Dropdown(
+                    label="Action",
+                    width=220,
+                    value="",
+                    options=[all_option]
+                    + [ft.dropdown.Option(a) for a in event_store.distinct("action")],
+                    on_change=self._on_action_filter,
+                ),
+            ]
+        )
+        self.load_next_page()
+
+    def _row(self, cells, bold: bool = False) -> ft.Row:
+        return ft.Row(
+            [
+                ft.Text(c, width=w, no_wrap=True, weight="bold" if bold else None)
+                for c, w in zip(cells, self.COLUMN_WIDTHS)
+            ],
+            height=self.ROW_HEIGHT,
+            spacing=10,
+        )
+
+    def _fetch(self, **cursor) -> tuple[list[ft.Row], tuple | None]:
+        rows = event_store.query(
+            device_id=self.device_filter,
+            action=self.action_filter,
+            limit=self.PAGE_SIZE,
+            **cursor,
+        )
+        controls = [
+            self._row((entry["time"], entry["device_name"], entry["action"], entry["details"]))
+            for entry in map(format_event, rows)
+        ]
+        page = ((rows[0]["ts"], rows[0]["id"]), (rows[-1]["ts"], rows[-1]["id"]), len(rows)) if rows else None
+        return controls, page
+
+    def load_next_page(self) -> int:
+        """
+        A következő (régebbi) lap betöltése alulra. A felül kiesett sorok
+        számát adja vissza; -1, ha nem jött új sor.
+        """
+        if self._exhausted or not self._loading.acquire(blocking=False):
+            return -1
+        try:
+            controls, page = self._fetch(before=self._pages[-1][1] if self._pages else None)
+            if len(controls) < self.PAGE_SIZE:
+                self._exhausted = True
+            if page is None:
+                return -1
+            self.list_view.controls.extend(controls)
+            self._pages.append(page)
+            dropped = 0
+            if len(self._pages) > self.MAX_PAGES:
+                dropped = self._pages.popleft()[2]
+                del self.list_view.controls[:dropped]
+                self._at_top = False
+            return dropped
+        finally:
+            self._loading.release()
+
+    def load_previous_page(self) -> int:
+        """Az előző (újabb) lap visszatöltése felülre; a beszúrt sorok száma."""
+        if self._at_top or not self._pages or not self._loading.acquire(blocking=False):
+            return 0
+        try:
+            controls, page = self._fetch(after=self._pages[0][0])
+            if len(controls) < self.PAGE_SIZE:
+                self._at_top = True
+            if page is None:
+                return 0
+            self.list_view.controls[:0] = controls
+            self._pages.appendleft(page)
+            if len(self._pages) > self.MAX_PAGES:
+                del self.list_view.controls[-self._pages.pop()[2]:]
+                self._exhausted = False
+            return len(controls)
+        finally:
+            self._loading.release()
+
+    def reset(self):
+        self._pages.clear()
+        self._exhausted = False
+        self._at_top = True
+        self.list_view.controls.clear()
+        self.load_next_page()
+        self.render.mark_dirty(self.list_view)
+
+    def _scroll_by_rows(self, pixels: float, rows: int):
+        # Fix sormagasság: a ki- / beszúrt sorok pontosan ennyivel tolják el a tartalmat
+        if self.list_view.page is not None:
+            self.list_view.scroll_to(offset=max(0.0, pixels + rows * self.ROW_HEIGHT), duration=0)
+
+    def _on_scroll(self, e: ft.OnScrollEvent):
+        # Az alja / teteje előtt két lapnyival már töltünk, hogy ne legyen üres sáv.
+        margin = 2 * self.PAGE_SIZE * self.ROW_HEIGHT
+        if e.pixels >= e.max_scroll_extent - margin:
+            dropped = self.load_next_page()
+            if dropped >= 0:
+                if dropped:
+                    self._scroll_by_rows(e.pixels, -dropped)
+                self.render.mark_dirty(self.list_view)
+        elif e.pixels <= margin:
+            added = self.load_previous_page()
+            if added:
+                self._scroll_by_rows(e.pixels, added)
+                self.render.mark_dirty(self.list_view)
+
+    def _on_device_filter(self, e: ft.ControlEvent):
+        self.device_filter = e.control.value or None
+        self.reset()
+
+    def _on_action_filter(self, e: ft.ControlEvent):
+        self.action_filter = e.control.value or None
+        self.reset()
 
 
 # ---------------------------------------------------------------------
@@ -201,17 +506,69 @@ def main(page: ft.Page):
     page.bgcolor = ft.Colors.GREY_100
     page.scroll = True 
 
+    # Minden UI frissítés ezen át megy: képkockánként egy page.update()
+    render = RenderScheduler(page, max_fps=float(os.environ.get("SMARTHOME_MAX_FPS", "30")))
+
     power_chart = PowerChart(width=None, height=300)
+    history_chart = PowerChart(width=None, height=300, window=1500)
+    history_range = {"value": "live"}
+    # A futó történeti elemzés leállítója (a statisztika oldal elhagyásakor jelez)
+    analytics_stop = {"event": None}
 
     def on_pubsub_event(ev: dict):
         if ev.get("type") == "power":
             power_chart.add_value(ev["value"])
-            if power_chart.page and page.route == "/statistics":
-                 page.update() 
+            if power_chart.page and page.route == "/statistics" and history_range["value"] == "live":
+                 power_chart.sync()
+                 render.mark_dirty(power_chart)
+
+    # A közös brokerhez gyengén kötve: a munkamenet bontásakor leiratkozik.
+    session = SessionLink(global_pubsub)
+
+    # Saját sor: ha a kliens lassú, a régi mintákat eldobjuk, a szimulátor nem vár.
+    session.subscribe(on_pubsub_event, topic="power", maxsize=10)
+
+    # Az overview egyszer épül fel, utána csak a változott kártyák frissülnek.
+    cards: dict[str, DeviceCard] = {}
+    overview_view: ft.View | None = None
+    # A megnyitott részletező nézet: (device_id, frissíthető tartalom doboza)
+    details_panel: dict = {"current": None}
+
+    def on_device_event(ev: dict):
+        dev_id = ev["device_id"]
+        card = cards.get(dev_id)
+        if card is not None and page.route == "/":
+            render.mark_dirty(*card.refresh())
+            return
+        # A page.views-hoz csak a route_change nyúl; itt csak a doboz tartalma
+        # cserélődik, a kiküldés a render ütemezőn át megy (leválasztott
+        # dobozt a flush kihagy, ha közben elnavigáltak)
+        current = details_panel["current"]
+        if current is not None and current[0] == dev_id:
+            box = current[1]
+            box.content = build_details_body(dev_id, devices.snapshot().get(dev_id))
+            render.mark_dirty(box)
 
-    global_pubsub.subscribe(on_pubsub_event)
+    # Eszközönként összevonva: lemaradás esetén csak a legutolsó állapot számít.
+    session.subscribe(
+        on_device_event,
+        topic="device",
+        maxsize=1000,
+        policy="coalesce",
+        key=lambda ev: ev["device_id"],
+    )
 
-    start_simulator(page)
+    def on_connect(e):
+        # Újracsatlakozás: a kimaradt változások egyszerre, a verziók alapján
+        session.attach()
+        for card in cards.values():
+            render.mark_dirty(*card.refresh())
+
+    page.on_connect = on_connect
+    page.on_disconnect = lambda e: session.detach()
+    page.on_close = lambda e: session.detach()
+
+    start_simulator()
 
     # -----------------------------------------------------------------
     # 3–5. MAIN PAGE (OVERVIEW) – DEVICE CARDOK + LOGIKA
@@ -221,165 +578,73 @@ def main(page: ft.Page):
         onoff_cards: list[ft.Control] = []
         slider_cards: list[ft.Control] = []
 
-        for dev_id, dev in devices.items():
-            if dev["type"] in ("light", "door"):
-
-                def make_toggle_handler(did: str):
-                    def handler(e):
-                        d = devices[did]
-                        d["state"] = not d["state"]
-                        
-                        if d["type"] == "light":
-                            state_txt = "ON" if d["state"] else "OFF"
-                            add_log(did, "Toggle", f"Light turned {state_txt}")
-                        else:
-                            state_txt = "LOCKED" if d["state"] else "UNLOCKED"
-                            add_log(did, "Toggle", f"Door {state_txt}")
-                            
-                        page.update() 
-                    return handler
-
-                icon = (
-                    ft.Icons.LIGHTBULB_ROUNDED
-                    if dev["type"] == "light"
-                    else ft.Icons.DOOR_SLIDING
-                )
-                status = (
-                    "ON" if dev["state"] else "OFF"
-                    if dev["type"] == "light"
-                    else ("LOCKED" if dev["state"] else "UNLOCKED")
-                )
+        def make_toggle_handler(did: str):
+            @metrics.timed("handler_seconds", handler="toggle")
+            def handler(e):
+                d = devices[did]
+                state = devices.modify(did, lambda state: not state)
                 
-                card = ft.Container(
-                    ft.Card(
-                        content=ft.Container(
-                            bgcolor=ft.Colors.AMBER_50
-                            if dev["type"] == "light"
-                            else ft.Colors.BLUE_50,
-                            padding=20,
-                            border_radius=15,
-                            content=ft.Column(
-                                [
-                                    ft.Row(
-                                        [
-                                            ft.Icon(icon),
-                                            ft.Text(dev["name"], size=18, weight="bold"),
-                                        ]
-                                    ),
-                                    ft.Text(f"Status: {status}"),
-                                    ft.Text(f"Power: {dev['power_w']} W"),
-                                    ft.Row(
-                                        [
-                                            ft.ElevatedButton(
-                                                "Toggle",
-                                                on_click=make_toggle_handler(dev_id),
-                                            ),
-                                            ft.TextButton(
-                                                "Details",
-                                                on_click=lambda e, d_id=dev_id: page.go(
-                                                    f"/details/{d_id}"
-                                                ),
-                                            ),
-                                        ]
-                                    ),
-                                ],
-                                spacing=8,
-                                alignment=ft.MainAxisAlignment.START,
-                            ),
-                        ),
-                    ),
-                    width=450, 
-                    expand=False 
-                )
-                onoff_cards.append(card)
+                if d["type"] == "light":
+                    state_txt = "ON" if state else "OFF"
+                    add_log(did, "Toggle", f"Light turned {state_txt}")
+                else:
+                    state_txt = "LOCKED" if state else "UNLOCKED"
+                    add_log(did, "Toggle", f"Door {state_txt}")
 
-        # Slider-es eszközök (Dinamikus frissítés bevezetve a sliderhez)
-        for dev_id, dev in devices.items():
-            if dev["type"] in ("thermo", "fan"):
+                # Csak ennek a kártyának a vezérlői frissülnek
+                render.mark_dirty(*cards[did].refresh())
+            return handler
 
-                # Dinamikus szöveges vezérlő létrehozása a csúszka értékének
-                label_text = ft.Text(
-                    f"Temp: {dev['temp']:.1f} °C"
-                    if dev["type"] == "thermo"
-                    else f"Speed: {dev['speed']}"
-                )
+        def make_slider_handlers(did: str):
+            @metrics.timed("handler_seconds", handler="slider_commit")
+            def commit(value: float):
+                d = devices[did]
+                
+                # Eszköz adatainak frissítése (húzásonként egyszer), egyetlen
+                # atomikus írással; a napló az ott beírt értéket kapja
+                if d["type"] == "thermo":
+                    temp = devices.modify(did, lambda _: round(value, 1))
+                    add_log(
+                        did,
+                        "Set temperature",
+                        f"New setpoint: {temp:.1f} °C",
+                    )
+                else:
+                    speed = devices.modify(did, lambda _: int(value))
+                    add_log(
+                        did,
+                        "Set speed",
+                        f"New fan speed: {speed}",
+                    )
+                render.mark_dirty(*cards[did].refresh())
 
-                def make_slider_handler(did: str, text_control: ft.Text):
-                    def handler(e: ft.ControlEvent):
-                        d = devices[did]
-                        
-                        # Eszköz adatainak frissítése
-                        if d["type"] == "thermo":
-                            new_value = round(e.control.value, 1)
-                            d["temp"] = new_value
-                            add_log(
-                                did,
-                                "Set temperature",
-                                f"New setpoint: {d['temp']:.1f} °C",
-                            )
-                            # VALÓS IDEJŰ FRISSÍTÉS: Frissítjük a Text vezérlő értékét
-                            text_control.value = f"Temp: {d['temp']:.1f} °C"
-                        else:
-                            new_value = int(e.control.value)
-                            d["speed"] = new_value
-                            add_log(
-                                did,
-                                "Set speed",
-                                f"New fan speed: {d['speed']}",
-                            )
-                            # VALÓS IDEJŰ FRISSÍTÉS: Frissítjük a Text vezérlő értékét
-                            text_control.value = f"Speed: {d['speed']}"
-                        
-                        # VALÓS IDEJŰ FRISSÍTÉS: Frissítjük a Text vezérlőt
-                        text_control.update() 
-                        
-                    return handler
-
-                card = ft.Container(
-                    ft.Card(
-                        content=ft.Container(
-                            bgcolor=ft.Colors.RED_50
-                            if dev["type"] == "thermo"
-                            else ft.Colors.CYAN_50,
-                            padding=20,
-                            border_radius=15,
-                            content=ft.Column(
-                                [
-                                    ft.Row(
-                                        [
-                                            ft.Icon(
-                                                ft.Icons.DEVICE_THERMOSTAT
-                                                if dev["type"] == "thermo"
-                                                else ft.Icons.AIR 
-                                            ),
-                                            ft.Text(dev["name"], size=18, weight="bold"),
-                                        ]
-                                    ),
-                                    label_text, # Dinamikus Text vezérlő
-                                    ft.Slider(
-                                        min=16 if dev["type"] == "thermo" else 0,
-                                        max=30 if dev["type"] == "thermo" else 3,
-                                        divisions=14 if dev["type"] == "thermo" else 3,
-                                        value=dev["temp"]
-                                        if dev["type"] == "thermo"
-                                        else dev["speed"],
-                                        on_change=make_slider_handler(dev_id, label_text),
-                                    ),
-                                    ft.TextButton(
-                                        "Details",
-                                        on_click=lambda e, d_id=dev_id: page.go(
-                                            f"/details/{d_id}"
-                                        ),
-                                    ),
-                                ],
-                                spacing=8,
-                            ),
-                        ),
-                    ),
-                    width=450, 
-                    expand=False
-                )
-                slider_cards.append(card)
+            field = VALUE_FIELDS.get(devices[did]["type"], "value")
+            coalescer = ChangeCoalescer(commit, current=lambda: devices[did][field])
+
+            @metrics.timed("handler_seconds", handler="slider_change")
+            def on_change(e: ft.ControlEvent):
+                # VALÓS IDEJŰ FRISSÍTÉS: húzás közben csak a címke változik
+                render.mark_dirty(*cards[did].preview(e.control.value))
+                coalescer.change(e.control.value)
+
+            def on_change_end(e: ft.ControlEvent):
+                coalescer.end(e.control.value)
+
+            return on_change, on_change_end
+
+        def open_details(did: str):
+            return lambda e: page.go(f"/details/{did}")
+
+        for dev_id, dev in devices.of_type("light", "door"):
+            card = DeviceCard(dev_id, make_toggle_handler(dev_id), open_details(dev_id))
+            cards[dev_id] = card
+            onoff_cards.append(card.control)
+
+        for dev_id, dev in devices.of_type("thermo", "fan"):
+            on_change, on_change_end = make_slider_handlers(dev_id)
+            card = DeviceCard(dev_id, on_change, open_details(dev_id), on_change_end)
+            cards[dev_id] = card
+            slider_cards.append(card.control)
 
         return ft.View(
             route="/",
@@ -424,32 +689,180 @@ def main(page: ft.Page):
     # -----------------------------------------------------------------
 
     def build_statistics_view() -> ft.View:
-        columns = [
-            ft.DataColumn(ft.Text("Time")),
-            ft.DataColumn(ft.Text("Device")),
-            ft.DataColumn(ft.Text("Action")),
-            ft.DataColumn(ft.Text("Details")),
-        ]
+        log_table = LogTable(render)
+        power_chart.sync()
 
-        rows: list[ft.DataRow] = []
-        for entry in reversed(event_log[-100:]):
-            rows.append(
-                ft.DataRow(
-                    cells=[
-                        ft.DataCell(ft.Text(entry["time"])),
-                        ft.DataCell(ft.Text(entry["device_name"])),
-                        ft.DataCell(ft.Text(entry["action"])),
-                        ft.DataCell(ft.Text(entry["details"])),
-                    ]
+        # Előzmények: a tartományhoz illő rollup szintről, átlagértékekkel
+        ranges = {"minute": 60, "day": 86400, "month": 31 * 86400}
+        chart_box = ft.Container(content=power_chart, expand=True)
+
+        def show_range(key: str):
+            history_range["value"] = key
+            if key == "live":
+                chart_box.content = power_chart
+            else:
+                buckets = power_series.query(time.time() - ranges[key], max_points=history_chart.window)
+                history_chart.load(avg for _, _, _, avg, _ in buckets)
+                history_chart.sync()
+                chart_box.content = history_chart
+            render.mark_dirty(chart_box)
+
+        range_picker = ft.Dropdown(
+            label="Range",
+            width=220,
+            value="live",
+            options=[
+                ft.dropdown.Option(key="live", text="Live"),
+                ft.dropdown.Option(key="minute", text="Last minute"),
+                ft.dropdown.Option(key="day", text="Last day"),
+                ft.dropdown.Option(key="month", text="Last month"),
+            ],
+            on_change=lambda e: show_range(e.control.value),
+        )
+        show_range(history_range["value"])
+
+        export_status = ft.Text(size=14, color=ft.Colors.GREY_700)
+
+        def run_export():
+            try:
+                events_path, n_events, power_path, n_power = export_history()
+                export_status.value = (
+                    f"Exported {n_events} events to {events_path}, "
+                    f"{n_power} power samples to {power_path}"
                 )
-            )
+            except Exception as ex:
+                export_status.value = f"Export failed: {ex}"
+            export_button.disabled = False
+            render.mark_dirty(export_status, export_button)
+
+        def on_export(e):
+            # Háttérszálon: a napló méretétől függetlenül nem akasztja meg a UI-t
+            export_button.disabled = True
+            export_status.value = "Exporting..."
+            render.mark_dirty(export_status, export_button)
+            threading.Thread(target=run_export, daemon=True).start()
+
+        export_button = ft.ElevatedButton("Export history (CSV)", on_click=on_export)
+
+        # Energia: napi / havi sávok a főkönyv prefix összegeiből (sávhatáronként O(log n))
+        energy_ranges = {"daily": (day_bounds, 14, "%b %d"), "monthly": (month_bounds, 12, "%Y %b")}
+        energy_range = {"value": "daily"}
+        energy_rows = ft.Column(spacing=4)
+        energy_status = ft.Text(size=14, color=ft.Colors.GREY_700)
+
+        def show_energy():
+            bounds_fn, count, fmt = energy_ranges[energy_range["value"]]
+            bounds = bounds_fn(count)
+            buckets = energy_ledger.breakdown(bounds)
+            peak = max((b["total"] for b in buckets), default=0.0) or 1.0
+            rows = []
+            for start, b in zip(bounds, buckets):
+                by_type = ", ".join(f"{t} {kwh:.2f}" for t, kwh in sorted(b.items()) if t != "total" and kwh >= 0.005)
+                rows.append(ft.Row([
+                    ft.Text(time.strftime(fmt, time.localtime(start)), width=90, size=14),
+                    ft.Container(width=max(1, 300 * b["total"] / peak), height=14, bgcolor=ft.Colors.AMBER_400),
+                    ft.Text(f"{b['total']:.2f} kWh", width=100, size=14, weight="bold"),
+                    ft.Text(by_type, size=12, color=ft.Colors.GREY_700),
+                ]))
+            energy_rows.controls = rows
+            render.mark_dirty(energy_rows)
+
+        def on_energy_range(e: ft.ControlEvent):
+            energy_range["value"] = e.control.value
+            show_energy()
 
-        log_table = ft.DataTable(
-            columns=columns,
-            rows=rows,
-            column_spacing=10,
-            expand=True 
+        def run_rebuild():
+            try:
+                n = rebuild_energy()
+                energy_status.value = f"Rebuilt from {n} logged state changes"
+                show_energy()
+            except Exception as ex:
+                energy_status.value = f"Rebuild failed: {ex}"
+            rebuild_button.disabled = False
+            render.mark_dirty(energy_status, rebuild_button)
+
+        def on_rebuild(e):
+            rebuild_button.disabled = True
+            energy_status.value = "Rebuilding from the event log..."
+            render.mark_dirty(energy_status, rebuild_button)
+            threading.Thread(target=run_rebuild, daemon=True).start()
+
+        energy_picker = ft.Dropdown(
+            label="Energy",
+            width=220,
+            value=energy_range["value"],
+            options=[
+                ft.dropdown.Option(key="daily", text="Daily (14 days)"),
+                ft.dropdown.Option(key="monthly", text="Monthly (12 months)"),
+            ],
+            on_change=on_energy_range,
         )
+        rebuild_button = ft.ElevatedButton("Rebuild from log", on_click=on_rebuild)
+        show_energy()
+
+        # Történeti elemzés: folyamatkészleten, szeletenként frissülő eredménnyel
+        analytics_status = ft.Text(size=14, color=ft.Colors.GREY_700)
+        analytics_progress = ft.ProgressBar(width=300, value=0, visible=False)
+        analytics_rows = ft.Column(spacing=4)
+
+        def analytics_row(cells, bold: bool = False) -> ft.Row:
+            weight = "bold" if bold else None
+            return ft.Row(
+                [ft.Text(text, width=w, size=14, weight=weight) for text, w in zip(cells, (200, 90, 140, 360))]
+            )
+
+        def show_analysis(analysis):
+            from event_analytics import SETPOINT_ACTIONS, format_duration
+
+            res = analysis.result
+            progress = "done" if analysis.finished else f"{analysis.done}/{analysis.total} partitions"
+            analytics_status.value = f"{res.events} events ({progress}, {analysis.events_per_s:.0f} events/s)"
+            analytics_progress.value = analysis.done / analysis.total if analysis.total else 1.0
+            snap = devices.snapshot()
+            rows = [analytics_row(("Device", "Events", "Toggles (peak)", "Time in states"), bold=True)]
+            for device_id, n in res.top_devices(10):
+                dev = snap.get(device_id)
+                hours = res.toggles_by_hour(device_id)
+                peak = max(range(24), key=hours.__getitem__)
+                states = list(res.time_in_states(device_id).items())[:3]
+                rows.append(analytics_row((
+                    dev["name"] if dev else device_id,
+                    str(n),
+                    f"{sum(hours)} ({peak:02d}:00)" if any(hours) else "-",
+                    ", ".join(f"{s} {format_duration(t)}" for s, t in states),
+                )))
+            for action in SETPOINT_ACTIONS:
+                dist = res.setpoint_distribution(action)
+                if dist:
+                    rows.append(ft.Text(f"{action}: " + ", ".join(f"{v:g}×{c}" for v, c in dist), size=14))
+            analytics_rows.controls = rows
+            render.mark_dirty(analytics_status, analytics_progress, analytics_rows)
+
+        def run_analytics(stop: threading.Event):
+            # Lusta import: a process pool csak az első elemzéskor töltődik be
+            import event_analytics
+
+            try:
+                event_store.flush()
+                partitions = event_analytics.partition_store(event_store.path)
+                event_analytics.analyze(partitions, on_progress=show_analysis, end=time.time(), stop=stop)
+            except Exception as ex:
+                analytics_status.value = f"Analysis failed: {ex}"
+            analytics_button.disabled = False
+            analytics_progress.visible = False
+            render.mark_dirty(analytics_status, analytics_button, analytics_progress)
+
+        def on_analyze(e):
+            stop = threading.Event()
+            analytics_stop["event"] = stop
+            analytics_button.disabled = True
+            analytics_progress.value = 0
+            analytics_progress.visible = True
+            analytics_status.value = "Analyzing history..."
+            render.mark_dirty(analytics_status, analytics_button, analytics_progress)
+            threading.Thread(target=run_analytics, args=(stop,), daemon=True).start()
+
+        analytics_button = ft.ElevatedButton("Analyze history", on_click=on_analyze)
 
         return ft.View(
             route="/statistics",
@@ -472,16 +885,15 @@ def main(page: ft.Page):
                     content=ft.Column(
                         [
                             ft.Text(
-                                "Event Log 📝 (Last 100 entries)", 
+                                "Event Log 📝", 
                                 size=22, 
                                 weight="bold"
                             ),
+                            log_table.filters,
+                            log_table.header,
                             ft.Container(
                                 height=250, 
-                                content=ft.ListView(
-                                    [log_table], 
-                                    expand=True 
-                                ),
+                                content=log_table.list_view,
                                 expand=True 
                             ),
                             ft.Divider(),
@@ -490,10 +902,25 @@ def main(page: ft.Page):
                                 size=22,
                                 weight="bold",
                             ),
-                            ft.Container(
-                                content=power_chart,
-                                expand=True 
+                            range_picker,
+                            chart_box,
+                            ft.Row([export_button, export_status]),
+                            ft.Divider(),
+                            ft.Text(
+                                "Energy Usage 🔋",
+                                size=22,
+                                weight="bold",
+                            ),
+                            ft.Row([energy_picker, rebuild_button, energy_status]),
+                            energy_rows,
+                            ft.Divider(),
+                            ft.Text(
+                                "History Analytics 🔎",
+                                size=22,
+                                weight="bold",
                             ),
+                            ft.Row([analytics_button, analytics_progress, analytics_status]),
+                            analytics_rows,
                         ],
                         spacing=20,
                     ),
@@ -506,13 +933,10 @@ def main(page: ft.Page):
     # 3. DETAILS PAGE (ESZKÖZ RÉSZLETEK)
     # -----------------------------------------------------------------
 
-    def build_details_view(device_id: str) -> ft.View:
-        dev = devices.get(device_id)
+    def build_details_body(device_id: str, dev: dict | None) -> ft.Control:
         if not dev:
-            body = ft.Text("Unknown device.", size=18)
-            title = "Device Not Found 🚫"
+            return ft.Text("Unknown device.", size=18)
         else:
-            title = dev["name"]
             details_controls: list[ft.Control] = [
                 ft.Text(f"ID: {device_id}", size=16),
                 ft.Text(f"Type: {dev['type']}", size=16),
@@ -527,18 +951,27 @@ def main(page: ft.Page):
             elif dev["type"] == "fan":
                 details_controls.append(ft.Text(f"Speed: {dev['speed']}", size=16))
 
-            details_controls.append(ft.Text(f"Power: {dev['power_w']} W", size=16))
+            draw = power_draw(dev["type"], dev["power_w"], dev[VALUE_FIELDS.get(dev["type"], "value")])
+            details_controls.append(ft.Text(f"Power: {draw:.0f} W (rated {dev['power_w']:g} W)", size=16))
             details_controls.append(ft.Divider())
             details_controls.append(ft.Text("Recent actions: 📋", size=18, weight="bold"))
             
-            recent = dev["recent_actions"][-10:]
+            recent = recent_events(device_id, 10)
             if not recent:
                 details_controls.append(ft.Text("No actions yet."))
             else:
-                for a in reversed(recent):
-                    details_controls.append(ft.Text(f"• {a}"))
+                for a in recent:
+                    details_controls.append(
+                        ft.Text(f"• [{a['time']}] {a['action']}: {a['details']}")
+                    )
+
+            return ft.Column(details_controls, spacing=8)
 
-            body = ft.Column(details_controls, spacing=8)
+    def build_details_view(device_id: str) -> ft.View:
+        dev = devices.snapshot().get(device_id)
+        title = dev["name"] if dev else "Device Not Found 🚫"
+        body = ft.Container(content=build_details_body(device_id, dev))
+        details_panel["current"] = (device_id, body)
 
         return ft.View(
             route=f"/details/{device_id}",
@@ -579,20 +1012,40 @@ def main(page: ft.Page):
     # 7. NAVIGATION & ROUTING
     # -----------------------------------------------------------------
 
+    def get_overview_view() -> ft.View:
+        nonlocal overview_view
+        if overview_view is None:
+            overview_view = build_overview_view()
+        else:
+            # Amíg nem látszott, változhattak az eszközök: verzió alapján patchelünk.
+            for card in cards.values():
+                card.refresh()
+        return overview_view
+
     def route_change(e: ft.RouteChangeEvent):
         page.views.clear()
+        details_panel["current"] = None
+        if analytics_stop["event"] is not None:
+            analytics_stop["event"].set()
+            analytics_stop["event"] = None
 
-        if page.route == "/":
-            page.views.append(build_overview_view())
-        elif page.route == "/statistics":
-            page.views.append(build_statistics_view())
+        if page.route == "/statistics":
+            kind = "statistics"
         elif page.route.startswith("/details/"):
-            dev_id = page.route.split("/")[-1]
-            page.views.append(build_details_view(dev_id))
+            kind = "details"
         else:
-            page.views.append(build_overview_view())
+            kind = "overview"
+
+        with metrics.timer("route_build_seconds", route=kind):
+            if kind == "statistics":
+                page.views.append(build_statistics_view())
+            elif kind == "details":
+                dev_id = page.route.split("/")[-1]
+                page.views.append(build_details_view(dev_id))
+            else:
+                page.views.append(get_overview_view())
 
-        page.update()
+        render.mark_page_dirty()
 
     page.on_route_change = route_change
 
@@ -600,4 +1053,9 @@ def main(page: ft.Page):
 
 
 if __name__ == "__main__":
-    ft.app(target=main)
\ No newline at end of file
+    if metrics.ENABLED:
+        metrics.start_server(int(os.environ.get("SMARTHOME_METRICS_PORT", "9108")))
+    try:
+        ft.app(target=main)
+    finally:
+        stop_simulator()
\ No newline at end of file
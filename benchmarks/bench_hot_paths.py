@@ -0,0 +1,268 @@
+"""
+Headless benchmark a főbb hot path-okra (kijelző nélkül, ál-Flet page-dzsel).
+
+    python benchmarks/bench_hot_paths.py
+    python benchmarks/bench_hot_paths.py --sizes 10,1000 --save-baseline baseline.json
+    python benchmarks/bench_hot_paths.py --compare baseline.json --threshold 0.2
+
+Minden mérés méretenként (eszközök / események száma) friss app-példányon
+fut; eredmény: áteresztőképesség, p50/p95/p99 késleltetés, csúcs memória.
+Minden path minden méreten fut; ha már egy hívás túllépi a keretet
+(pl. az overview build 100k eszköznél), egyetlen mért futás marad
+"over budget" jelöléssel. --view-limit N-nel a nézetépítő path-ok N
+eszköz fölött kihagyhatók ("skipped"; a --compare ezeket nem veti össze).
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+APP_PATH = ROOT / "Coding Day Individual Task.py"
+
+DEFAULT_SIZES = (10, 1_000, 100_000)
+
+# A nézetek eszközönként vezérlőt építenek (100k eszköznél egy overview build
+# ~1 perc és GB-nyi memória); kihagyásuk csak kérésre (--view-limit)
+VIEW_PATHS = ("build_overview_view", "build_statistics_view", "build_details_view", "overview_navigation")
+
+
+# ---------------------------------------------------------------------
+# ÁL-PAGE + APP BETÖLTÉS
+# ---------------------------------------------------------------------
+
+class FakePage:
+    """A main() által használt ft.Page felület minimuma, kliens nélkül."""
+
+    def __init__(self):
+        self.route = "/"
+        self.views = []
+        self.controls = []
+        self.updates = 0
+        self.on_route_change = None
+
+    def go(self, route: str):
+        self.route = route
+        if self.on_route_change is not None:
+            self.on_route_change(None)
+
+    def update(self, *controls):
+        self.updates += 1
+
+    def add(self, *controls):
+        self.controls.extend(controls)
+
+
+def load_app(db_path: str):
+    """Friss app modul (és alatta friss motor) saját (ideiglenes) eseménytárral."""
+    os.environ["SMARTHOME_DB"] = db_path
+    os.environ["SMARTHOME_SNAPSHOT"] = ""
+    sys.path.insert(0, str(ROOT))
+    # A motor modulszintű állapotot tart: méretenként újra kell tölteni
+    sys.modules.pop("smart_home_engine", None)
+    spec = importlib.util.spec_from_file_location(f"smart_home_app_{time.monotonic_ns()}", APP_PATH)
+    app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(app)
+    # A háttér szimulátorok csak zajt vinnének a mérésbe
+    app.start_simulator = lambda *a, **k: None
+    return app, sys.modules["smart_home_engine"]
+
+
+def populate(engine, devices: int, events: int):
+    types = ("light", "door", "thermo", "fan")
+    for i in range(devices):
+        t = types[i % 4]
+        engine.devices.add(f"bench-{t}{i}", f"Bench {t} {i}", t, power_w=50, value=20 if t == "thermo" else 0)
+    batch = []
+    for i in range(events):
+        batch.append((f"bench-light{(i % max(devices, 1)) // 4 * 4}", "Toggle", f"Light turned {'ON' if i % 2 else 'OFF'}"))
+        if len(batch) == 10_000:
+            engine.add_log_many(batch)
+            batch = []
+    engine.add_log_many(batch)
+    engine.event_store.flush()
+
+
+# ---------------------------------------------------------------------
+# MÉRÉS
+# ---------------------------------------------------------------------
+
+def measure(fn, repeat: int, budget: float) -> dict:
+    """
+    fn() futtatása legfeljebb `repeat`-szer / `budget` mp-ig. A csúcs
+    memóriát egy külön futás méri, mert a tracemalloc torzítaná az időket.
+    """
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t)
+        if time.perf_counter() - start > budget:
+            break
+    total = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1e6
+
+    return {
+        "runs": len(latencies),
+        "ops_per_s": len(latencies) / total if total else 0.0,
+        "p50_us": pct(0.50),
+        "p95_us": pct(0.95),
+        "p99_us": pct(0.99),
+        "mean_us": statistics.fmean(latencies) * 1e6,
+        "peak_kib": peak / 1024,
+        # Már egyetlen hívás túllépte a keretet: a percentilisek egy mintából
+        "over_budget": latencies[0] > budget,
+    }
+
+
+def bench_size(size: int, budget: float, view_limit: int | None = None) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        app, engine = load_app(os.path.join(tmp, "bench.db"))
+        pubsub = engine.PubSub()
+        sessions = []
+        try:
+            populate(engine, devices=size, events=size)
+
+            results["add_log"] = measure(
+                lambda: engine.add_log("light1", "Toggle", "Light turned ON"), 100_000, budget
+            )
+
+            for _ in range(3):
+                pubsub.subscribe(lambda ev: None, topic="power", maxsize=size)
+            results["pubsub_publish"] = measure(
+                lambda: pubsub.publish({"type": "power", "value": 100}), 100_000, budget
+            )
+
+            chart = app.PowerChart(window=size, max_points=300)
+
+            def chart_step():
+                chart.add_value(100.0)
+                chart.sync()
+
+            results["powerchart_add_value"] = measure(chart_step, 10_000, budget)
+
+            if view_limit is not None and size > view_limit:
+                for name in VIEW_PATHS:
+                    results[name] = {"skipped": f"> {view_limit} devices"}
+                return results
+
+            def new_session():
+                # Egyszerre egy munkamenet él: nagy méreten egy felépült nézet GB-nyi
+                while sessions:
+                    sessions.pop().on_close(None)
+                page = FakePage()
+                app.main(page)
+                sessions.append(page)
+                return page
+
+            results["build_overview_view"] = measure(new_session, 50, budget)
+
+            # Egy már felépült munkamenet a többi nézethez (nagy méreten drága újat építeni)
+            page = sessions[-1]
+            results["build_statistics_view"] = measure(lambda: page.go("/statistics"), 200, budget)
+            results["build_details_view"] = measure(lambda: page.go("/details/light1"), 200, budget)
+            results["overview_navigation"] = measure(lambda: page.go("/"), 200, budget)
+        finally:
+            # Munkamenetek leiratkoznak, a kézbesítő hurkok leállnak
+            for page in sessions:
+                page.on_close(None)
+            pubsub.close()
+            engine.global_pubsub.close()
+            engine.event_store.close()
+    return results
+
+
+# ---------------------------------------------------------------------
+# BASELINE + REGRESSZIÓ
+# ---------------------------------------------------------------------
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    for size, paths in current.items():
+        for name, res in paths.items():
+            base = baseline.get(size, {}).get(name)
+            if not base or "skipped" in base or "skipped" in res:
+                continue
+            if res["p50_us"] > base["p50_us"] * (1 + threshold):
+                regressions.append(
+                    f"{name} @ {size}: p50 {base['p50_us']:.1f} -> {res['p50_us']:.1f} us"
+                )
+            if res["ops_per_s"] < base["ops_per_s"] * (1 - threshold):
+                regressions.append(
+                    f"{name} @ {size}: throughput {base['ops_per_s']:.0f} -> {res['ops_per_s']:.0f} ops/s"
+                )
+    return regressions
+
+
+def print_header():
+    print(f"{'path':<24}{'size':>10}{'ops/s':>14}{'p50 us':>14}{'p95 us':>14}{'p99 us':>14}{'peak KiB':>14}")
+
+
+def print_rows(size: str, paths: dict):
+    for name, r in paths.items():
+        if "skipped" in r:
+            print(f"{name:<24}{size:>10}  skipped ({r['skipped']})", flush=True)
+            continue
+        print(
+            f"{name:<24}{size:>10}{r['ops_per_s']:>14.1f}{r['p50_us']:>14.1f}"
+            f"{r['p95_us']:>14.1f}{r['p99_us']:>14.1f}{r['peak_kib']:>14.0f}"
+            + ("  over budget (1 run)" if r.get("over_budget") else ""),
+            flush=True,
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Smart home hot path benchmarks")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma separated device/event counts")
+    parser.add_argument("--budget", type=float, default=2.0,
+                        help="max seconds per path and size")
+    parser.add_argument("--view-limit", type=int, default=None,
+                        help="skip the view building paths above this many devices (default: run all)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write results as JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed relative slowdown before flagging a regression")
+    args = parser.parse_args(argv)
+
+    results = {}
+    print_header()
+    for size in (int(s) for s in args.sizes.split(",")):
+        results[str(size)] = bench_size(size, args.budget, args.view_limit)
+        print_rows(str(size), results[str(size)])
+
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(results, indent=2))
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        regressions = compare(results, json.loads(Path(args.compare).read_text()), args.threshold)
+        if regressions:
+            print("REGRESSIONS:")
+            for r in regressions:
+                print("  " + r)
+            return 1
+        print("No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+from array import array
+
+# ---------------------------------------------------------------------
+# TÖMÖR AZONOSÍTÓ- ÉS NÉVTÁBLÁK
+# ---------------------------------------------------------------------
+
+_DIGITS = "0123456789"
+# A záró sorszám legfeljebb ennyi jegy (int64-be fér)
+_MAX_DIGITS = 18
+
+# Egy előtag sűrű tábláját eddig a meglévő méret kétszereséig (+ ennyi) nyújtjuk;
+# ennél ritkább sorszámok a közönséges dictbe kerülnek
+_DENSE_SLACK = 1024
+
+# A legutóbb keresett kulcsok gyorsítótára (a UI ugyanazt a néhány eszközt
+# olvassa újra meg újra); teleérve egyszerűen kiürül
+HOT_KEYS = 4096
+
+
+class PackedStrings:
+    """
+    Sok, jellemzően generált (előtag + sorszám, pl. "fleet-thermo123",
+    "Bench light 7") szöveg tömör listája. Elemenként egy előtagkód (a
+    közös, internált előtagtábla indexe) és egy szám: 12 bájt, külön
+    str objektum nélkül. A sorszám nélküli szövegek egésze kerül az
+    előtagtáblába (szám: -1), így az ismétlődők is egy példányban vannak.
+    Az elemek olvasáskor állnak össze.
+    """
+
+    __slots__ = ("_prefixes", "_prefix_codes", "_codes", "_nums")
+
+    def __init__(self, items=()):
+        self._prefixes: list[str] = []
+        self._prefix_codes: dict[str, int] = {}
+        self._codes = array("I")
+        self._nums = array("q")
+        for s in items:
+            self.append(s)
+
+    @staticmethod
+    def _split(s: str) -> tuple[str, int]:
+        # Záró sorszám vezető nulla nélkül, hogy a szöveg pontosan visszaálljon
+        head = s.rstrip(_DIGITS)
+        digits = s[len(head):]
+        if not digits:
+            return s, -1
+        number = digits.lstrip("0") or "0"
+        if len(number) > _MAX_DIGITS:
+            return s, -1
+        return s[:len(s) - len(number)], int(number)
+
+    def _find(self, s: str) -> tuple[int, int] | None:
+        """Az (előtagkód, szám) pár, ha az előtag már ismert (új kód nélkül)."""
+        prefix, num = self._split(s)
+        code = self._prefix_codes.get(prefix)
+        return None if code is None else (code, num)
+
+    def append(self, s: str) -> int:
+        prefix, num = self._split(s)
+        code = self._prefix_codes.get(prefix)
+        if code is None:
+            code = self._prefix_codes[prefix] = len(self._prefixes)
+            self._prefixes.append(prefix)
+        self._codes.append(code)
+        self._nums.append(num)
+        return len(self._codes) - 1
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def _at(self, i: int) -> str:
+        num = self._nums[i]
+        prefix = self._prefixes[self._codes[i]]
+        return prefix if num < 0 else f"{prefix}{num}"
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._at(j) for j in range(*i.indices(len(self._codes)))]
+        return self._at(i)
+
+    def __iter__(self):
+        return map(self._at, range(len(self._codes)))
+
+
+class PackedKeys(PackedStrings):
+    """
+    Egyedi kulcsok PackedStrings-ként, kulcs -> pozíció kereséssel:
+    előtagonként egy sűrű tömb (sorszám -> pozíció + 1, 0: nincs), a
+    ritka vagy sorszám nélküli kulcsok egy közönséges dictben. Egy
+    generált flottánál kulcsonként így 4 bájt az index.
+
+    Egy elem csak a register() után kereshető, így az író előbb
+    publikálhatja az elemhez tartozó adatokat. Kulcs nem törlődik, így a
+    megtalált pozíciók egy kis gyorsítótárban (_hot) maradhatnak.
+    """
+
+    __slots__ = ("_dense", "_other", "_hot")
+
+    def __init__(self, items=()):
+        self._dense: dict[int, array] = {}
+        self._other: dict[str, int] = {}
+        self._hot: dict[str, int] = {}
+        super().__init__()
+        for s in items:
+            self.register(self.append(s))
+
+    def register(self, i: int):
+        code, num = self._codes[i], self._nums[i]
+        if num >= 0:
+            slots = self._dense.get(code)
+            if slots is None:
+                slots = self._dense[code] = array("I")
+            if num < len(slots) * 2 + _DENSE_SLACK:
+                if num >= len(slots):
+                    slots.frombytes(bytes(slots.itemsize * (num + 1 - len(slots))))
+                slots[num] = i + 1
+                return
+        self._other[self._at(i)] = i
+
+    def get(self, key: str, default=None):
+        i = self._hot.get(key)
+        if i is not None:
+            return i
+        i = self._lookup(key)
+        if i is None:
+            return default
+        if len(self._hot) >= HOT_KEYS:
+            self._hot = {}
+        self._hot[key] = i
+        return i
+
+    def _lookup(self, key: str) -> int | None:
+        # A _split beágyazva, felesleges tuple-ök nélkül
+        head = key.rstrip(_DIGITS)
+        if len(head) < len(key):
+            number = key[len(head):].lstrip("0") or "0"
+            slots = self._dense.get(self._prefix_codes.get(key[:len(key) - len(number)], -1))
+            if slots is not None and len(number) <= _MAX_DIGITS:
+                num = int(number)
+                if num < len(slots) and slots[num]:
+                    return slots[num] - 1
+        return self._other.get(key)
+
+    def position(self, key: str) -> int:
+        i = self.get(key)
+        if i is None:
+            raise KeyError(key)
+        return i
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
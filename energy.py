@@ -0,0 +1,397 @@
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+# ---------------------------------------------------------------------
+# ENERGIA (kWh) INTEGRÁLÁS, PREFIX ÖSSZEGEKKEL
+# ---------------------------------------------------------------------
+
+# A felvétel mW-ban, az idő mp-ben: a kumulált energia mW·s (= mJ)
+MWS_PER_KWH = 3.6e9
+
+# Egy idősor ilyen hosszú időrésenként legfeljebb egy tárolt pontot kap
+DEFAULT_RESOLUTION = 60.0
+
+# Ritkítási szintek (kor mp, felbontás mp): ennél régebbi pontok ilyen
+# résekre ritkulnak; a RETENTION-nél régebbiek elhagyhatók
+DEFAULT_TIERS = ((2 * 86400, 3600.0), (35 * 86400, 86400.0))
+DEFAULT_RETENTION = 400 * 86400
+
+# numpy csak a történeti (vektorizált) újraépítéshez kell, lustán töltődik
+np = None
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def parse_value(kind: str, details: str) -> float | None:
+    """Az eszköz új állapotértéke a napló szövegéből (ha kiolvasható)."""
+    if kind in ("light", "door"):
+        if "UNLOCKED" in details or "OFF" in details:
+            return 0.0
+        if "LOCKED" in details or "ON" in details:
+            return 1.0
+        return None
+    numbers = _NUMBER.findall(details)
+    return float(numbers[-1]) if numbers else None
+
+
+def _numpy():
+    global np
+    if np is None:
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError("Rebuilding energy from history requires numpy (pip install numpy)") from None
+    return np
+
+
+class EnergySeries:
+    """
+    Egy eszköz, típus vagy a ház felvétele mint szakaszonként konstans
+    függvény, integrálva. Tárolt pontok: (ts, az addig felhasznált mW·s),
+    időrésenként (resolution) az első változás; a nyitott állapot (utolsó
+    változás ideje, energia ott, aktuális mW) mindig pontos. Egy időpontig
+    felhasznált energia bisect + a szomszédos pontok közti interpoláció,
+    így egy tartomány lekérdezése O(log n). A hiba egy időrésnyi
+    felvételnél nem nagyobb (a résen belüli további változások miatt).
+    """
+
+    __slots__ = ("ts", "cum", "open_ts", "open_cum", "draw", "next_slot")
+
+    def __init__(self):
+        self.ts = array("d")
+        self.cum = array("d")
+        self.open_ts: float | None = None
+        self.open_cum = 0.0
+        self.draw = 0   # mW
+        self.next_slot = float("-inf")   # a következő tárolt pont legkorábbi ideje
+
+    def set(self, ts: float, mw: int, resolution: float):
+        """Új felvétel ts-től; korábbi ts az utolsó változás idejére igazodik."""
+        open_ts = self.open_ts
+        if open_ts is not None:
+            if ts < open_ts:
+                ts = open_ts
+            self.open_cum += self.draw * (ts - open_ts)
+        self.open_ts = ts
+        self.draw = mw
+        if ts >= self.next_slot:
+            self.ts.append(ts)
+            self.cum.append(self.open_cum)
+            self.next_slot = (ts // resolution + 1) * resolution
+
+    def energy_at(self, t: float) -> float:
+        """A t időpontig felhasznált energia (mW·s)."""
+        if self.open_ts is None:
+            return 0.0
+        if t <= self.ts[0]:
+            # A megőrzési ablak előtt nincs adat: a levágott múlt nem számít
+            return self.cum[0]
+        if t >= self.open_ts:
+            return self.open_cum + self.draw * (t - self.open_ts)
+        ts, cum = self.ts, self.cum
+        k = bisect_right(ts, t) - 1
+        if k + 1 < len(ts):
+            t1, c1 = ts[k + 1], cum[k + 1]
+        else:
+            t1, c1 = self.open_ts, self.open_cum
+        t0, c0 = ts[k], cum[k]
+        return c0 + (c1 - c0) * (t - t0) / (t1 - t0) if t1 > t0 else c0
+
+    def coarsen(self, start: float, end: float, resolution: float):
+        """
+        A [start, end) közötti pontok ritkítása `resolution` résekre:
+        minden pontot tartalmazó résből a rés eleje (interpolált kumulált
+        értékkel) és a rés utolsó változása marad. Utóbbi után a következő
+        tárolt pontig a felvétel állandó, így a réshatárokon a lekérdezés
+        pontossága nem romlik; a határok legyenek a felbontás egész
+        többszörösei.
+        """
+        ts, cum = self.ts, self.cum
+        i, j = bisect_left(ts, start), bisect_left(ts, end)
+        if j - i < 3:
+            return
+        new_ts, new_cum = array("d"), array("d")
+        k = i
+        while k < j:
+            slot = ts[k] // resolution * resolution
+            m = bisect_left(ts, slot + resolution, k, j) - 1
+            if k and slot < ts[k]:
+                new_ts.append(slot)
+                new_cum.append(self.energy_at(slot))
+            else:
+                new_ts.append(ts[k])
+                new_cum.append(cum[k])
+            if m > k or new_ts[-1] < ts[k]:
+                new_ts.append(ts[m])
+                new_cum.append(cum[m])
+            k = m + 1
+        if len(new_ts) < j - i:
+            ts[i:j], cum[i:j] = new_ts, new_cum
+
+    def trim(self, cutoff: float):
+        """A cutoff előtti pontok elhagyása; a cutoff előtti utolsó megmarad."""
+        k = bisect_right(self.ts, cutoff) - 1
+        if k > 0:
+            del self.ts[:k]
+            del self.cum[:k]
+
+    @classmethod
+    def from_changes(cls, ts, mw, resolution: float) -> "EnergySeries":
+        """Időrendi változásokból (numpy tömbök: ts, felvétel mW) vektorizáltan."""
+        series = cls()
+        if not len(ts):
+            return series
+        cum = np.zeros(len(ts))
+        np.cumsum(mw[:-1] * np.diff(ts), out=cum[1:])
+        slot = ts // resolution
+        keep = np.empty(len(ts), dtype=bool)
+        keep[0] = True
+        np.not_equal(slot[1:], slot[:-1], out=keep[1:])
+        series.ts = array("d", ts[keep].tobytes())
+        series.cum = array("d", cum[keep].tobytes())
+        series.open_ts, series.open_cum, series.draw = float(ts[-1]), float(cum[-1]), int(mw[-1])
+        series.next_slot = (series.ts[-1] // resolution + 1) * resolution
+        return series
+
+
+class EnergyLedger:
+    """
+    Eszközönkénti, típusonkénti és házszintű energia főkönyv. Élőben a
+    PowerAccounting felvétel-változásai (record) vezetik: az eszköz
+    sorába az új felvétel, a típus- és a házsorba a különbség kerül.
+    Történetből a load_history építi fel vektorizáltan (numpy). A compact
+    a régi pontokat a tiers szerint ritkítja, a retention-nél régebbieket
+    elhagyja, így a tárolt pontok száma (és a pillanatkép) korlátos.
+    """
+
+    def __init__(self, resolution: float = DEFAULT_RESOLUTION, clock=time.time,
+                 tiers=DEFAULT_TIERS, retention: float = DEFAULT_RETENTION):
+        self.resolution = resolution
+        self.clock = clock
+        self.tiers = tiers
+        self.retention = retention
+        # Szintenként: eddig (kizárólag) már ritkított időhatár
+        self._marks = [float("-inf")] * len(tiers)
+        self._devices: dict[str, EnergySeries] = {}
+        self._device_types: dict[str, str] = {}
+        self._types: dict[str, EnergySeries] = {}
+        self.home = EnergySeries()
+        self._lock = threading.Lock()
+        self.changes = 0
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._devices
+
+    # --- írás -----------------------------------------------------------
+
+    def record(self, key: str, dev_type: str, mw: int, ts: float | None = None):
+        """Egy eszköz új felvétele (mW) ts-től (alapból most)."""
+        with self._lock:
+            self._record(key, dev_type, mw, self.clock() if ts is None else ts)
+
+    def _record(self, key: str, dev_type: str, mw: int, ts: float):
+        res = self.resolution
+        series = self._devices.get(key)
+        if series is None:
+            series = self._devices[key] = EnergySeries()
+            self._device_types[key] = dev_type
+        delta = mw - series.draw
+        series.set(ts, mw, res)
+        if delta:
+            by_type = self._types.get(dev_type)
+            if by_type is None:
+                by_type = self._types[dev_type] = EnergySeries()
+            by_type.set(ts, by_type.draw + delta, res)
+            home = self.home
+            home.set(ts, home.draw + delta, res)
+        self.changes += 1
+
+    def sync(self, rows, ts: float | None = None):
+        """(kulcs, típus, mW) sorok (pl. PowerAccounting.draws()) átvezetése, ahol eltérnek."""
+        ts = self.clock() if ts is None else ts
+        with self._lock:
+            devices = self._devices
+            for key, dev_type, mw in rows:
+                series = devices.get(key)
+                if series is None or series.draw != mw:
+                    self._record(key, dev_type, mw, ts)
+
+    def load_history(self, ts, key_index, draw_mw, keys: list[str], dev_types: list[str]):
+        """
+        Újraépítés időrendi változásokból: ts, key_index (keys / dev_types
+        indexe) és az új felvétel mW-ban eseményenként. Az eszközök a
+        történet előtti időre 0 felvétellel számítanak.
+        """
+        _numpy()
+        ts = np.asarray(ts, dtype=np.float64)
+        dev = np.asarray(key_index, dtype=np.int64)
+        mw = np.asarray(draw_mw, dtype=np.int64)
+        res = self.resolution
+        n = len(ts)
+
+        # Eszközönként időrendben (stabil rendezés: az időrend megmarad)
+        order = np.argsort(dev, kind="stable")
+        ts_d, dev_d, mw_d = ts[order], dev[order], mw[order]
+        starts = np.flatnonzero(np.diff(dev_d, prepend=-1))
+        prev = np.zeros(n, dtype=np.int64)
+        prev[1:] = mw_d[:-1]
+        prev[starts] = 0
+        delta = np.empty(n, dtype=np.int64)
+        delta[order] = mw_d - prev
+
+        devices, device_types = {}, {}
+        for a, b in zip(starts.tolist(), np.append(starts[1:], n).tolist()):
+            key = keys[dev_d[a]]
+            devices[key] = EnergySeries.from_changes(ts_d[a:b], mw_d[a:b], res)
+            device_types[key] = dev_types[dev_d[a]]
+
+        # Típus- és házösszeg: a különbségek kumulált összege időrendben
+        type_names = sorted(set(dev_types))
+        type_code = np.array([type_names.index(t) for t in dev_types], dtype=np.int64)[dev]
+        types = {}
+        for code, name in enumerate(type_names):
+            mask = type_code == code
+            if mask.any():
+                types[name] = EnergySeries.from_changes(ts[mask], np.cumsum(delta[mask]), res)
+        home = EnergySeries.from_changes(ts, np.cumsum(delta), res)
+
+        with self._lock:
+            self._devices, self._device_types, self._types, self.home = devices, device_types, types, home
+            self._marks = [float("-inf")] * len(self.tiers)
+            self.changes += 1
+        self.compact()
+
+    def compact(self, now: float | None = None):
+        """
+        Ritkítás és megőrzés: szintenként csak az előző futás óta
+        kikorosodott sáv kerül feldolgozásra, így a futás költsége a
+        közben gyűlt pontokkal arányos.
+        """
+        now = self.clock() if now is None else now
+        with self._lock:
+            all_series = [*self._devices.values(), *self._types.values(), self.home]
+            for tier, (age, res) in enumerate(self.tiers):
+                mark = (now - age) // res * res
+                if mark > self._marks[tier]:
+                    for s in all_series:
+                        s.coarsen(self._marks[tier], mark, res)
+                    self._marks[tier] = mark
+            cutoff = now - self.retention
+            for s in all_series:
+                s.trim(cutoff)
+            self.changes += 1
+
+    # --- olvasás --------------------------------------------------------
+
+    def _series(self, device_id: str | None, dev_type: str | None) -> EnergySeries | None:
+        if device_id is not None:
+            return self._devices.get(device_id)
+        if dev_type is not None:
+            return self._types.get(dev_type)
+        return self.home
+
+    def energy_kwh(self, t1: float, t2: float, device_id: str | None = None,
+                   dev_type: str | None = None) -> float:
+        """[t1, t2] alatt felhasznált energia: egy eszközé, egy típusé vagy (alapból) a házé."""
+        with self._lock:
+            series = self._series(device_id, dev_type)
+            if series is None:
+                return 0.0
+            return (series.energy_at(t2) - series.energy_at(t1)) / MWS_PER_KWH
+
+    def breakdown(self, bounds: list[float]) -> list[dict[str, float]]:
+        """
+        Egymást követő [bounds[i], bounds[i+1]] sávok energiája (kWh):
+        soronként "total" és típusonként; határonként sorozatonként egy
+        O(log n) lekérdezés.
+        """
+        with self._lock:
+            columns = {"total": self.home, **self._types}
+            at = {name: [s.energy_at(t) for t in bounds] for name, s in columns.items()}
+        return [
+            {name: (e[i + 1] - e[i]) / MWS_PER_KWH for name, e in at.items()}
+            for i in range(len(bounds) - 1)
+        ]
+
+    # --- pillanatkép ----------------------------------------------------
+
+    def state(self) -> dict:
+        with self._lock:
+            keys = list(self._devices)
+            all_series = [self._devices[k] for k in keys] + [self._types[t] for t in self._types] + [self.home]
+            offsets = array("q", [0])
+            ts, cum = array("d"), array("d")
+            open_ts, open_cum, draw = array("d"), array("d"), array("q")
+            for s in all_series:
+                ts.extend(s.ts)
+                cum.extend(s.cum)
+                offsets.append(len(ts))
+                open_ts.append(-1.0 if s.open_ts is None else s.open_ts)
+                open_cum.append(s.open_cum)
+                draw.append(s.draw)
+            return {
+                "resolution": self.resolution,
+                "keys": keys,
+                "device_types": [self._device_types[k] for k in keys],
+                "types": list(self._types),
+                "offsets": offsets,
+                "ts": ts,
+                "cum": cum,
+                "open_ts": open_ts,
+                "open_cum": open_cum,
+                "draw": draw,
+                "marks": list(self._marks),
+            }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "EnergyLedger":
+        keys, types = state["keys"], state["types"]
+        offsets, ts, cum = state["offsets"], state["ts"], state["cum"]
+        if len(offsets) != len(keys) + len(types) + 2 or len(ts) != len(cum) or offsets[-1] != len(ts):
+            raise ValueError("energy state shape mismatch")
+        ledger = cls(state["resolution"])
+        if len(state.get("marks", ())) == len(ledger.tiers):
+            ledger._marks = list(state["marks"])
+        all_series = []
+        for i in range(len(offsets) - 1):
+            s = EnergySeries()
+            s.ts, s.cum = ts[offsets[i]:offsets[i + 1]], cum[offsets[i]:offsets[i + 1]]
+            if state["open_ts"][i] >= 0:
+                s.open_ts = state["open_ts"][i]
+                s.next_slot = (s.ts[-1] // ledger.resolution + 1) * ledger.resolution
+            s.open_cum, s.draw = state["open_cum"][i], state["draw"][i]
+            all_series.append(s)
+        ledger._devices = dict(zip(keys, all_series))
+        ledger._device_types = dict(zip(keys, state["device_types"]))
+        ledger._types = dict(zip(types, all_series[len(keys):]))
+        ledger.home = all_series[-1]
+        return ledger
+
+
+# ---------------------------------------------------------------------
+# NAPTÁRI SÁVOK (HELYI IDŐ)
+# ---------------------------------------------------------------------
+
+def day_bounds(count: int, now: float | None = None) -> list[float]:
+    """Az utolsó `count` nap határai (helyi éjfélek), a mai nap mostig."""
+    now = time.time() if now is None else now
+    midnight = datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    # A timestamp() a helyi DST-t követi, ezért napokat a dátumon lépünk, nem 86400 mp-vel
+    days = [midnight.date().toordinal() - i for i in range(count - 1, -1, -1)]
+    return [datetime.fromordinal(d).timestamp() for d in days] + [now]
+
+
+def month_bounds(count: int, now: float | None = None) -> list[float]:
+    """Az utolsó `count` hónap határai (helyi hónapkezdetek), a mostani hónap mostig."""
+    now = time.time() if now is None else now
+    today = datetime.fromtimestamp(now)
+    index = today.year * 12 + today.month - 1
+    starts = [divmod(index - i, 12) for i in range(count - 1, -1, -1)]
+    return [datetime(y, m + 1, 1).timestamp() for y, m in starts] + [now]
@@ -0,0 +1,339 @@
+"""
+Párhuzamos történeti elemzések az eseménynaplón (process pool).
+
+    python event_analytics.py --db smart_home_events.db --since 2026-01-01
+    python event_analytics.py --archive events-01.csv.gz --archive events-02.csv.gz --workers 8
+
+Az előzmény időtartományokra (a tár tényleges időszakát egyenlő
+szeletekre) vagy archívum fájlokra bomlik. Minden szeletet egy külön
+folyamat dolgoz fel saját, csak olvasó SQLite kapcsolattal / fájlolvasóval,
+a szülő a részeredményeket érkezési sorrendben olvasztja össze, és minden
+szelet után jelez, így az eredmény fokozatosan épül fel. Összesítések:
+eszközönkénti aktivitás, kapcsolások a nap óráiként, időtartam állapotonként,
+beállítási értékek eloszlása.
+"""
+
+import argparse
+import multiprocessing
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import closing
+
+import event_archive
+
+TOGGLE_ACTION = "Toggle"
+SETPOINT_ACTIONS = ("Set temperature", "Set speed")
+SCAN_CHUNK = 50_000
+# Ennél több folyamat nem indul (a szeletek száma ettől még lehet több)
+MAX_WORKERS = 8
+
+# Az UNLOCKED előbb, mert a LOCKED része
+_STATE_WORDS = ("UNLOCKED", "LOCKED", "OFF", "ON")
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def parse_state(details: str) -> str | None:
+    """Az esemény utáni állapot a napló szövegéből: ON/OFF/LOCKED/UNLOCKED vagy az utolsó szám."""
+    for word in _STATE_WORDS:
+        if word in details:
+            return word
+    numbers = _NUMBER.findall(details)
+    return numbers[-1] if numbers else None
+
+
+# ---------------------------------------------------------------------
+# RÉSZEREDMÉNY
+# ---------------------------------------------------------------------
+
+class Aggregates:
+    """
+    Egy szelet (vagy az összevont előzmény) összesítései. A számlálók
+    sorrendtől függetlenül összeadhatók; az állapotidőhöz eszközönként a
+    szelet első és utolsó állapotváltása is megmarad (edges), mert a két
+    szelet közti szakasz csak időrendi összefűzéskor számolható el.
+    """
+
+    __slots__ = ("events", "activity", "toggles", "setpoints", "state_time", "edges")
+
+    def __init__(self):
+        self.events = 0
+        self.activity: Counter = Counter()     # eszköz -> események
+        self.toggles: Counter = Counter()      # (eszköz, óra 0–23) -> kapcsolások
+        self.setpoints: Counter = Counter()    # (akció, érték) -> darab
+        self.state_time: Counter = Counter()   # (eszköz, állapot) -> mp
+        self.edges: dict[str, list] = {}       # eszköz -> [első ts, első állapot, utolsó ts, utolsó állapot]
+
+    def add_rows(self, rows):
+        """Időrendben érkező (ts, device_id, action, details) sorok feldolgozása."""
+        activity, toggles, setpoints = self.activity, self.toggles, self.setpoints
+        state_time, edges = self.state_time, self.edges
+        states: dict[str, str | None] = {}
+        hours: dict[int, int] = {}
+        n = 0
+        for ts, device_id, action, details in rows:
+            n += 1
+            activity[device_id] += 1
+            if details in states:
+                state = states[details]
+            else:
+                state = states[details] = parse_state(details)
+
+            if action == TOGGLE_ACTION:
+                # Helyi óra negyedórás bucketenként egyszer (a félórás időzónák miatt)
+                q = int(ts // 900)
+                hour = hours.get(q)
+                if hour is None:
+                    hour = hours[q] = time.localtime(q * 900).tm_hour
+                toggles[device_id, hour] += 1
+            elif action in SETPOINT_ACTIONS and state is not None:
+                setpoints[action, float(state)] += 1
+
+            if state is not None:
+                edge = edges.get(device_id)
+                if edge is None:
+                    edges[device_id] = [ts, state, ts, state]
+                else:
+                    state_time[device_id, edge[3]] += ts - edge[2]
+                    edge[2] = ts
+                    edge[3] = state
+        self.events += n
+
+    def merge_counts(self, other: "Aggregates"):
+        """A sorrendfüggetlen részek hozzáadása (az edges nem)."""
+        self.events += other.events
+        self.activity.update(other.activity)
+        self.toggles.update(other.toggles)
+        self.setpoints.update(other.setpoints)
+        self.state_time.update(other.state_time)
+
+    # --- kiértékelés ----------------------------------------------------
+
+    def top_devices(self, n: int = 10) -> list[tuple[str, int]]:
+        return self.activity.most_common(n)
+
+    def toggles_by_hour(self, device_id: str) -> list[int]:
+        return [self.toggles.get((device_id, h), 0) for h in range(24)]
+
+    def setpoint_distribution(self, action: str) -> list[tuple[float, int]]:
+        return sorted((v, c) for (a, v), c in self.setpoints.items() if a == action)
+
+    def time_in_states(self, device_id: str) -> dict[str, float]:
+        """Állapot -> mp az eszközre, csökkenő sorrendben."""
+        times = {s: t for (d, s), t in self.state_time.items() if d == device_id}
+        return dict(sorted(times.items(), key=lambda kv: -kv[1]))
+
+
+# ---------------------------------------------------------------------
+# SZELETEK + FELDOLGOZÓ (KÜLÖN FOLYAMATBAN)
+# ---------------------------------------------------------------------
+
+def _connect_ro(db_path: str) -> sqlite3.Connection:
+    return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+
+
+def partition_store(db_path: str, since: float | None = None, until: float | None = None,
+                    parts: int | None = None) -> list[tuple]:
+    """
+    Az eseménytár [since, until) időszaka `parts` egyenlő, félig nyitott
+    szeletre bontva (alapból magonként 4, hogy a végén se álljanak a magok).
+    """
+    with closing(_connect_ro(db_path)) as conn:
+        lo, hi = conn.execute("SELECT MIN(ts), MAX(ts) FROM events").fetchone()
+    if lo is None:
+        return []
+    lo = lo if since is None else max(lo, since)
+    hi = hi if until is None else min(hi, until)
+    if hi < lo:
+        return []
+    parts = parts or 4 * (os.cpu_count() or 1)
+    step = (hi - lo) / parts
+    bounds = [lo + i * step for i in range(parts)] + [hi]
+    # Az utolsó szelet felső határa a záró esemény fölé kerül, hogy az is beleférjen
+    bounds[-1] = hi if until is not None and until <= hi else float("inf")
+    return [("db", db_path, a, b) for a, b in zip(bounds, bounds[1:])]
+
+
+def partition_archives(paths) -> list[tuple]:
+    """Archívum fájlonként egy szelet (a fájlok időrendben megadva)."""
+    return [("archive", path, None, None) for path in paths]
+
+
+def analyze_partition(spec: tuple) -> Aggregates:
+    """Egy szelet feldolgozása; a process poolban fut."""
+    kind, path, since, until = spec
+    agg = Aggregates()
+    if kind == "archive":
+        agg.add_rows(event_archive.read(path, event_archive.EVENT_FIELDS))
+        return agg
+    with closing(_connect_ro(path)) as conn:
+        cur = conn.execute(
+            "SELECT ts, device_id, action, details FROM events WHERE ts >= ? AND ts < ? ORDER BY ts, id",
+            (since, until),
+        )
+        while rows := cur.fetchmany(SCAN_CHUNK):
+            agg.add_rows(rows)
+    return agg
+
+
+# ---------------------------------------------------------------------
+# PROGRESSZÍV ÖSSZEVONÁS
+# ---------------------------------------------------------------------
+
+class Analysis:
+    """
+    A szeletek összevonása érkezéskor. A számlálók azonnal bekerülnek;
+    a szeletek közötti állapotszakaszok csak a folytonos (időrendi)
+    előtagig számolódnak el, a soron kívül érkezett szelet addig vár.
+    """
+
+    def __init__(self, partitions: list[tuple]):
+        self.partitions = partitions
+        self.total = len(partitions)
+        self.done = 0
+        self.result = Aggregates()
+        self.finished = False
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self._waiting: dict[int, Aggregates] = {}
+        self._next = 0
+        self._last: dict[str, tuple[float, str]] = {}   # eszköz -> (ts, állapot) az előtag végén
+
+    def add(self, index: int, part: Aggregates):
+        self.result.merge_counts(part)
+        self._waiting[index] = part
+        state_time = self.result.state_time
+        while self._next in self._waiting:
+            part = self._waiting.pop(self._next)
+            self._next += 1
+            for device_id, (first_ts, _, last_ts, last_state) in part.edges.items():
+                prev = self._last.get(device_id)
+                if prev is not None:
+                    state_time[device_id, prev[1]] += first_ts - prev[0]
+                self._last[device_id] = (last_ts, last_state)
+        self.done += 1
+        self.elapsed = time.perf_counter() - self.started
+
+    def finish(self, end: float | None = None):
+        """A nyitott (utolsó) állapotok lezárása `end`-ig (alapból az utolsó eseményig)."""
+        state_time = self.result.state_time
+        if end is None:
+            end = max((ts for ts, _ in self._last.values()), default=0.0)
+        for device_id, (ts, state) in self._last.items():
+            if end > ts:
+                state_time[device_id, state] += end - ts
+        self.finished = True
+        self.elapsed = time.perf_counter() - self.started
+
+    @property
+    def events_per_s(self) -> float:
+        return self.result.events / self.elapsed if self.elapsed else 0.0
+
+
+def _mp_context():
+    """
+    Indítási mód a munkafolyamatokhoz. A hívó (UI, motor) szálakat futtat
+    (író szál, ütemező, render időzítők); fork után a gyermekben a más
+    szálak által fogott zárak örökre fogva maradhatnának, ezért forkserver
+    (POSIX) vagy spawn. A szerver csak ezt a modult tölti elő, a
+    feldolgozó a motort nem importálja.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload([__name__])
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+
+def analyze(partitions: list[tuple], workers: int | None = None, on_progress=None,
+            end: float | None = None, stop: threading.Event | None = None) -> Analysis:
+    """
+    A szeletek feldolgozása `workers` folyamaton (alapból minden magon,
+    legfeljebb MAX_WORKERS, és nem több, mint ahány szelet van).
+    on_progress(analysis) minden beérkezett szelet után hívódik (a hívó
+    szálán); stop beállításakor a még el nem indult szeletek elmaradnak.
+    """
+    analysis = Analysis(partitions)
+    if partitions:
+        workers = max(1, min(workers or os.cpu_count() or 1, MAX_WORKERS, len(partitions)))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context()) as pool:
+            futures = {pool.submit(analyze_partition, spec): i for i, spec in enumerate(partitions)}
+            for future in as_completed(futures):
+                analysis.add(futures[future], future.result())
+                if on_progress is not None:
+                    on_progress(analysis)
+                if stop is not None and stop.is_set():
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    return analysis
+    analysis.finish(end)
+    if on_progress is not None:
+        on_progress(analysis)
+    return analysis
+
+
+# ---------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------
+
+def format_duration(seconds: float) -> str:
+    if seconds >= 86400:
+        return f"{seconds / 86400:.1f} d"
+    if seconds >= 3600:
+        return f"{seconds / 3600:.1f} h"
+    return f"{seconds / 60:.0f} min"
+
+
+def print_report(analysis: Analysis, top: int):
+    res = analysis.result
+    print(f"\n{res.events} events in {analysis.elapsed:.2f} s ({analysis.events_per_s:.0f} events/s)")
+    print("\nMost active devices:")
+    for device_id, n in res.top_devices(top):
+        hours = res.toggles_by_hour(device_id)
+        peak = max(range(24), key=hours.__getitem__)
+        states = ", ".join(
+            f"{s} {format_duration(t)}" for s, t in list(res.time_in_states(device_id).items())[:4]
+        )
+        toggles = f", {sum(hours)} toggles (peak {peak:02d}:00)" if any(hours) else ""
+        print(f"  {device_id:<24}{n:>10} events{toggles}  [{states}]")
+    for action in SETPOINT_ACTIONS:
+        dist = res.setpoint_distribution(action)
+        if dist:
+            print(f"\n{action}: " + ", ".join(f"{v:g}×{c}" for v, c in dist))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Parallel analytics over the smart home event history")
+    parser.add_argument("--db", default=os.environ.get("SMARTHOME_DB", "smart_home_events.db"),
+                        help="event store database")
+    parser.add_argument("--archive", action="append", default=[],
+                        help="analyze archive files instead of the database (in time order, repeatable)")
+    parser.add_argument("--since", type=event_archive.parse_time, help="start time, unix or ISO")
+    parser.add_argument("--until", type=event_archive.parse_time, help="end time, unix or ISO")
+    parser.add_argument("--parts", type=int, help="time partitions (default: 4 per core)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--top", type=int, default=10, help="devices to list")
+    args = parser.parse_args(argv)
+
+    if args.archive:
+        partitions = partition_archives(args.archive)
+    else:
+        partitions = partition_store(args.db, args.since, args.until, args.parts)
+
+    def progress(analysis: Analysis):
+        print(
+            f"\r{analysis.done}/{analysis.total} partitions, {analysis.result.events} events",
+            end="", flush=True,
+        )
+
+    analysis = analyze(partitions, args.workers, progress, end=args.until)
+    print_report(analysis, args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""
+Eseménynapló és teljesítmény idősor streaming exportja / importja.
+
+    python event_archive.py export events.csv.gz --since 2026-01-01 --device light1
+    python event_archive.py export events.parquet --db smart_home_events.db
+    python event_archive.py import events.jsonl --db archive.db
+
+A formátum a kiterjesztésből jön (.csv, .jsonl, .parquet; a szöveges
+formátumok .gz-vel tömörítve is). Minden lépés generátor: a sorok
+`chunk` méretű darabokban mennek át, így a memóriaigény a darabmérettel
+arányos, nem az archívum méretével. A Parquethez pyarrow kell.
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import sys
+from datetime import datetime
+from itertools import islice
+
+# ---------------------------------------------------------------------
+# ADATKÉSZLETEK + FORMÁTUMOK
+# ---------------------------------------------------------------------
+
+# (mezőnév, Python típus) – a CSV visszaolvasás és a Parquet séma is ebből jön
+EVENT_FIELDS = (("ts", float), ("device_id", str), ("action", str), ("details", str))
+POWER_FIELDS = (("ts", float), ("value", float))
+
+FORMATS = ("csv", "jsonl", "parquet")
+DEFAULT_CHUNK = 10_000
+
+
+def detect_format(path: str) -> str:
+    name = str(path).lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    for fmt in FORMATS:
+        if name.endswith("." + fmt):
+            return fmt
+    raise ValueError(f"Unknown archive format: {path}")
+
+
+def chunked(rows, size: int):
+    """Az iterálható sorok listákba darabolva (az utolsó lehet rövidebb)."""
+    it = iter(rows)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def _open_text(path: str, mode: str, compressed: bool):
+    if compressed:
+        return gzip.open(path, mode + "t", encoding="utf-8", newline="")
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def _arrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet support requires pyarrow (pip install pyarrow)") from None
+    return pa, pq
+
+
+# ---------------------------------------------------------------------
+# ÍRÁS
+# ---------------------------------------------------------------------
+
+def write(rows, path: str, fields, fmt: str | None = None, chunk: int = DEFAULT_CHUNK) -> int:
+    """
+    Sorok (tuple-ök a `fields` sorrendjében) kiírása darabonként.
+    Ideiglenes fájlba ír, és csak a végén nevezi át, így félbeszakadt
+    export nem hagy csonka archívumot. A kiírt sorok számát adja vissza.
+    """
+    fmt = fmt or detect_format(path)
+    tmp = f"{path}.part"
+    try:
+        if fmt == "parquet":
+            count = _write_parquet(rows, tmp, fields, chunk)
+        else:
+            with _open_text(tmp, "w", str(path).endswith(".gz")) as f:
+                count = _write_text(rows, f, fields, fmt, chunk)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return count
+
+
+def _write_text(rows, f, fields, fmt: str, chunk: int) -> int:
+    names = [name for name, _ in fields]
+    count = 0
+    if fmt == "csv":
+        writer = csv.writer(f)
+        writer.writerow(names)
+        for batch in chunked(rows, chunk):
+            writer.writerows(batch)
+            count += len(batch)
+    elif fmt == "jsonl":
+        encode = json.JSONEncoder(ensure_ascii=False).encode
+        for batch in chunked(rows, chunk):
+            f.write("".join(encode(dict(zip(names, r))) + "\n" for r in batch))
+            count += len(batch)
+    else:
+        raise ValueError(f"Unknown archive format: {fmt}")
+    return count
+
+
+def _write_parquet(rows, path: str, fields, chunk: int) -> int:
+    pa, pq = _arrow()
+    types = {float: pa.float64(), str: pa.string(), int: pa.int64()}
+    schema = pa.schema([(name, types[t]) for name, t in fields])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in chunked(rows, chunk):
+            columns = [pa.array(col, type=field.type) for col, field in zip(zip(*batch), schema)]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            count += len(batch)
+    return count
+
+
+# ---------------------------------------------------------------------
+# OLVASÁS
+# ---------------------------------------------------------------------
+
+def read(path: str, fields, fmt: str | None = None, chunk: int = DEFAULT_CHUNK):
+    """Az archívum sorai tuple-ként (a `fields` sorrendjében és típusaival)."""
+    fmt = fmt or detect_format(path)
+    names = [name for name, _ in fields]
+    types = [t for _, t in fields]
+
+    if fmt == "parquet":
+        _, pq = _arrow()
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk, columns=names):
+            yield from zip(*(batch.column(name).to_pylist() for name in names))
+        return
+
+    with _open_text(path, "r", str(path).endswith(".gz")) as f:
+        if fmt == "csv":
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            idx = [header.index(name) for name in names]
+            for r in reader:
+                yield tuple(t(r[i]) for t, i in zip(types, idx))
+        elif fmt == "jsonl":
+            for line in f:
+                if line.strip():
+                    obj = json.loads(line)
+                    yield tuple(t(obj[name]) for t, name in zip(types, names))
+        else:
+            raise ValueError(f"Unknown archive format: {fmt}")
+
+
+# ---------------------------------------------------------------------
+# ESEMÉNYTÁR / IDŐSOR KAPCSOLAT
+# ---------------------------------------------------------------------
+
+def export_events(store, path: str, fmt: str | None = None, chunk: int = DEFAULT_CHUNK, **filters) -> int:
+    """EventStore -> archívum; szűrők: device_id, action, since, until."""
+    return write(store.scan(chunk=chunk, **filters), path, EVENT_FIELDS, fmt, chunk)
+
+
+def import_events(store, path: str, fmt: str | None = None, chunk: int = DEFAULT_CHUNK) -> int:
+    """Archívum -> EventStore, darabonként egy tranzakcióval."""
+    count = 0
+    for batch in chunked(read(path, EVENT_FIELDS, fmt, chunk), chunk):
+        store.append_many(batch)
+        store.flush()
+        count += len(batch)
+    return count
+
+
+def export_power(series, path: str, since: float | None = None, until: float | None = None,
+                 fmt: str | None = None, chunk: int = DEFAULT_CHUNK) -> int:
+    """PowerSeries nyers mintái -> archívum."""
+    return write(series.scan(since, until), path, POWER_FIELDS, fmt, chunk)
+
+
+def import_power(series, path: str, fmt: str | None = None) -> int:
+    """Archívum -> PowerSeries (a rollup szintek is újraépülnek)."""
+    count = 0
+    for ts, v in read(path, POWER_FIELDS, fmt):
+        series.ingest(ts, v)
+        count += 1
+    return count
+
+
+# ---------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------
+
+def parse_time(value: str) -> float:
+    """Unix időbélyeg vagy ISO dátum / időpont."""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Smart home event archive export / import")
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("path", help="archive file (.csv, .jsonl, .parquet; .csv.gz / .jsonl.gz)")
+    parser.add_argument("--db", default=os.environ.get("SMARTHOME_DB", "smart_home_events.db"),
+                        help="event store database")
+    parser.add_argument("--format", choices=FORMATS, help="override the format from the extension")
+    parser.add_argument("--device", help="only this device id (export)")
+    parser.add_argument("--action", help="only this action (export)")
+    parser.add_argument("--since", type=parse_time, help="start time, unix or ISO (export)")
+    parser.add_argument("--until", type=parse_time, help="end time, unix or ISO (export)")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help="rows per chunk")
+    args = parser.parse_args(argv)
+
+    from event_store import EventStore
+
+    store = EventStore(args.db)
+    try:
+        if args.command == "export":
+            n = export_events(
+                store, args.path, args.format, args.chunk,
+                device_id=args.device, action=args.action, since=args.since, until=args.until,
+            )
+            print(f"Exported {n} events to {args.path}")
+        else:
+            n = import_events(store, args.path, args.format, args.chunk)
+            print(f"Imported {n} events into {args.db}")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
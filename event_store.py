@@ -0,0 +1,279 @@
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+# ---------------------------------------------------------------------
+# TARTÓS, INDEXELT ESEMÉNYTÁR (SQLITE)
+# ---------------------------------------------------------------------
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id        INTEGER PRIMARY KEY,
+    ts        REAL    NOT NULL,
+    device_id TEXT    NOT NULL,
+    action    TEXT    NOT NULL,
+    details   TEXT    NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS idx_events_device_ts ON events (device_id, ts);
+CREATE INDEX IF NOT EXISTS idx_events_action_ts ON events (action, ts);
+CREATE INDEX IF NOT EXISTS idx_events_device_action_ts ON events (device_id, action, ts);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value
+);
+"""
+
+
+class EventStore:
+    """
+    Helyi, tartós eseménytár. Az append() csak sorba teszi a rekordot,
+    egy háttérszál kötegekben (executemany + egy commit) írja ki.
+    A lekérdezések előtt a függőben lévő köteg kiíródik, így az olvasás
+    mindig látja a korábbi írásokat.
+    """
+
+    def __init__(self, path: str, batch_size: int = 1000, flush_interval: float = 0.2):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._pending: list[tuple] = []
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        self._closed = False
+
+        self._writer = sqlite3.connect(path, check_same_thread=False)
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        self._writer.execute("PRAGMA synchronous=NORMAL")
+        self._writer.executescript(SCHEMA)
+        self._writer.commit()
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # --- írás -----------------------------------------------------------
+
+    def append(self, device_id: str, action: str, details: str = "", ts: Optional[float] = None):
+        row = (time.time() if ts is None else ts, device_id, action, details)
+        with self._cond:
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def append_many(self, rows):
+        """(ts, device_id, action, details) sorok sorba állítása egyszerre."""
+        with self._cond:
+            self._pending.extend(rows)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def flush(self):
+        """Kiírja a függőben lévő köteget (bármelyik szálról hívható)."""
+        # Az író zár alatt veszi át a köteget: ha épp egy másik szál ír,
+        # megvárja a commitját, így flush() után minden korábbi írás látszik.
+        with self._write_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            self._writer.executemany(
+                "INSERT INTO events (ts, device_id, action, details) VALUES (?, ?, ?, ?)",
+                batch,
+            )
+            self._writer.commit()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._pending) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        with self._write_lock:
+            self._writer.close()
+
+    # --- olvasás --------------------------------------------------------
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def query(
+        self,
+        device_id: Optional[str] = None,
+        action: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 100,
+        before: Optional[tuple[float, int]] = None,
+        after: Optional[tuple[float, int]] = None,
+    ) -> list[dict]:
+        """
+        A legfrissebb `limit` esemény a szűrőknek megfelelően, újabb elöl.
+        Eszközre, akcióra vagy mindkettőre szűrve a (device_id, ts),
+        (action, ts) ill. (device_id, action, ts) index miatt a költség a
+        visszaadott sorok számával arányos. A `before` = (ts, id) kurzorral
+        a következő (régebbi) oldal, az `after` kurzorral az előző (újabb)
+        oldal kérhető le: ez a kurzorhoz legközelebbi `limit` újabb sor,
+        szintén újabb elöl (keyset lapozás, OFFSET nélkül).
+        """
+        self.flush()
+
+        where, params = self._filters(device_id, action, since, until)
+        if before is not None:
+            where.append("ts <= ? AND (ts < ? OR id < ?)")
+            params.extend((before[0], before[0], before[1]))
+        if after is not None:
+            where.append("ts >= ? AND (ts > ? OR id > ?)")
+            params.extend((after[0], after[0], after[1]))
+
+        sql = "SELECT id, ts, device_id, action, details FROM events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        order = "ASC" if after is not None else "DESC"
+        sql += f" ORDER BY ts {order}, id {order} LIMIT ?"
+        params.append(limit)
+
+        rows = [dict(r) for r in self._reader().execute(sql, params)]
+        if after is not None:
+            rows.reverse()
+        return rows
+
+    def scan(
+        self,
+        device_id: Optional[str] = None,
+        action: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        chunk: int = 5000,
+    ):
+        """
+        Az összes szűrt esemény időrendben, (ts, device_id, action, details)
+        alakban. Egyetlen kurzorból `chunk` soronként olvas (fetchmany), így
+        a memóriaigény a darabmérettel arányos. WAL módban a hosszú olvasás
+        sem tartja fel az írókat; a scan a kezdéskori állapotot látja.
+        """
+        self.flush()
+        where, params = self._filters(device_id, action, since, until)
+        sql = "SELECT ts, device_id, action, details FROM events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts, id"
+        # Saját kapcsolat: a szálhoz kötött olvasón közben más lekérdezés is futhat
+        conn = sqlite3.connect(self.path)
+        try:
+            cur = conn.execute(sql, params)
+            while rows := cur.fetchmany(chunk):
+                yield from rows
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _filters(device_id, action, since, until) -> tuple[list[str], list]:
+        where, params = [], []
+        if device_id is not None:
+            where.append("device_id = ?")
+            params.append(device_id)
+        if action is not None:
+            where.append("action = ?")
+            params.append(action)
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("ts <= ?")
+            params.append(until)
+        return where, params
+
+    def distinct(self, column: str) -> list[str]:
+        """
+        Egy indexelt oszlop különböző értékei. Index-ugrálással (minden
+        lépés egy MIN(...) keresés), így nem kell a teljes táblát bejárni.
+        """
+        if column not in ("device_id", "action"):
+            raise ValueError(f"Not an indexed column: {column}")
+        self.flush()
+        sql = f"""
+            WITH RECURSIVE v(x) AS (
+                SELECT MIN({column}) FROM events
+                UNION ALL
+                SELECT (SELECT MIN({column}) FROM events WHERE {column} > x)
+                FROM v WHERE x IS NOT NULL
+            )
+            SELECT x FROM v WHERE x IS NOT NULL
+        """
+        return [r[0] for r in self._reader().execute(sql)]
+
+    def compact_runs(self, patterns, since: Optional[float] = None, max_gap: float = 5.0) -> int:
+        """
+        Ugyanazon eszköz egymást követő beállítás-eseményeiből (pl. egy
+        csúszka húzásának köztes értékei) csak az utolsót tartja meg.
+        `patterns`: LIKE minták; egy futamot az azonos mintára illeszkedő,
+        egymástól legfeljebb `max_gap` mp-re lévő, az eszköz saját
+        eseménysorában közvetlenül egymás után jövő sorok alkotnak.
+        A törölt sorok számát adja vissza.
+
+        `since` nélkül a tárban megőrzött vízjeltől (az előző futás legnagyobb
+        időbélyege - max_gap) indul, így csak az azóta jött sorokat és a
+        határon átnyúló futamot járja be. A törlendő sorok az olvasó
+        kapcsolaton gyűlnek; az író zár csak a törlés idejére foglalt.
+        """
+        if not patterns:
+            return 0
+        self.flush()
+        reader = self._reader()
+        key = "compact_runs:" + "|".join(patterns)
+        watermark = since is None
+        if watermark:
+            row = reader.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+            since = row[0] - max_gap if row is not None else float("-inf")
+        top = reader.execute("SELECT MAX(ts) FROM events").fetchone()[0]
+        if top is None:
+            return 0
+        kind = "CASE " + " ".join(
+            f"WHEN action LIKE ? THEN {i}" for i in range(len(patterns))
+        ) + " ELSE -1 END"
+        sql = f"""
+            WITH seq AS (
+                SELECT id, ts, {kind} AS kind,
+                       LEAD({kind}) OVER w AS next_kind,
+                       LEAD(ts) OVER w AS next_ts
+                FROM events
+                WHERE ts >= ?
+                WINDOW w AS (PARTITION BY device_id ORDER BY ts, id)
+            )
+            SELECT id FROM seq
+            WHERE kind >= 0 AND next_kind = kind AND next_ts - ts <= ?
+        """
+        ids = [(r[0],) for r in reader.execute(sql, [*patterns, *patterns, since, max_gap])]
+        with self._write_lock:
+            before = self._writer.total_changes
+            self._writer.executemany("DELETE FROM events WHERE id = ?", ids)
+            deleted = self._writer.total_changes - before
+            if watermark:
+                self._writer.execute(
+                    "INSERT INTO meta (key, value) VALUES (?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET value = MAX(value, excluded.value)",
+                    (key, top),
+                )
+            self._writer.commit()
+        return deleted
+
+    def count(self) -> int:
+        self.flush()
+        return self._reader().execute("SELECT COUNT(*) FROM events").fetchone()[0]
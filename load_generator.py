@@ -0,0 +1,279 @@
+"""
+Determinisztikus terhelésgenerátor és visszajátszó.
+
+    python load_generator.py generate --devices 1000 --rate 5000 --duration 86400 --seed 42
+    python load_generator.py generate --devices 40 --rate 20 --duration 600 --speed 10
+    python load_generator.py replay events.csv.gz --speed 60
+
+A generátor N virtuális eszközt hajt a megadott esemény/mp ütemben,
+rögzített seeddel, ugyanazokon az utakon, mint az app: registry írás
+(-> "device" pubsub értesítés), add_log_many, teljesítmény minta
+(-> "power" pubsub). Virtuális órán fut: --speed nélkül nem vár, így egy
+szimulált nap másodpercek alatt lefut; --speed 1 valós idő, 60 = 60×.
+A visszajátszó egy rögzített eseménynaplót (event_archive formátum)
+küld vissza ugyanígy, az eredeti időközökkel / speed-del gyorsítva.
+"""
+
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import tempfile
+import time
+from itertools import groupby
+from pathlib import Path
+
+from energy import parse_value
+
+ROOT = Path(__file__).resolve().parent
+ENGINE_PATH = ROOT / "smart_home_engine.py"
+
+DEVICE_TYPES = ("light", "door", "thermo", "fan")
+POWER_W = {"light": 60, "door": 5, "thermo": 120, "fan": 50}
+INITIAL_VALUE = {"light": 0.0, "door": 1.0, "thermo": 22.0, "fan": 0.0}
+
+
+# ---------------------------------------------------------------------
+# VIRTUÁLIS ÓRA
+# ---------------------------------------------------------------------
+
+class VirtualClock:
+    """
+    A `now` csak advance()-szel lép. speed=None esetén sosem vár; különben
+    a virtuális idő speed-szer gyorsabban telik a valósnál (1.0 = valós idő).
+    """
+
+    def __init__(self, start: float | None = None, speed: float | None = None):
+        self.start = time.time() if start is None else start
+        self.now = self.start
+        self.speed = speed
+        self._real0 = time.perf_counter()
+
+    def advance(self, dt: float):
+        self.now += dt
+        if self.speed:
+            delay = (self.now - self.start) / self.speed - (time.perf_counter() - self._real0)
+            if delay > 0:
+                time.sleep(delay)
+
+    def advance_to(self, ts: float):
+        if ts > self.now:
+            self.advance(ts - self.now)
+
+
+def _stats(events: int, writes: int, clock: VirtualClock, wall: float) -> dict:
+    return {
+        "events": events,
+        "writes": writes,
+        "virtual_s": clock.now - clock.start,
+        "wall_s": wall,
+        "events_per_s": events / wall if wall else 0.0,
+    }
+
+
+# ---------------------------------------------------------------------
+# TERHELÉSGENERÁTOR
+# ---------------------------------------------------------------------
+
+class LoadGenerator:
+    """
+    N virtuális eszköz (típusonként felváltva) véletlen, de a seedből
+    reprodukálható állapotváltozásai `rate` esemény / virtuális mp
+    ütemben. Tickenként egy köteg: registry írások, majd egyetlen
+    add_log_many; `power_interval`-onként teljesítmény minta.
+    """
+
+    def __init__(self, app, devices: int = 100, rate: float = 100.0, seed: int = 0,
+                 tick: float = 1.0, power_interval: float = 5.0, prefix: str = "load"):
+        self.app = app
+        self.rate = rate
+        self.tick = tick
+        self.power_interval = power_interval
+        self.rng = random.Random(seed)
+        self.ids: list[str] = []
+        self.kinds: list[str] = []
+        self.indices: list[int] = []
+        for i in range(devices):
+            kind = DEVICE_TYPES[i % len(DEVICE_TYPES)]
+            dev_id = f"{prefix}-{kind}{i}"
+            idx = app.devices.add(dev_id, f"Load {kind} {i}", kind, POWER_W[kind], INITIAL_VALUE[kind])
+            self.ids.append(dev_id)
+            self.kinds.append(kind)
+            self.indices.append(idx)
+
+    def _change(self, k: int, current: float) -> tuple[float, str, str]:
+        """Egy eszköz következő értéke + a naplóbejegyzés (app-szövegekkel)."""
+        kind = self.kinds[k]
+        if kind == "light":
+            value = 0.0 if current else 1.0
+            return value, "Toggle", f"Light turned {'ON' if value else 'OFF'}"
+        if kind == "door":
+            value = 0.0 if current else 1.0
+            return value, "Toggle", f"Door {'LOCKED' if value else 'UNLOCKED'}"
+        if kind == "thermo":
+            value = max(16.0, min(30.0, current + self.rng.choice((-0.5, 0.5))))
+            return value, "Auto Change", f"Temp changed to {value:.1f} °C"
+        value = float(max(0, min(3, int(current) + self.rng.choice((-1, 1)))))
+        return value, "Auto Change", f"Speed changed to {int(value)}"
+
+    def step(self, n: int, ts: float) -> int:
+        """n esemény egy kötegben, ts virtuális időponttal; az írások száma."""
+        app, rng, count = self.app, self.rng, len(self.ids)
+        events = []
+        for _ in range(n):
+            k = rng.randrange(count)
+            idx = self.indices[k]
+            value, action, details = self._change(k, app.devices.snapshot().value(idx))
+            app.devices.set_value(idx, value)
+            events.append((self.ids[k], action, details))
+        app.add_log_many(events, ts=ts)
+        return n
+
+    def run(self, duration: float, clock: VirtualClock | None = None) -> dict:
+        """`duration` virtuális mp lefuttatása; eredmény: darabszámok, idők, áteresztés."""
+        clock = clock or VirtualClock()
+        end = clock.now + duration
+        next_power = clock.now
+        carry = 0.0
+        events = 0
+        t0 = time.perf_counter()
+        while clock.now < end:
+            carry += self.rate * self.tick
+            n = int(carry)
+            carry -= n
+            if n:
+                events += self.step(n, clock.now)
+            if clock.now >= next_power:
+                self.app.simulate_power(clock.now)
+                next_power += self.power_interval
+            clock.advance(self.tick)
+        self.app.event_store.flush()
+        return _stats(events, events, clock, time.perf_counter() - t0)
+
+
+# ---------------------------------------------------------------------
+# VISSZAJÁTSZÁS
+# ---------------------------------------------------------------------
+
+def infer_type(details: str) -> str | None:
+    """Eszköztípus a naplószövegből (ismeretlen eszköz visszajátszásához)."""
+    text = details.lower()
+    for marker, kind in (("light", "light"), ("door", "door"), ("temp", "thermo"),
+                         ("setpoint", "thermo"), ("speed", "fan")):
+        if marker in text:
+            return kind
+    return None
+
+
+class Replay:
+    """
+    Rögzített (ts, device_id, action, details) sorok visszajátszása az
+    eredeti időközökkel, speed-szeres gyorsítással (None = várakozás
+    nélkül). Az azonos időbélyegű sorok egy kötegben mennek; az eszközök
+    állapota is beíródik a registrybe (az ismeretleneké is, ha a típusuk
+    kiolvasható a szövegből).
+    """
+
+    def __init__(self, app, rows, speed: float | None = 1.0, apply_state: bool = True):
+        self.app = app
+        self.rows = rows
+        self.speed = speed
+        self.apply_state = apply_state
+
+    def _apply(self, device_id: str, details: str) -> bool:
+        dev = self.app.devices.get(device_id)
+        if dev is None:
+            # A rögzítéskor létező, de itt ismeretlen eszköz a szövegből kikövetkeztetett típussal jön létre
+            kind = infer_type(details)
+            if kind is None:
+                return False
+            self.app.devices.add(device_id, device_id, kind, POWER_W[kind], INITIAL_VALUE[kind])
+            dev = self.app.devices[device_id]
+        kind = dev["type"]
+        value = parse_value(kind, details)
+        if value is None:
+            return False
+        dev[self.app.VALUE_FIELDS.get(kind, "value")] = value
+        return True
+
+    def run(self) -> dict:
+        clock = None
+        events = writes = 0
+        t0 = time.perf_counter()
+        for ts, group in groupby(self.rows, key=lambda r: r[0]):
+            if clock is None:
+                clock = VirtualClock(start=ts, speed=self.speed)
+            clock.advance_to(ts)
+            batch = [(device_id, action, details) for _, device_id, action, details in group]
+            if self.apply_state:
+                writes += sum(self._apply(device_id, details) for device_id, _, details in batch)
+            self.app.add_log_many(batch, ts=ts)
+            events += len(batch)
+        self.app.event_store.flush()
+        return _stats(events, writes, clock or VirtualClock(), time.perf_counter() - t0)
+
+
+# ---------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------
+
+def load_app(db_path: str):
+    """Friss headless motor (UI és háttér szimulátor nélkül) a megadott eseménytárral."""
+    os.environ["SMARTHOME_DB"] = db_path
+    os.environ["SMARTHOME_SNAPSHOT"] = ""
+    sys.path.insert(0, str(ROOT))
+    spec = importlib.util.spec_from_file_location("smart_home_app", ENGINE_PATH)
+    app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(app)
+    return app
+
+
+def print_stats(stats: dict):
+    speedup = stats["virtual_s"] / stats["wall_s"] if stats["wall_s"] else 0.0
+    print(
+        f"{stats['events']} events, {stats['writes']} state writes, "
+        f"{stats['virtual_s']:.0f} virtual s in {stats['wall_s']:.2f} s "
+        f"({stats['events_per_s']:.0f} events/s, {speedup:.0f}x real time)"
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Seeded load generator and event log replay")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("generate", help="drive N virtual devices at a fixed rate")
+    gen.add_argument("--devices", type=int, default=100)
+    gen.add_argument("--rate", type=float, default=100.0, help="events per virtual second")
+    gen.add_argument("--duration", type=float, default=3600.0, help="virtual seconds to run")
+    gen.add_argument("--seed", type=int, default=0)
+    gen.add_argument("--tick", type=float, default=1.0, help="virtual seconds per batch")
+
+    rep = sub.add_parser("replay", help="feed a recorded event archive back through the app")
+    rep.add_argument("path", help="archive written by event_archive (.csv, .jsonl, .parquet)")
+    rep.add_argument("--no-state", action="store_true", help="only log, do not write device state")
+
+    for p in (gen, rep):
+        p.add_argument("--speed", type=float, help="virtual/real time ratio (default: as fast as possible)")
+        p.add_argument("--db", help="event store to write (default: a temporary database)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = load_app(args.db or os.path.join(tmp, "load.db"))
+        try:
+            if args.command == "generate":
+                gen = LoadGenerator(app, args.devices, args.rate, args.seed, args.tick)
+                stats = gen.run(args.duration, VirtualClock(speed=args.speed))
+            else:
+                import event_archive
+
+                rows = event_archive.read(args.path, event_archive.EVENT_FIELDS)
+                stats = Replay(app, rows, args.speed, apply_state=not args.no_state).run()
+            print_stats(stats)
+        finally:
+            app.event_store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+import functools
+import io
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+
+# ---------------------------------------------------------------------
+# HOT PATH MÉRŐSZÁMOK (HISZTOGRAMOK, SZÁMLÁLÓK, PROMETHEUS VÉGPONT)
+# ---------------------------------------------------------------------
+
+# Kikapcsolva (alapértelmezés) a timed() az eredeti függvényt adja vissza,
+# a timer() egy közös no-op context managert, az inc() azonnal visszatér.
+ENABLED = os.environ.get("SMARTHOME_METRICS", "") not in ("", "0")
+
+# Késleltetés bucketek másodpercben (Prometheus "le" határok)
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+_NULL = nullcontext()
+
+
+class Histogram:
+    """
+    Fix bucketes hisztogram; observe() O(log bucketek). Több szálból is
+    hívható: a bucket, sum és count frissítése saját zár alatt történik,
+    a snapshot() ezek egymással konzisztens másolata.
+    """
+
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, v: float):
+        i = bisect_left(self.buckets, v)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += v
+            self.count += 1
+
+    def snapshot(self) -> tuple[list[int], float, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+_lock = threading.Lock()
+_histograms: dict[tuple, Histogram] = {}
+_counters: dict[tuple, float] = {}
+_gauges: dict[tuple, object] = {}
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return (name, tuple(sorted(labels.items())))
+
+
+def observe(name: str, value: float, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    h = _histograms.get(key)
+    if h is None:
+        with _lock:
+            h = _histograms.setdefault(key, Histogram())
+    h.observe(value)
+
+
+def inc(name: str, value: float = 1, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def gauge(name: str, fn, **labels):
+    """fn() értéke a lekérdezés pillanatában kerül a kimenetbe."""
+    with _lock:
+        _gauges[_key(name, labels)] = fn
+
+
+def timer(name: str, **labels):
+    """with metrics.timer("route_build_seconds", route="overview"): ..."""
+    if not ENABLED:
+        return _NULL
+    return _timed_block(name, labels)
+
+
+@contextmanager
+def _timed_block(name: str, labels: dict):
+    t = time.perf_counter()
+    try:
+        with _profiled():
+            yield
+    finally:
+        observe(name, time.perf_counter() - t, **labels)
+
+
+def timed(name: str, **labels):
+    """Dekorátor: a függvény futási idejét a `name` hisztogramba méri."""
+
+    def wrap(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            t = time.perf_counter()
+            try:
+                with _profiled():
+                    return fn(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - t, **labels)
+
+        return inner
+
+    return wrap
+
+
+# ---------------------------------------------------------------------
+# IGÉNY SZERINTI cPROFILE
+# ---------------------------------------------------------------------
+
+# Egyetlen közös profiler: Python 3.12+ alatt egyszerre csak egy profiler
+# lehet aktív, ezért egy mért blokk csak akkor profilozódik, ha épp egyik
+# másik szál sem profiloz (a többi ilyenkor profil nélkül fut tovább). A
+# cProfile és a pstats csak profilozáskor töltődik be.
+_profiling = False
+_profiler = None
+_profile_lock = threading.Lock()
+
+
+@contextmanager
+def _profiled():
+    if not _profiling or not _profile_lock.acquire(blocking=False):
+        yield
+        return
+    try:
+        global _profiler
+        if _profiler is None:
+            import cProfile
+
+            _profiler = cProfile.Profile()
+        prof = _profiler
+        try:
+            prof.enable()
+        except ValueError:
+            # Más profilozó eszköz (pl. debugger) aktív: mérés profil nélkül
+            prof = None
+        try:
+            yield
+        finally:
+            if prof is not None:
+                prof.disable()
+    finally:
+        _profile_lock.release()
+
+
+def start_profile():
+    global _profiling, _profiler
+    with _profile_lock:
+        _profiler = None
+        _profiling = True
+
+
+def stop_profile(limit: int = 40) -> str:
+    """Leállítja a profilozást; a legdrágább függvények szöveges listája."""
+    global _profiling, _profiler
+    with _profile_lock:
+        _profiling = False
+        prof, _profiler = _profiler, None
+    if prof is None:
+        return "No profiled calls.\n"
+    import pstats
+
+    out = io.StringIO()
+    try:
+        pstats.Stats(prof, stream=out).sort_stats("cumulative").print_stats(limit)
+    except TypeError:
+        # A Stats üres profilt nem fogad el
+        return "No profiled calls.\n"
+    return out.getvalue()
+
+
+# ---------------------------------------------------------------------
+# PROMETHEUS SZÖVEGES KIMENET + HTTP VÉGPONT
+# ---------------------------------------------------------------------
+
+def _escape(value) -> str:
+    """Címke érték a szöveges formátum szerint (backslash, idézőjel, sortörés escape-elve)."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs, extra: str = "") -> str:
+    items = [f'{k}="{_escape(v)}"' for k, v in pairs]
+    if extra:
+        items.append(extra)
+    return "{" + ",".join(items) + "}" if items else ""
+
+
+def render() -> str:
+    lines = []
+    with _lock:
+        histograms = list(_histograms.items())
+        counters = list(_counters.items())
+        gauges = list(_gauges.items())
+
+    # Családonként (névenként) egy # TYPE sor, az első címkekészlet előtt
+    typed = set()
+
+    def family(name: str, kind: str):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, pairs), h in sorted(histograms, key=lambda kv: kv[0]):
+        family(name, "histogram")
+        counts, total, count = h.snapshot()
+        cumulative = 0
+        for bound, c in zip(h.buckets, counts):
+            cumulative += c
+            le = 'le="%s"' % bound
+            lines.append(f"{name}_bucket{_labels(pairs, le)} {cumulative}")
+        le = 'le="+Inf"'
+        lines.append(f"{name}_bucket{_labels(pairs, le)} {count}")
+        lines.append(f"{name}_sum{_labels(pairs)} {total}")
+        lines.append(f"{name}_count{_labels(pairs)} {count}")
+    for (name, pairs), v in sorted(counters, key=lambda kv: kv[0]):
+        family(name, "counter")
+        lines.append(f"{name}{_labels(pairs)} {v}")
+    for (name, pairs), fn in sorted(gauges, key=lambda kv: kv[0]):
+        try:
+            value = fn()
+        except Exception:
+            continue
+        family(name, "gauge")
+        lines.append(f"{name}{_labels(pairs)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _handler_class():
+    # Az http.server importja a metrikák nélküli indulást is lassítaná
+    from http.server import BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, ctype = render(), "text/plain; version=0.0.4"
+            elif self.path == "/profile/start":
+                start_profile()
+                body, ctype = "profiling started\n", "text/plain"
+            elif self.path == "/profile/stop":
+                body, ctype = stop_profile(), "text/plain"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start_server(port: int = 9108, host: str = "127.0.0.1"):
+    """Helyi metrika végpont: /metrics, /profile/start, /profile/stop."""
+    from http.server import ThreadingHTTPServer
+
+    server = ThreadingHTTPServer((host, port), _handler_class())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,215 @@
+import threading
+from array import array
+
+from compact_keys import PackedKeys
+
+# ---------------------------------------------------------------------
+# INKREMENTÁLIS TELJESÍTMÉNY ELSZÁMOLÁS
+# ---------------------------------------------------------------------
+
+# A termosztát fűtési terhelése a beállított érték e fölötti részével arányos
+HEATING_BASE_C = 15.0
+HEATING_SPAN_C = 15.0
+FAN_MAX_SPEED = 3
+
+
+def _light(power_w: float, value: float) -> float:
+    return power_w if value else 0.0
+
+
+def _constant(power_w: float, value: float) -> float:
+    # Pl. ajtózár elektronika: állapottól független készenléti fogyasztás
+    return power_w
+
+
+def _thermo(power_w: float, value: float) -> float:
+    load = (value - HEATING_BASE_C) / HEATING_SPAN_C
+    return power_w * min(1.0, max(0.0, load))
+
+
+def _fan(power_w: float, value: float) -> float:
+    return power_w * min(value, FAN_MAX_SPEED) / FAN_MAX_SPEED
+
+
+# Típusonként: (névleges teljesítmény, állapotérték) -> pillanatnyi felvétel W-ban
+DRAW_MODELS = {
+    "light": _light,
+    "door": _constant,
+    "thermo": _thermo,
+    "fan": _fan,
+}
+
+
+def power_draw(dev_type: str, power_w: float, value: float) -> float:
+    """Egy eszköz pillanatnyi fogyasztása (W) a típusa és az állapota alapján."""
+    return DRAW_MODELS.get(dev_type, _constant)(power_w, value)
+
+
+class PowerAccounting:
+    """
+    Élő fogyasztás az eszközök névleges teljesítményéből (power_w) és
+    aktuális állapotából. Eszközönként a pillanatnyi felvétel mW-ban,
+    egészként tárolódik; egy állapotváltozás csak a különbséget vezeti
+    át a típus- és a házösszegen, így a frissítés O(1), újraszámolás és
+    lebegőpontos elcsúszás nélkül.
+
+    A feliratkozók (subscribe) minden változás után megkapják a példányt;
+    az on_draw hook eszközönként kapja meg az új felvételt (pl. az
+    energia főkönyvnek).
+
+    Összesített fogyasztók (set_draw, pl. egy szimulált flotta) az
+    indexelt eszközöktől külön tárolódnak, hogy a registry indexei és az
+    elszámolás indexei egyezzenek; a típus- és házösszegben benne vannak.
+    """
+
+    def __init__(self):
+        self._keys = PackedKeys()
+        self._types: list[str] = []
+        self._power = array("d")
+        self._draw = array("q")   # mW
+        self._aggregates: dict[str, tuple[str, int]] = {}   # kulcs -> (típus, mW)
+        self._by_type: dict[str, int] = {}
+        self._total = 0
+        self._lock = threading.Lock()
+        self.listeners: list = []
+        self.on_draw = None   # callback(kulcs, típus, mW) egy eszköz felvételének változásakor
+
+    def __len__(self) -> int:
+        return len(self._draw)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    # --- írás -----------------------------------------------------------
+
+    def add(self, key: str, dev_type: str, power_w: float, value: float = 0) -> int:
+        """Új eszköz felvétele; az indexe (a hozzáadás sorrendje)."""
+        with self._lock:
+            if key in self._keys:
+                raise ValueError(f"Duplicate device id: {key}")
+            idx = len(self._draw)
+            mw = round(power_draw(dev_type, power_w, value) * 1000)
+            self._keys.register(self._keys.append(key))
+            self._types.append(dev_type)
+            self._power.append(power_w)
+            self._draw.append(mw)
+            self._by_type[dev_type] = self._by_type.get(dev_type, 0) + mw
+            self._total += mw
+        if self.on_draw is not None:
+            self.on_draw(key, dev_type, mw)
+        self._notify()
+        return idx
+
+    def add_many(self, rows):
+        """(key, típus, névleges W, érték) sorok felvétele egy zárolással, egy értesítéssel."""
+        with self._lock:
+            keys, types, power, draw = self._keys, self._types, self._power, self._draw
+            by_type = dict(self._by_type)
+            for key, dev_type, power_w, value in rows:
+                if key in keys:
+                    raise ValueError(f"Duplicate device id: {key}")
+                mw = round(DRAW_MODELS.get(dev_type, _constant)(power_w, value) * 1000)
+                keys.register(keys.append(key))
+                types.append(dev_type)
+                power.append(power_w)
+                draw.append(mw)
+                by_type[dev_type] = by_type.get(dev_type, 0) + mw
+            self._by_type = by_type
+            self._total = sum(by_type.values())
+        self._notify()
+
+    def load(self, keys, dev_types, power_w, draw_mw):
+        """
+        Kész állapot átvétele egy üres példányba (pl. pillanatképből):
+        eszközönként kulcs, típus, névleges W és a felvétel mW-ban.
+        """
+        with self._lock:
+            if self._draw:
+                raise ValueError("PowerAccounting already has devices")
+            self._keys = PackedKeys(keys)
+            self._types = list(dev_types)
+            self._power = array("d", power_w)
+            self._draw = array("q", draw_mw)
+            by_type: dict[str, int] = {}
+            for dev_type, mw in zip(self._types, self._draw):
+                by_type[dev_type] = by_type.get(dev_type, 0) + mw
+            for dev_type, mw in self._aggregates.values():
+                by_type[dev_type] = by_type.get(dev_type, 0) + mw
+            self._by_type = by_type
+            self._total = sum(by_type.values())
+        self._notify()
+
+    def draw_mw(self) -> array:
+        """Eszközönkénti felvétel (mW) másolata, hozzáadási sorrendben."""
+        with self._lock:
+            return self._draw[:]
+
+    def draws(self) -> list[tuple[str, str, int]]:
+        """(kulcs, típus, mW) eszközönként, hozzáadási sorrendben, végül az összesítettek."""
+        with self._lock:
+            rows = list(zip(self._keys, self._types, self._draw))
+            rows.extend((key, t, mw) for key, (t, mw) in self._aggregates.items())
+            return rows
+
+    def update(self, key: str, value: float):
+        self.update_at(self._keys.position(key), value)
+
+    def update_at(self, idx: int, value: float):
+        """Az eszköz új állapotértéke; csak a különbség kerül az összegekbe."""
+        with self._lock:
+            dev_type = self._types[idx]
+            mw = round(power_draw(dev_type, self._power[idx], value) * 1000)
+            delta = mw - self._draw[idx]
+            if not delta:
+                return
+            self._draw[idx] = mw
+            self._by_type[dev_type] += delta
+            self._total += delta
+        if self.on_draw is not None:
+            self.on_draw(self._keys[idx], dev_type, mw)
+        self._notify()
+
+    def set_draw(self, key: str, dev_type: str, mw: int):
+        """Egy összesített fogyasztó felvétele közvetlenül mW-ban (állapotmodell nélkül)."""
+        with self._lock:
+            delta = mw - self._aggregates.get(key, (dev_type, 0))[1]
+            self._aggregates[key] = (dev_type, mw)
+            if not delta:
+                return
+            self._by_type[dev_type] = self._by_type.get(dev_type, 0) + delta
+            self._total += delta
+        if self.on_draw is not None:
+            self.on_draw(key, dev_type, mw)
+        self._notify()
+
+    # --- olvasás --------------------------------------------------------
+
+    @property
+    def total_w(self) -> float:
+        return self._total / 1000
+
+    def type_w(self, dev_type: str) -> float:
+        return self._by_type.get(dev_type, 0) / 1000
+
+    def by_type(self) -> dict[str, float]:
+        with self._lock:
+            return {t: mw / 1000 for t, mw in self._by_type.items()}
+
+    def device_w(self, key: str) -> float:
+        return self._draw[self._keys.position(key)] / 1000
+
+    # --- feliratkozás ---------------------------------------------------
+
+    def subscribe(self, callback):
+        """callback(accounting) minden összegváltozás után; a callbacket adja vissza."""
+        with self._lock:
+            self.listeners = self.listeners + [callback]
+        return callback
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self.listeners = [c for c in self.listeners if c is not callback]
+
+    def _notify(self):
+        for callback in self.listeners:
+            callback(self)
@@ -0,0 +1,153 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+# ---------------------------------------------------------------------
+# ÖSSZEVONÓ RENDER ÜTEMEZŐ (page.update() KÖTEGELÉS)
+# ---------------------------------------------------------------------
+
+
+class RenderScheduler:
+    """
+    A page.update() hívások helyett a vezérlők "piszkosnak" jelölődnek,
+    és képkockánként legfeljebb egyszer, együtt mennek ki a kliensnek.
+    Bármelyik szálról hívható (UI handler, szimulátor, pubsub listener).
+
+    mark_dirty(c1, c2)   -> csak ezek a vezérlők frissülnek
+    mark_page_dirty()    -> teljes page.update() (pl. route váltás)
+    with batch(): ...    -> a blokk végéig semmi nem megy ki, utána egyszer
+    """
+
+    def __init__(self, page, max_fps: float = 30):
+        self.page = page
+        self.frame = 1.0 / max_fps
+        self._lock = threading.Lock()
+        self._dirty: dict[int, object] = {}
+        self._full = False
+        self._depth = 0
+        self._timer: threading.Timer | None = None
+        self._last_flush = 0.0
+        self.flushes = 0
+
+    def mark_dirty(self, *controls):
+        if not controls:
+            return
+        with self._lock:
+            for c in controls:
+                self._dirty[id(c)] = c
+            if self._depth == 0:
+                self._schedule()
+
+    def mark_page_dirty(self):
+        with self._lock:
+            self._full = True
+            if self._depth == 0:
+                self._schedule()
+
+    @contextmanager
+    def batch(self):
+        with self._lock:
+            self._depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._depth -= 1
+                if self._depth == 0 and (self._full or self._dirty):
+                    self._schedule()
+
+    def _schedule(self):
+        # Hívó fogja a _lock-ot
+        if self._timer is not None:
+            return
+        delay = max(0.0, self._last_flush + self.frame - time.monotonic())
+        self._timer = threading.Timer(delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self):
+        """A összegyűlt frissítések kiküldése egyetlen page.update() hívással."""
+        with self._lock:
+            self._timer = None
+            if self._depth > 0:
+                return   # a batch vége újraütemez
+            full, self._full = self._full, False
+            dirty, self._dirty = self._dirty, {}
+            self._last_flush = time.monotonic()
+        if full:
+            with metrics.timer("page_update_seconds", kind="full"):
+                self.page.update()
+        else:
+            controls = [c for c in dirty.values() if c.page is not None]
+            if not controls:
+                return
+            with metrics.timer("page_update_seconds", kind="partial"):
+                self.page.update(*controls)
+        self.flushes += 1
+
+
+# ---------------------------------------------------------------------
+# CSÚSZKA VÁLTOZÁSOK ÖSSZEVONÁSA
+# ---------------------------------------------------------------------
+
+
+class ChangeCoalescer:
+    """
+    Húzás közben érkező köztes értékek összevonása. A change() csak
+    megjegyzi az utolsó értéket; a commit(value) akkor fut le egyszer,
+    ha az érték `settle` másodpercig nem változott, vagy a húzás véget
+    ért (end(), pl. Slider.on_change_end). current() a cél pillanatnyi
+    értéke (pl. az eszközé): ha a végleges érték már ez, nincs commit;
+    current nélkül minden lezárt húzás commitol. Az összevetés mindig a
+    cél aktuális értékével történik, mert közben más (szimulátor, másik
+    munkamenet) is átírhatta.
+    """
+
+    def __init__(self, commit, settle: float = 0.4, current=None):
+        self.commit = commit
+        self.settle = settle
+        self.current = current
+        self._lock = threading.Lock()
+        self._value = None
+        self._pending = False
+        self._deadline = 0.0
+        self._timer: threading.Timer | None = None
+
+    def change(self, value):
+        with self._lock:
+            self._value = value
+            self._pending = True
+            self._deadline = time.monotonic() + self.settle
+            # Egyetlen időzítő fut; lejártakor megnézi, mozdult-e azóta az érték
+            if self._timer is None:
+                self._start_timer(self.settle)
+
+    def _start_timer(self, delay: float):
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            remaining = self._deadline - time.monotonic()
+            if remaining > 0:
+                self._start_timer(remaining)
+                return
+        self.end()
+
+    def end(self, value=None):
+        """Véglegesítés most (húzás vége)."""
+        with self._lock:
+            if value is not None:
+                self._value = value
+                self._pending = True
+            if not self._pending:
+                return
+            self._pending = False
+            value = self._value
+        if self.current is not None and value == self.current():
+            return
+        self.commit(value)
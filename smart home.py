@@ -1,5 +1,55 @@
 import flet as ft
+import os
+import threading
+from collections import deque
 from datetime import datetime
+from itertools import islice
+
+from event_store import EventStore
+from power_accounting import PowerAccounting
+from render_scheduler import ChangeCoalescer, RenderScheduler
+
+# Persistent action history (written through from add_action)
+event_store = EventStore(os.environ.get("SMARTHOME_CONTROLLER_DB", "smart_home_controller.db"))
+
+# Setpoint actions: only the last one of a slider drag needs to be kept
+SETPOINT_ACTIONS = ("Set to %", "Speed set to %")
+
+
+class ActionLog:
+    """
+    In-memory action history with a per-device index.
+
+    append() is O(1); latest(k) and latest_for(device, k) are O(k), newest
+    first. Both the global history and each device's history are bounded
+    deques, so a details page costs the same after a million actions as
+    after ten.
+    """
+
+    def __init__(self, capacity=1000, per_device=100):
+        self.capacity = capacity
+        self.per_device = per_device
+        self._all = deque(maxlen=capacity)
+        self._by_device = {}
+        self._lock = threading.Lock()
+
+    def append(self, device, action, time_str, user="User"):
+        entry = {"time": time_str, "device": device, "action": action, "user": user}
+        with self._lock:
+            self._all.append(entry)
+            history = self._by_device.get(device)
+            if history is None:
+                history = self._by_device[device] = deque(maxlen=self.per_device)
+            history.append(entry)
+        return entry
+
+    def latest(self, k):
+        with self._lock:
+            return list(islice(reversed(self._all), k))
+
+    def latest_for(self, device, k):
+        with self._lock:
+            return list(islice(reversed(self._by_device.get(device, ())), k))
 
 def main(page: ft.Page):
     page.title = "Smart Home Controller"
@@ -8,6 +58,9 @@ def main(page: ft.Page):
     page.padding = 20
     page.bgcolor = ft.Colors.GREY_100
     
+    # All UI pushes go through the render scheduler: one page.update() per frame
+    render = RenderScheduler(page, max_fps=float(os.environ.get("SMARTHOME_MAX_FPS", "30")))
+    
     # Device states
     light_on = ft.Ref[bool]()
     light_on.current = False
@@ -21,14 +74,42 @@ def main(page: ft.Page):
     fan_speed = ft.Ref[int]()
     fan_speed.current = 0
     
-    # Action log list
-    action_log = []
+    # Action log (newest first, indexed per device), seeded from the persistent store
+    action_log = ActionLog()
+    for row in reversed(event_store.query(limit=action_log.capacity)):
+        action_log.append(
+            row["device_id"],
+            row["action"],
+            datetime.fromtimestamp(row["ts"]).strftime("%H:%M:%S"),
+        )
+    
+    # Live power draw, derived from each device's rating and current state
+    power = PowerAccounting()
+    power.add("light1", "light", 60, light_on.current)
+    power.add("door1", "door", 5, door_locked.current)
+    power.add("thermostat", "thermo", 30, temperature.current)
+    power.add("fan", "fan", 60, fan_speed.current)
     
-    # Create pie chart
+    # Create pie chart (one section per device type, updated in place)
+    pie_sections = {
+        dev_type: ft.PieChartSection(
+            value=1,
+            title=title,
+            title_style=ft.TextStyle(color=ft.Colors.WHITE, size=12),
+            color=color,
+        )
+        for dev_type, title, color in (
+            ("light", "Light", ft.Colors.YELLOW),
+            ("door", "Door", ft.Colors.BLUE),
+            ("thermo", "Thermostat", ft.Colors.RED),
+            ("fan", "Fan", ft.Colors.CYAN),
+        )
+    }
     pie_chart = ft.PieChart(
-        sections=[],
+        sections=list(pie_sections.values()),
         center_space_radius=0,
     )
+    power_total = ft.Text(size=14, color=ft.Colors.GREY_700)
     
     # Create action log table
     action_log_table = ft.DataTable(
@@ -41,62 +122,28 @@ def main(page: ft.Page):
         rows=[],
     )
     
-    # Update pie chart
-    def update_pie_chart():
-        light_power = 60 if light_on.current else 0
-        fan_power = fan_speed.current * 20
-        
-        pie_chart.sections.clear()
-        pie_chart.sections.append(
-            ft.PieChartSection(
-                value=light_power if light_power > 0 else 1,
-                title="Light",
-                title_style=ft.TextStyle(color=ft.Colors.WHITE, size=12),
-                color=ft.Colors.YELLOW,
-            )
-        )
-        pie_chart.sections.append(
-            ft.PieChartSection(
-                value=5,
-                title="Door",
-                title_style=ft.TextStyle(color=ft.Colors.WHITE, size=12),
-                color=ft.Colors.BLUE,
-            )
-        )
-        pie_chart.sections.append(
-            ft.PieChartSection(
-                value=15,
-                title="Thermostat",
-                title_style=ft.TextStyle(color=ft.Colors.WHITE, size=12),
-                color=ft.Colors.RED,
-            )
-        )
-        pie_chart.sections.append(
-            ft.PieChartSection(
-                value=fan_power if fan_power > 0 else 1,
-                title="Fan",
-                title_style=ft.TextStyle(color=ft.Colors.WHITE, size=12),
-                color=ft.Colors.CYAN,
-            )
-        )
-        page.update()
+    # Update pie chart (subscribed to the power accounting totals)
+    def update_pie_chart(acc):
+        for dev_type, section in pie_sections.items():
+            # Keep idle devices visible as a thin slice
+            section.value = max(acc.type_w(dev_type), 1)
+        power_total.value = f"Total: {acc.total_w:.0f} W"
+        render.mark_dirty(pie_chart, power_total)
+    
+    power.subscribe(update_pie_chart)
+    update_pie_chart(power)
     
     # Function to add action to log
     def add_action(device, action):
         now = datetime.now()
         time_str = now.strftime("%H:%M:%S")
-        action_log.insert(0, {
-            "time": time_str,
-            "device": device,
-            "action": action,
-            "user": "User"
-        })
+        event_store.append(device, action, ts=now.timestamp())
+        action_log.append(device, action, time_str)
         update_action_log_table()
-        update_pie_chart()
     
     def update_action_log_table():
         action_log_table.rows.clear()
-        for log in action_log[:10]:  # Show last 10 actions
+        for log in action_log.latest(10):  # Show last 10 actions
             action_log_table.rows.append(
                 ft.DataRow(
                     cells=[
@@ -107,7 +154,7 @@ def main(page: ft.Page):
                     ]
                 )
             )
-        page.update()
+        render.mark_dirty(action_log_table)
     
     # Light status text
     light_status = ft.Text("Status: OFF", size=14, color=ft.Colors.GREY_700)
@@ -127,57 +174,87 @@ def main(page: ft.Page):
     
     # Toggle light function
     def toggle_light(e):
-        light_on.current = not light_on.current
-        if light_on.current:
-            light_status.value = "Status: ON"
-            light_button.text = "Turn OFF"
-            add_action("light1", "Turn ON")
-        else:
-            light_status.value = "Status: OFF"
-            light_button.text = "Turn ON"
-            add_action("light1", "Turn OFF")
-        update_pie_chart()
-        page.update()
+        with render.batch():
+            light_on.current = not light_on.current
+            if light_on.current:
+                light_status.value = "Status: ON"
+                light_button.text = "Turn OFF"
+                add_action("light1", "Turn ON")
+            else:
+                light_status.value = "Status: OFF"
+                light_button.text = "Turn ON"
+                add_action("light1", "Turn OFF")
+            power.update("light1", light_on.current)
+            render.mark_dirty(light_status, light_button)
     
     # Toggle door function
     def toggle_door(e):
-        door_locked.current = not door_locked.current
-        if door_locked.current:
-            door_status.value = "Door: LOCKED"
-            door_button.text = "Unlock"
-            add_action("door1", "Lock")
-        else:
-            door_status.value = "Door: UNLOCKED"
-            door_button.text = "Lock"
-            add_action("door1", "Unlock")
-        page.update()
+        with render.batch():
+            door_locked.current = not door_locked.current
+            if door_locked.current:
+                door_status.value = "Door: LOCKED"
+                door_button.text = "Unlock"
+                add_action("door1", "Lock")
+            else:
+                door_status.value = "Door: UNLOCKED"
+                door_button.text = "Lock"
+                add_action("door1", "Unlock")
+            power.update("door1", door_locked.current)
+            render.mark_dirty(door_status, door_button)
+    
+    # Commit temperature (once per drag, after the value settles)
+    def commit_temperature(value):
+        with render.batch():
+            temperature.current = value
+            temp_display.value = f"Set point: {temperature.current:.1f} °C"
+            add_action("thermostat", f"Set to {temperature.current:.1f}°C")
+            power.update("thermostat", temperature.current)
+            render.mark_dirty(temp_display)
     
-    # Change temperature function
+    # Commit fan speed (once per drag, after the value settles)
+    def commit_fan_speed(value):
+        with render.batch():
+            fan_speed.current = int(value)
+            fan_display.value = f"Fan speed: {fan_speed.current}"
+            add_action("fan", f"Speed set to {fan_speed.current}")
+            power.update("fan", fan_speed.current)
+            render.mark_dirty(fan_display)
+    
+    temp_changes = ChangeCoalescer(commit_temperature, current=lambda: temperature.current)
+    fan_changes = ChangeCoalescer(commit_fan_speed, current=lambda: fan_speed.current)
+    
+    # Change temperature function (live label only while dragging)
     def change_temperature(e):
-        temperature.current = e.control.value
-        temp_display.value = f"Set point: {temperature.current:.1f} °C"
-        add_action("thermostat", f"Set to {temperature.current:.1f}°C")
-        page.update()
+        temp_display.value = f"Set point: {e.control.value:.1f} °C"
+        render.mark_dirty(temp_display)
+        temp_changes.change(e.control.value)
     
-    # Change fan speed function
+    # Change fan speed function (live label only while dragging)
     def change_fan_speed(e):
-        fan_speed.current = int(e.control.value)
-        fan_display.value = f"Fan speed: {fan_speed.current}"
-        add_action("fan", f"Speed set to {fan_speed.current}")
-        update_pie_chart()
-        page.update()
+        fan_display.value = f"Fan speed: {int(e.control.value)}"
+        render.mark_dirty(fan_display)
+        fan_changes.change(e.control.value)
+    
+    # Details page data for every device: (title, type, current state)
+    device_details = {
+        "light1": ("Living Room Light", "light", lambda: f"State: {'ON' if light_on.current else 'OFF'}"),
+        "door1": ("Front Door", "door", lambda: f"State: {'LOCKED' if door_locked.current else 'UNLOCKED'}"),
+        "thermostat": ("Thermostat", "thermostat", lambda: f"Set point: {temperature.current:.1f} °C"),
+        "fan": ("Ceiling Fan", "fan", lambda: f"Speed: {fan_speed.current}"),
+    }
     
     # Show device details
-    def show_light_details(e):
+    def show_details(device_id):
         page.controls.clear()
+        title, dev_type, state = device_details[device_id]
         
-        # Get light actions
-        light_actions = [log for log in action_log if log["device"] == "light1"]
+        # Latest actions of this device only (per-device index, O(k))
+        device_actions = action_log.latest_for(device_id, 5)
         
         # Create recent actions list
         actions_column = ft.Column()
-        if light_actions:
-            for log in light_actions[:5]:
+        if device_actions:
+            for log in device_actions:
                 actions_column.controls.append(
                     ft.Text(f"{log['time']} - {log['action']} ({log['user']})", size=14)
                 )
@@ -193,10 +270,11 @@ def main(page: ft.Page):
                 ft.Text("Smart Home Controller", size=32, weight=ft.FontWeight.BOLD),
                 ft.Container(
                     content=ft.Column([
-                        ft.Text("Living Room Light details", size=24, weight=ft.FontWeight.BOLD),
-                        ft.Text(f"ID: light1", size=14),
-                        ft.Text(f"Type: light", size=14),
-                        ft.Text(f"State: {'ON' if light_on.current else 'OFF'}", size=14),
+                        ft.Text(f"{title} details", size=24, weight=ft.FontWeight.BOLD),
+                        ft.Text(f"ID: {device_id}", size=14),
+                        ft.Text(f"Type: {dev_type}", size=14),
+                        ft.Text(state(), size=14),
+                        ft.Text(f"Power: {power.device_w(device_id):.0f} W", size=14),
                         ft.Divider(height=20),
                         ft.Text("Recent actions", size=20, weight=ft.FontWeight.BOLD),
                         actions_column,
@@ -217,25 +295,27 @@ def main(page: ft.Page):
             bgcolor=ft.Colors.WHITE,
             border_radius=10,
         )
-        page.add(details_view)
-        page.update()
+        page.controls.append(details_view)
+        render.mark_page_dirty()
     
     # Assign button click handlers
     light_button.on_click = toggle_light
     door_button.on_click = toggle_door
     temp_slider.on_change = change_temperature
     fan_slider.on_change = change_fan_speed
+    temp_slider.on_change_end = lambda e: temp_changes.end(e.control.value)
+    fan_slider.on_change_end = lambda e: fan_changes.end(e.control.value)
     
     # Navigation functions
     def show_overview(e):
         page.controls.clear()
-        page.add(overview_view)
-        page.update()
+        page.controls.append(overview_view)
+        render.mark_page_dirty()
     
     def show_statistics(e):
         page.controls.clear()
-        page.add(statistics_view)
-        page.update()
+        page.controls.append(statistics_view)
+        render.mark_page_dirty()
     
     # Overview View
     overview_view = ft.Container(
@@ -264,7 +344,7 @@ def main(page: ft.Page):
                         light_status,
                         ft.Text("Tap to switch the light.", size=12, color=ft.Colors.GREY_500),
                         ft.Row([
-                            ft.TextButton("Details", on_click=show_light_details),
+                            ft.TextButton("Details", on_click=lambda e: show_details("light1")),
                             light_button,
                         ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
                     ]),
@@ -284,7 +364,7 @@ def main(page: ft.Page):
                         door_status,
                         ft.Text("Tap to lock / unlock the door.", size=12, color=ft.Colors.GREY_500),
                         ft.Row([
-                            ft.TextButton("Details"),
+                            ft.TextButton("Details", on_click=lambda e: show_details("door1")),
                             door_button,
                         ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
                     ]),
@@ -308,7 +388,7 @@ def main(page: ft.Page):
                         temp_display,
                         ft.Text("Use slider to change temperature.", size=12, color=ft.Colors.GREY_500),
                         temp_slider,
-                        ft.TextButton("Details"),
+                        ft.TextButton("Details", on_click=lambda e: show_details("thermostat")),
                     ]),
                     bgcolor=ft.Colors.PINK_100,
                     padding=15,
@@ -326,7 +406,7 @@ def main(page: ft.Page):
                         fan_display,
                         ft.Text("0 = OFF, 3 = MAX.", size=12, color=ft.Colors.GREY_500),
                         fan_slider,
-                        ft.TextButton("Details"),
+                        ft.TextButton("Details", on_click=lambda e: show_details("fan")),
                     ]),
                     bgcolor=ft.Colors.CYAN_100,
                     padding=15,
@@ -356,6 +436,7 @@ def main(page: ft.Page):
             
             # Power Consumption
             ft.Text("Power consumption (simulated)", size=20, weight=ft.FontWeight.BOLD),
+            power_total,
             ft.Container(
                 content=pie_chart,
                 height=300,
@@ -380,15 +461,24 @@ def main(page: ft.Page):
         border_radius=10,
     )
     
-    # Initialize with sample data
-    add_action("light1", "Turn ON")
-    add_action("door1", "Unlock")
-    add_action("thermostat", "Set to 24.0°C")
-    add_action("fan", "Speed set to 2")
-    add_action("light1", "Turn OFF")
+    # Sample rows for an empty history: shown only, never written to the store
+    if not action_log.latest(1):
+        for device, action in (
+            ("light1", "Turn ON"),
+            ("door1", "Unlock"),
+            ("thermostat", "Set to 24.0°C"),
+            ("fan", "Speed set to 2"),
+            ("light1", "Turn OFF"),
+        ):
+            action_log.append(device, action, datetime.now().strftime("%H:%M:%S"), user="Sample")
+        update_action_log_table()
  
  
     page.add(overview_view)
 
 # Run the app
-ft.app(target=main)
\ No newline at end of file
+if __name__ == "__main__":
+    # Merge setpoint runs left in the log by earlier drags (once per process,
+    # in the background; the store's watermark limits it to new rows)
+    threading.Thread(target=event_store.compact_runs, args=(SETPOINT_ACTIONS,), daemon=True).start()
+    ft.app(target=main)
\ No newline at end of file
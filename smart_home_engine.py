@@ -0,0 +1,1639 @@
+"""
+Az okosotthon motorja UI nélkül: eszköz registry, eseménynapló és
+-tár, pub/sub, szimulátorok, teljesítmény idősor, pillanatkép.
+
+    python smart_home_engine.py          # headless futás (Ctrl+C-ig)
+
+Flet importja nélkül töltődik be, így szerveren is fut; a Flet UI
+("Coding Day Individual Task.py") ennek a fogyasztója.
+"""
+
+import functools
+import heapq
+import os
+import threading
+import random
+import struct
+import sys
+import time
+import weakref
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict
+
+import event_archive
+import metrics
+import state_snapshot
+from compact_keys import PackedKeys, PackedStrings
+from energy import EnergyLedger, parse_value
+from event_store import EventStore
+from power_accounting import FAN_MAX_SPEED, HEATING_BASE_C, HEATING_SPAN_C, PowerAccounting, power_draw
+
+# Az asyncio csak a pub/sub kézbesítéshez, a NumPy csak a flotta
+# szimulátorhoz kell; importjuk a motor többi részének indulásánál is
+# drágább, ezért az első használat (PubSub._ensure_loop, FleetSimulator) tölti be.
+asyncio = None
+np = None
+
+# ---------------------------------------------------------------------
+# 13. OSZLOPOS ESZKÖZNYILVÁNTARTÁS (DEVICE REGISTRY)
+# ---------------------------------------------------------------------
+
+# Típusonként melyik kulcs hordozza az eszköz (egyetlen) állapotértékét.
+VALUE_FIELDS = {"light": "state", "door": "state", "thermo": "temp", "fan": "speed"}
+
+
+# Az állapot- és verzióoszlopok ekkora darabokban másolódnak íráskor.
+STATE_CHUNK = 256
+
+
+class DeviceView:
+    """
+    Könnyű nézet egy eszközre a registry oszlopai fölött; dict-szerűen
+    olvasható / írható (dev["temp"], dev["state"] = True). Pillanatkép
+    nélkül mindig a legfrissebb publikált verziót olvassa.
+    """
+
+    __slots__ = ("_reg", "_idx", "_snap")
+
+    def __init__(self, registry: "DeviceRegistry", idx: int, snap: "RegistrySnapshot | None" = None):
+        self._reg = registry
+        self._idx = idx
+        self._snap = snap
+
+    def __getitem__(self, key: str) -> Any:
+        reg, i = self._reg, self._idx
+        if key == "name":
+            return reg._names[i]
+        if key == "type":
+            return reg._type_names[reg._types[i]]
+        if key == "power_w":
+            return reg._power[i]
+        if key == "room":
+            return reg._room_names[reg._rooms[i]]
+        snap = self._snap or reg._root
+        if key == "version":
+            return snap.version(i)
+        field = VALUE_FIELDS.get(reg._type_names[reg._types[i]], "value")
+        if key != field:
+            raise KeyError(key)
+        return reg._decode(field, snap.value(i))
+
+    def __setitem__(self, key: str, value: Any):
+        reg, i = self._reg, self._idx
+        if key != VALUE_FIELDS.get(reg._type_names[reg._types[i]], "value"):
+            raise KeyError(key)
+        reg.set_value(i, value)
+
+    def __contains__(self, key: str) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+class RegistrySnapshot:
+    """
+    A registry egy publikált, megváltoztathatatlan verziója: globális
+    sorszám + az állapot- és verzióoszlopok darabjai. Az írók sosem
+    módosítják a már publikált darabokat, így az olvasó zár nélkül,
+    konzisztens képet lát.
+    """
+
+    __slots__ = ("_reg", "seq", "size", "_values", "_versions")
+
+    def __init__(self, registry: "DeviceRegistry", seq: int, size: int, values: tuple, versions: tuple):
+        self._reg = registry
+        self.seq = seq
+        self.size = size
+        self._values = values
+        self._versions = versions
+
+    def value(self, idx: int) -> float:
+        return self._values[idx // STATE_CHUNK][idx % STATE_CHUNK]
+
+    def version(self, idx: int) -> int:
+        return self._versions[idx // STATE_CHUNK][idx % STATE_CHUNK]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, dev_id: str) -> bool:
+        idx = self._reg._ids.get(dev_id)
+        return idx is not None and idx < self.size
+
+    def __getitem__(self, dev_id: str) -> DeviceView:
+        idx = self._reg._ids.position(dev_id)
+        if idx >= self.size:
+            raise KeyError(dev_id)
+        return DeviceView(self._reg, idx, self)
+
+    def get(self, dev_id: str, default=None):
+        idx = self._reg._ids.get(dev_id)
+        return default if idx is None or idx >= self.size else DeviceView(self._reg, idx, self)
+
+    def items(self):
+        ids = self._reg._ids
+        for idx in range(self.size):
+            yield ids[idx], DeviceView(self._reg, idx, self)
+
+
+class DeviceRegistry:
+    """
+    Oszlopos (struct-of-arrays) eszköztár: minden mező egy tömb, a típus
+    és a szoba internált kód. Típusonként / szobánként előre épített
+    index, így egy típus felsorolása O(k); minden írás növeli az eszköz
+    verziószámát.
+
+    A változó oszlopok (érték, verzió) copy-on-write darabokban vannak:
+    egy írás csak az érintett darabot másolja, és az új verziót egyetlen
+    értékadással (atomikusan) publikálja egy új globális sorszámmal.
+    Az olvasók a snapshot()-tal zár nélkül kapnak konzisztens képet.
+
+    Az azonosítók és a nevek tömör táblákban (compact_keys) vannak:
+    generált flottáknál (előtag + sorszám) eszközönként néhány bájt,
+    külön str objektumok és dict bejegyzések nélkül.
+    """
+
+    __slots__ = (
+        "_ids", "_names", "_types", "_power", "_root",
+        "_rooms", "_type_codes", "_type_names", "_room_codes", "_room_names",
+        "_by_type", "_by_room", "_lock", "_accounting", "on_change", "on_write",
+    )
+
+    def __init__(self):
+        self._ids = PackedKeys()
+        self._names = PackedStrings()
+        self._types = array("B")
+        self._power = array("f")
+        self._rooms = array("H")
+        self._root = RegistrySnapshot(self, 0, 0, (), ())
+        self._type_codes: dict[str, int] = {}
+        self._type_names: list[str] = []
+        self._room_codes: dict[str, int] = {"": 0}
+        self._room_names: list[str] = [""]
+        self._by_type: dict[int, array] = {}
+        self._by_room: dict[int, array] = {}
+        self._lock = threading.Lock()   # csak az írókat sorosítja
+        self._accounting: PowerAccounting | None = None
+        self.on_change = None   # callback(dev_id) minden írás után
+        self.on_write = None    # callback(idx, érték) az írási zár alatt, írási sorrendben
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Dict[str, Any]]) -> "DeviceRegistry":
+        reg = cls()
+        for dev_id, dev in data.items():
+            field = VALUE_FIELDS.get(dev["type"], "value")
+            reg.add(
+                dev_id,
+                dev["name"],
+                dev["type"],
+                power_w=dev.get("power_w", 0),
+                value=dev.get(field, 0),
+                room=dev.get("room", ""),
+            )
+        return reg
+
+    @classmethod
+    def from_state(cls, state: dict) -> "DeviceRegistry":
+        """Registry a state() kimenetéből (pl. pillanatképből), oszloponként másolva."""
+        reg = cls()
+        ids = state["ids"]
+        n = len(ids)
+        reg._ids = PackedKeys(ids)
+        reg._names = PackedStrings(state["names"])
+        reg._types = state["types"]
+        reg._power = state["power"]
+        reg._rooms = state["rooms"]
+        reg._type_names = list(state["type_names"])
+        reg._type_codes = {t: i for i, t in enumerate(reg._type_names)}
+        reg._room_names = list(state["room_names"])
+        reg._room_codes = {r: i for i, r in enumerate(reg._room_names)}
+        values, versions = state["values"], state["versions"]
+        reg._root = RegistrySnapshot(
+            reg,
+            state["seq"],
+            n,
+            tuple(values[c:c + STATE_CHUNK] for c in range(0, n, STATE_CHUNK)),
+            tuple(versions[c:c + STATE_CHUNK] for c in range(0, n, STATE_CHUNK)),
+        )
+        reg._by_type = cls._split_index(state["type_index"], state["type_index_sizes"])
+        reg._by_room = cls._split_index(state["room_index"], state["room_index_sizes"])
+        return reg
+
+    @staticmethod
+    def _join_index(index: dict[int, array]) -> tuple[array, array]:
+        joined, sizes = array("I"), array("I")
+        for code in sorted(index):
+            sizes.extend((code, len(index[code])))
+            joined.extend(index[code])
+        return joined, sizes
+
+    @staticmethod
+    def _split_index(joined: array, sizes: array) -> dict[int, array]:
+        index, start = {}, 0
+        for code, size in zip(sizes[0::2], sizes[1::2]):
+            index[code] = joined[start:start + size]
+            start += size
+        return index
+
+    def state(self) -> dict:
+        """Konzisztens oszlopos másolat (az írók csak a másolás idejére várnak)."""
+        with self._lock:
+            root = self._root
+            n = root.size
+            values, versions = array("d"), array("Q")
+            for chunk in root._values:
+                values.extend(chunk)
+            for chunk in root._versions:
+                versions.extend(chunk)
+            type_index, type_sizes = self._join_index(self._by_type)
+            room_index, room_sizes = self._join_index(self._by_room)
+            state = {
+                "seq": root.seq,
+                "ids": self._ids[:n],
+                "names": self._names[:n],
+                "type_names": list(self._type_names),
+                "room_names": list(self._room_names),
+                "types": self._types[:n],
+                "power": self._power[:n],
+                "rooms": self._rooms[:n],
+                "values": values,
+                "versions": versions,
+                "type_index": type_index,
+                "type_index_sizes": type_sizes,
+                "room_index": room_index,
+                "room_index_sizes": room_sizes,
+            }
+            # Az elszámolás az írási zár alatt frissül, így itt a registryvel egyező állapotú
+            if self._accounting is not None:
+                state["power_draw_mw"] = self._accounting.draw_mw()
+            return state
+
+    @staticmethod
+    def _decode(field: str, raw: float) -> Any:
+        if field == "state":
+            return bool(raw)
+        if field == "speed":
+            return int(raw)
+        return raw
+
+    def snapshot(self) -> RegistrySnapshot:
+        """Az aktuális publikált verzió (zár nélkül)."""
+        return self._root
+
+    def add(self, dev_id: str, name: str, dev_type: str, power_w: float = 0, value: Any = 0, room: str = "") -> int:
+        with self._lock:
+            if dev_id in self._ids:
+                raise ValueError(f"Duplicate device id: {dev_id}")
+            t = self._type_codes.get(dev_type)
+            if t is None:
+                t = self._type_codes[dev_type] = len(self._type_names)
+                self._type_names.append(dev_type)
+            r = self._room_codes.get(room)
+            if r is None:
+                r = self._room_codes[room] = len(self._room_names)
+                self._room_names.append(room)
+
+            idx = len(self._ids)
+            self._ids.append(dev_id)
+            self._names.append(name)
+            self._types.append(t)
+            self._power.append(power_w)
+            self._rooms.append(r)
+
+            root = self._root
+            c = idx // STATE_CHUNK
+            if c < len(root._values):
+                values = array("d", root._values[c])
+                versions = array("Q", root._versions[c])
+                values.append(float(value))
+                versions.append(0)
+                new_values = root._values[:c] + (values,)
+                new_versions = root._versions[:c] + (versions,)
+            else:
+                new_values = root._values + (array("d", [float(value)]),)
+                new_versions = root._versions + (array("Q", [0]),)
+            self._root = RegistrySnapshot(self, root.seq + 1, idx + 1, new_values, new_versions)
+
+            # Az index csak a publikálás után látszik, így az olvasó sosem lát félkész eszközt
+            self._ids.register(idx)
+            self._by_type.setdefault(t, array("I")).append(idx)
+            self._by_room.setdefault(r, array("I")).append(idx)
+            if self.on_write is not None:
+                self.on_write(idx, float(value))
+            return idx
+
+    def _publish(self, idx: int, value: float) -> RegistrySnapshot:
+        # Hívó fogja a _lock-ot: csak az érintett darab másolódik
+        root = self._root
+        c, off = divmod(idx, STATE_CHUNK)
+        values = array("d", root._values[c])
+        versions = array("Q", root._versions[c])
+        values[off] = value
+        versions[off] += 1
+        self._root = RegistrySnapshot(
+            self,
+            root.seq + 1,
+            root.size,
+            root._values[:c] + (values,) + root._values[c + 1:],
+            root._versions[:c] + (versions,) + root._versions[c + 1:],
+        )
+        if self.on_write is not None:
+            self.on_write(idx, value)
+        return self._root
+
+    def set_value(self, idx: int, value: Any):
+        with self._lock:
+            self._publish(idx, float(value))
+        if self.on_change is not None:
+            self.on_change(self._ids[idx])
+
+    def modify(self, dev_id: str, fn) -> Any:
+        """
+        Atomikus olvasás-módosítás-írás: az új érték fn(régi érték).
+        Ha fn a régi értéket adja vissza, nincs írás (és értesítés sem).
+        """
+        idx = self._ids.position(dev_id)
+        field = VALUE_FIELDS.get(self._type_names[self._types[idx]], "value")
+        with self._lock:
+            old = self._decode(field, self._root.value(idx))
+            new = fn(old)
+            if new == old:
+                return new
+            self._publish(idx, float(new))
+        if self.on_change is not None:
+            self.on_change(dev_id)
+        return new
+
+    # --- dict-kompatibilis olvasás --------------------------------------
+
+    def __len__(self) -> int:
+        return self._root.size
+
+    def __contains__(self, dev_id: str) -> bool:
+        return dev_id in self._ids
+
+    def __iter__(self):
+        return iter(self._ids[: self._root.size])
+
+    def __getitem__(self, dev_id: str) -> DeviceView:
+        return DeviceView(self, self._ids.position(dev_id))
+
+    def get(self, dev_id: str, default=None):
+        idx = self._ids.get(dev_id)
+        return default if idx is None else DeviceView(self, idx)
+
+    def items(self):
+        for idx in range(self._root.size):
+            yield self._ids[idx], DeviceView(self, idx)
+
+    # --- indexelt felsorolás --------------------------------------------
+
+    def of_type(self, *types: str):
+        """(dev_id, nézet) párok a megadott típus(ok)ból, O(k)."""
+        for dev_type in types:
+            t = self._type_codes.get(dev_type)
+            for idx in self._by_type.get(t, ()) if t is not None else ():
+                yield self._ids[idx], DeviceView(self, idx)
+
+    def in_room(self, room: str):
+        r = self._room_codes.get(room)
+        for idx in self._by_room.get(r, ()) if r is not None else ():
+            yield self._ids[idx], DeviceView(self, idx)
+
+    def version(self, dev_id: str) -> int:
+        return self._root.version(self._ids.position(dev_id))
+
+    def attach_power(self, accounting: PowerAccounting, draw_mw: array | None = None):
+        """
+        A teljesítmény-elszámolást a registry írásaihoz köti: a meglévő
+        eszközök felvétele után minden írás (és új eszköz) az írási zár
+        alatt, sorrendhelyesen jut el hozzá. draw_mw: a registryvel együtt
+        mentett eszközönkénti felvétel (state()), így nem kell újraszámolni.
+        """
+        with self._lock:
+            root = self._root
+            type_names = self._type_names
+            if draw_mw is not None and not len(accounting) and len(draw_mw) == root.size:
+                accounting.load(
+                    self._ids[:root.size],
+                    map(type_names.__getitem__, self._types),
+                    self._power,
+                    draw_mw,
+                )
+            else:
+                accounting.add_many(
+                    (self._ids[idx], type_names[self._types[idx]], self._power[idx], root.value(idx))
+                    for idx in range(len(accounting), root.size)
+                )
+            self._accounting = accounting
+
+            def on_write(idx: int, value: float):
+                if idx < len(accounting):
+                    accounting.update_at(idx, value)
+                else:
+                    accounting.add(self._ids[idx], self._type_names[self._types[idx]], self._power[idx], value)
+
+            self.on_write = on_write
+
+    @property
+    def seq(self) -> int:
+        """Globális sorszám: minden publikált írással eggyel nő."""
+        return self._root.seq
+
+
+# ---------------------------------------------------------------------
+# 1–2. DEVICE DICTIONARY + ALAP ADATOK
+# ---------------------------------------------------------------------
+
+# Állapot pillanatkép: induláskor innen folytatódik a registry, a napló
+# vége és a teljesítmény idősor; üres útvonallal kikapcsolható.
+SNAPSHOT_PATH = os.environ.get("SMARTHOME_SNAPSHOT", "smart_home_state.snap")
+SNAPSHOT_INTERVAL = float(os.environ.get("SMARTHOME_SNAPSHOT_INTERVAL", "30"))
+_snapshot = state_snapshot.read(SNAPSHOT_PATH) if SNAPSHOT_PATH else {}
+
+
+def _restore(section: str, fn):
+    """Pillanatkép szekció visszatöltése fn-nel; hiányzó vagy nem illeszkedő szekciónál None."""
+    if section not in _snapshot:
+        return None
+    try:
+        return fn(_snapshot[section])
+    except (KeyError, ValueError, TypeError, IndexError) as ex:
+        print(f"Snapshot section {section!r} ignored: {ex!r}")
+        return None
+
+
+DEFAULT_DEVICES = {
+    "light1": {
+        "name": "Living Room Light",
+        "type": "light",
+        "state": False,
+        "power_w": 60,
+    },
+    "door1": {
+        "name": "Front Door",
+        "type": "door",
+        "state": True,    # True = LOCKED
+        "power_w": 0,
+    },
+    "thermo1": {
+        "name": "Thermostat",
+        "type": "thermo",
+        "temp": 22.0,
+        "power_w": 120,
+    },
+    "fan1": {
+        "name": "Ceiling Fan",
+        "type": "fan",
+        "speed": 0,
+        "power_w": 50,
+    },
+}
+
+_restored_registry = _restore("registry", DeviceRegistry.from_state)
+devices = _restored_registry or DeviceRegistry.from_dict(DEFAULT_DEVICES)
+
+# Élő fogyasztás: eszközönként, típusonként és a házra, O(1) frissítéssel
+power_accounting = PowerAccounting()
+devices.attach_power(
+    power_accounting,
+    _snapshot["registry"].get("power_draw_mw") if _restored_registry else None,
+)
+
+
+# ---------------------------------------------------------------------
+# 11. KORLÁTOS ESEMÉNYNAPLÓ (RING BUFFER)
+# ---------------------------------------------------------------------
+
+# Telepítésenként állítható kapacitás (környezeti változóból). A gyűrűből
+# kiesett régebbi előzményt a tartós tár adja ((device_id, ts) index).
+EVENT_LOG_CAPACITY = int(os.environ.get("SMARTHOME_EVENT_CAPACITY", "10000"))
+
+# Egy rekord: monoton időbélyeg (ns), eszköz- és akciókód, ugyanazon eszköz
+# előző eseményének sorszáma (-1: nincs) – 24 bájt, igazítás nélkül.
+EVENT_RECORD = struct.Struct("<qIIq")
+
+
+@functools.lru_cache(maxsize=4096)
+def format_second(sec: int) -> str:
+    """Egész másodperc szövegesen; a megjelenített sorok zöme néhány másodpercen osztozik."""
+    return datetime.fromtimestamp(sec).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class EventRing:
+    """
+    Fix kapacitású eseménynapló egyetlen bytearray-ben: rekordonként
+    EVENT_RECORD (monoton ns időbélyeg, internált eszköz- és akciókód),
+    mellette a részletek internált szövegre mutató referenciája.
+    Hozzáfűzés és "utolsó N" olvasás O(1) / O(N); az idő szöveges
+    alakja csak olvasáskor, gyorsítótárból készül.
+
+    Eszközönkénti nézet: minden rekord az eszköz előző rekordjára mutat,
+    a _last kódonként az utolsó sorszámot tartja. Eszközönként így csak
+    8 bájt többlet van (külön objektum nélkül), és egy eszköz utolsó N
+    eseménye O(N) lépés visszafelé a láncon, amíg a gyűrűben van.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._buf = bytearray(EVENT_RECORD.size * capacity)
+        # A részletek szabad szövegek: fix szélességen csak csonkolva férnének el,
+        # így internált referenciaként tárolódnak (az ismétlődők egy példányban).
+        self._details: list[str] = [""] * capacity
+        # Monoton óra -> falióra átszámítás (megjelenítéshez, tartós tárhoz)
+        self._mono0 = time.monotonic_ns()
+        self._wall0 = time.time()
+        self._codes: dict[str, int] = {}
+        self._strings: list[str] = []
+        self._last = array("q")   # kód -> az eszköz utolsó rekordjának sorszáma
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def _intern(self, s: str) -> int:
+        code = self._codes.get(s)
+        if code is None:
+            code = len(self._strings)
+            self._codes[s] = code
+            self._strings.append(s)
+            self._last.append(-1)
+        return code
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    def wall_time(self, ns: int) -> float:
+        """Monoton ns időbélyeg -> Unix időbélyeg (mp)."""
+        return self._wall0 + (ns - self._mono0) / 1e9
+
+    def monotonic_ns(self, ts: float) -> int:
+        """Unix időbélyeg -> a gyűrű monoton ns skálája (wall_time inverze)."""
+        return self._mono0 + round((ts - self._wall0) * 1e9)
+
+    def append(self, ns: int, device_id: str, action: str, details: str = "") -> int:
+        with self._lock:
+            seq = self._count
+            i = seq % self.capacity
+            dev = self._intern(device_id)
+            EVENT_RECORD.pack_into(
+                self._buf, i * EVENT_RECORD.size, ns, dev, self._intern(action), self._last[dev]
+            )
+            self._last[dev] = seq
+            self._details[i] = sys.intern(details)
+            self._count += 1
+            return seq
+
+    def extend(self, ns: int, rows) -> None:
+        """(device_id, action, details) sorok hozzáfűzése közös időbélyeggel, egyetlen zárolással."""
+        pack_into, size = EVENT_RECORD.pack_into, EVENT_RECORD.size
+        with self._lock:
+            last = self._last
+            for device_id, action, details in rows:
+                seq = self._count
+                i = seq % self.capacity
+                dev = self._intern(device_id)
+                pack_into(self._buf, i * size, ns, dev, self._intern(action), last[dev])
+                last[dev] = seq
+                self._details[i] = sys.intern(details)
+                self._count += 1
+
+    def _record(self, seq: int) -> dict:
+        i = seq % self.capacity
+        ns, dev_code, act_code, _ = EVENT_RECORD.unpack_from(self._buf, i * EVENT_RECORD.size)
+        device_id = self._strings[dev_code]
+        dev = devices.get(device_id)
+        ts = self.wall_time(ns)
+        return {
+            "ts": ts,
+            "time": format_second(int(ts)),
+            "device_id": device_id,
+            "device_name": dev["name"] if dev else device_id,
+            "action": self._strings[act_code],
+            "details": self._details[i],
+        }
+
+    def last(self, n: int) -> list[dict]:
+        """Az utolsó n esemény, időrendben (régebbi elöl)."""
+        with self._lock:
+            n = min(n, len(self))
+            return [self._record(s) for s in range(self._count - n, self._count)]
+
+    def last_for(self, device_id: str, n: int) -> tuple[list[dict], bool]:
+        """
+        Egy eszköz utolsó n eseménye, a legújabb elöl. A második érték
+        True, ha a gyűrű az eszköz teljes (n-ig terjedő) előzményét adta;
+        False, ha korábbi eseményei már kiestek (ezeket a tartós tár adja).
+        """
+        with self._lock:
+            code = self._codes.get(device_id)
+            seq = -1 if code is None else self._last[code]
+            oldest = self._count - self.capacity
+            seqs = []
+            while seq >= 0 and len(seqs) < n:
+                if seq < oldest:
+                    return [self._record(s) for s in seqs], False
+                seqs.append(seq)
+                seq = EVENT_RECORD.unpack_from(self._buf, (seq % self.capacity) * EVENT_RECORD.size)[3]
+            return [self._record(s) for s in seqs], True
+
+    def state(self) -> dict:
+        """A gyűrű teljes állapota pillanatképhez, egyetlen rövid zárolással."""
+        with self._lock:
+            state = {
+                "record_size": EVENT_RECORD.size,
+                "capacity": self.capacity,
+                "count": self._count,
+                "mono0": self._mono0,
+                "wall0": self._wall0,
+                "strings": list(self._strings),
+                "buf": bytes(self._buf),
+            }
+            details = list(self._details)
+        # A részletek záron kívül, szövegtáblára + kódokra bontva
+        table = list(dict.fromkeys(details))
+        codes = dict(zip(table, range(len(table))))
+        state["details"] = table
+        state["detail_codes"] = array("I", map(codes.__getitem__, details))
+        return state
+
+    def restore(self, state: dict):
+        """
+        state() kimenetének visszatöltése egy még üres gyűrűbe. A rekordok
+        időbélyegei a mostani monoton óra skálájára tolódnak; eltérő
+        kapacitásnál a rekordok egyenként fűződnek be.
+        """
+        if state.get("record_size") != EVENT_RECORD.size:
+            raise ValueError("event record format changed")
+        delta = (self._mono0 - state["mono0"]) - round((self._wall0 - state["wall0"]) * 1e9)
+        details = list(map(state["details"].__getitem__, state["detail_codes"]))
+        strings, count = state["strings"], state["count"]
+
+        if state["capacity"] != self.capacity:
+            capacity, buf = state["capacity"], state["buf"]
+            for seq in range(max(0, count - capacity), count):
+                i = seq % capacity
+                ns, dev_code, act_code, _ = EVENT_RECORD.unpack_from(buf, i * EVENT_RECORD.size)
+                self.append(ns + delta, strings[dev_code], strings[act_code], details[i])
+            return
+
+        # Rekordonként három q: [időbélyeg, eszköz- + akciókód, előző] – csak az elsők tolódnak
+        words = array("q", state["buf"])
+        words[0::3] = array("q", map(delta.__add__, words[0::3]))
+        # Eszközönként az utolsó sorszám a megmaradt rekordokból (régebbiről újabbra)
+        last = array("q", [-1]) * len(strings)
+        capacity = self.capacity
+        for seq in range(max(0, count - capacity), count):
+            last[words[3 * (seq % capacity) + 1] & 0xFFFFFFFF] = seq
+        with self._lock:
+            self._buf = bytearray(words)
+            self._details = details
+            self._strings = list(strings)
+            self._codes = dict(zip(self._strings, range(len(self._strings))))
+            self._last = last
+            self._count = count
+
+
+event_log = EventRing(EVENT_LOG_CAPACITY)
+_restore("events", event_log.restore)
+
+# Tartós napló: minden add_log ide is beíródik, az oldalak innen kérdeznek.
+event_store = EventStore(os.environ.get("SMARTHOME_DB", "smart_home_events.db"))
+
+# A statisztika oldal "Export" gombja ide ír (event_archive formátumok)
+EXPORT_DIR = os.environ.get("SMARTHOME_EXPORT_DIR", "exports")
+
+metrics.gauge("event_log_size", lambda: len(event_log))
+metrics.gauge("event_store_pending", lambda: len(event_store._pending))
+
+# ---------------------------------------------------------------------
+# 6. ASZINKRON PUB/SUB RENDSZER
+# ---------------------------------------------------------------------
+
+# A szinkron callbackek közös, korlátos munkáskészlete: a szálszám nem nő a
+# munkamenetekkel (egy munkamenet = két feliratkozás)
+PUBSUB_WORKERS = int(os.environ.get("SMARTHOME_PUBSUB_WORKERS", "8"))
+_callback_pool: ThreadPoolExecutor | None = None
+_callback_pool_lock = threading.Lock()
+
+
+def _get_callback_pool() -> ThreadPoolExecutor:
+    global _callback_pool
+    with _callback_pool_lock:
+        if _callback_pool is None:
+            _callback_pool = ThreadPoolExecutor(PUBSUB_WORKERS, thread_name_prefix="pubsub")
+        return _callback_pool
+
+
+class Subscription:
+    """
+    Egy feliratkozó saját, korlátos sora. Ha a feliratkozó lemarad, a
+    policy dönt: "drop_oldest" / "drop_newest" eldobja a legrégebbi ill.
+    az új üzenetet, "coalesce" kulcsonként csak a legutolsót tartja meg.
+
+    weak=True esetén a broker csak gyenge referenciát tart a callbackre:
+    ha a tulajdonosa (pl. egy munkamenet) megszűnik, a feliratkozás a
+    következő kézbesítéskor magától törlődik.
+
+    Szinkron callback a modul közös, korlátos készletén (PUBSUB_WORKERS)
+    fut. A kézbesítő task megvárja, így feliratkozásonként legfeljebb egy
+    callback fut egyszerre: a sorrend megmarad, és egy lassú listener
+    legfeljebb egy munkást foglal.
+    """
+
+    POLICIES = ("drop_oldest", "drop_newest", "coalesce")
+
+    def __init__(self, broker: "PubSub", callback, topic, maxsize: int, policy: str, key, weak: bool = False):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown policy: {policy}")
+        self.broker = broker
+        if not weak:
+            self._callback = lambda: callback
+        elif hasattr(callback, "__self__"):
+            self._callback = weakref.WeakMethod(callback)
+        else:
+            self._callback = weakref.ref(callback)
+        self._is_coro = asyncio.iscoroutinefunction(callback)
+        self.topic = topic
+        self.maxsize = maxsize
+        self.policy = policy
+        self.key = key or (lambda data: data.get("type"))
+
+        self._lock = threading.Lock()
+        self._queue: deque = deque()
+        self._pending: dict = {}   # coalesce: kulcs -> (t_pub, data)
+        self._wakeup: "asyncio.Event | None" = None
+        self._signaled = False
+        self._task = None
+        self.closed = False
+
+        self.delivered = 0
+        self.dropped = 0
+        self.latencies: deque = deque(maxlen=1024)
+
+    def _offer(self, t_pub: float, data: dict) -> bool:
+        """Berakja az üzenetet a sorba; True, ha a kézbesítőt fel kell ébreszteni."""
+        with self._lock:
+            if self.policy == "coalesce":
+                k = self.key(data)
+                if k in self._pending:
+                    self._pending[k] = (t_pub, data)
+                    self.dropped += 1
+                else:
+                    if len(self._pending) >= self.maxsize:
+                        del self._pending[next(iter(self._pending))]
+                        self.dropped += 1
+                    self._pending[k] = (t_pub, data)
+            else:
+                if len(self._queue) >= self.maxsize:
+                    self.dropped += 1
+                    if self.policy == "drop_newest":
+                        return False
+                    self._queue.popleft()
+                self._queue.append((t_pub, data))
+
+            if self._signaled:
+                return False
+            self._signaled = True
+            return True
+
+    def _pop(self):
+        with self._lock:
+            if self._queue:
+                return self._queue.popleft()
+            if self._pending:
+                k = next(iter(self._pending))
+                return self._pending.pop(k)
+            self._signaled = False
+            return None
+
+    @property
+    def callback(self):
+        return self._callback()
+
+    async def _deliver(self):
+        loop = asyncio.get_running_loop()
+        pool = None if self._is_coro else _get_callback_pool()
+        while not self.closed:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while not self.closed:
+                item = self._pop()
+                if item is None:
+                    break
+                t_pub, data = item
+                latency = time.perf_counter() - t_pub
+                self.latencies.append(latency)
+                if metrics.ENABLED:
+                    metrics.observe("pubsub_deliver_latency_seconds", latency, topic=self.topic or "*")
+                callback = self._callback()
+                if callback is None:
+                    # A gyengén tartott feliratkozó megszűnt (pl. lezárt munkamenet)
+                    self.broker.unsubscribe(self)
+                    return
+                self.delivered += 1
+                try:
+                    if self._is_coro:
+                        await callback(data)
+                    else:
+                        # A lassú (szinkron) listener csak a saját sorát tartja fel.
+                        await loop.run_in_executor(pool, callback, data)
+                except Exception as ex:
+                    print(f"PubSub listener error: {ex!r}")
+                # Várakozás közben ne tartsuk életben a callbacket
+                callback = None
+
+    def unsubscribe(self):
+        self.broker.unsubscribe(self)
+
+    def backlog(self) -> int:
+        with self._lock:
+            return len(self._queue) + len(self._pending)
+
+    def stats(self) -> dict:
+        lat = sorted(self.latencies)
+        queued = self.backlog()
+        return {
+            "topic": self.topic,
+            "policy": self.policy,
+            "queued": queued,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "latency_avg_ms": 1000 * sum(lat) / len(lat) if lat else 0.0,
+            "latency_p99_ms": 1000 * lat[int(0.99 * (len(lat) - 1))] if lat else 0.0,
+            "latency_max_ms": 1000 * lat[-1] if lat else 0.0,
+        }
+
+
+class PubSub:
+    """
+    Aszinkron, topic alapú broker. A kézbesítés egy saját asyncio
+    eseményhurokban fut, minden feliratkozónak külön sora van, így a
+    publish() sosem vár a fogyasztókra.
+    """
+
+    def __init__(self):
+        self.listeners: list[Subscription] = []
+        # topic -> az érintett feliratkozók (a "minden topic" feliratkozókkal együtt)
+        self._routes: dict[str, tuple[Subscription, ...]] = {}
+        self._wildcard: tuple[Subscription, ...] = ()
+        self._loop: "asyncio.AbstractEventLoop | None" = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def _reroute(self):
+        # Hívó fogja a _lock-ot; a publish() zár nélkül, egy lookup-pal olvassa
+        wildcard = tuple(s for s in self.listeners if s.topic is None)
+        topics = {s.topic for s in self.listeners if s.topic is not None}
+        self._routes = {
+            t: tuple(s for s in self.listeners if s.topic in (t, None)) for t in topics
+        }
+        self._wildcard = wildcard
+
+    def _ensure_loop(self) -> "asyncio.AbstractEventLoop":
+        global asyncio
+        with self._lock:
+            if self._loop is None:
+                import asyncio
+
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def subscribe(
+        self,
+        callback,
+        topic: str | None = None,
+        maxsize: int = 100,
+        policy: str = "drop_oldest",
+        key=None,
+        weak: bool = False,
+    ) -> Subscription:
+        """Feliratkozás egy topicra (None = minden topic)."""
+        loop = self._ensure_loop()
+        sub = Subscription(self, callback, topic, maxsize, policy, key, weak)
+
+        def start():
+            sub._wakeup = asyncio.Event()
+            sub._task = loop.create_task(sub._deliver())
+            if sub._signaled:
+                sub._wakeup.set()
+
+        loop.call_soon_threadsafe(start)
+        with self._lock:
+            self.listeners = self.listeners + [sub]
+            self._reroute()
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self.listeners = [s for s in self.listeners if s is not sub]
+            self._reroute()
+        sub.closed = True
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(lambda: sub._task and sub._task.cancel())
+
+    def close(self):
+        """
+        Minden feliratkozás megszüntetése és a kézbesítő hurok leállítása
+        (pl. tesztek, benchmarkok végén, a publisherek leállta után).
+        Utána a következő subscribe új hurkot indít.
+        """
+        for sub in self.listeners:
+            self.unsubscribe(sub)
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        # A megszakított kézbesítők még lefutnak
+        pending = asyncio.all_tasks(loop)
+        if pending:
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        loop.close()
+
+    def publish(self, data: dict, topic: str | None = None):
+        """
+        Nem blokkol: csak sorba teszi az üzenetet minden érintett
+        feliratkozónál. Ugyanaz az (egyszer elkészült) üzenet-objektum megy
+        minden feliratkozónak, másolás nélkül.
+        """
+        topic = topic or data.get("type")
+        t_pub = time.perf_counter()
+        for sub in self._routes.get(topic, self._wildcard):
+            if sub._offer(t_pub, data) and sub._wakeup is not None:
+                self._loop.call_soon_threadsafe(sub._wakeup.set)
+        if metrics.ENABLED:
+            metrics.observe("pubsub_publish_seconds", time.perf_counter() - t_pub, topic=topic)
+
+    def stats(self) -> list[dict]:
+        return [sub.stats() for sub in self.listeners]
+
+global_pubsub = PubSub()
+
+
+class SessionLink:
+    """
+    Egy munkamenet (böngészőfül) kapcsolata a közös, folyamatonként egyszer
+    induló szimulációhoz. A broker csak gyenge referenciát kap a
+    callbackekre, az erőset ez az objektum tartja (őt pedig a page
+    eseménykezelői). detach() – kapcsolat bontásakor – azonnal törli a
+    feliratkozásokat, attach() újracsatlakozáskor visszaállítja őket;
+    egy eltűnt munkamenet feliratkozásai a GC után maguktól törlődnek.
+    """
+
+    def __init__(self, broker: PubSub):
+        self.broker = broker
+        self._specs: list[tuple] = []
+        self._subs: list[Subscription] = []
+        self.attached = True
+
+    def subscribe(self, callback, **kwargs):
+        self._specs.append((callback, kwargs))
+        if self.attached:
+            self._subs.append(self.broker.subscribe(callback, weak=True, **kwargs))
+
+    def attach(self):
+        if self.attached:
+            return
+        self.attached = True
+        self._subs = [self.broker.subscribe(cb, weak=True, **kw) for cb, kw in self._specs]
+
+    def detach(self):
+        self.attached = False
+        subs, self._subs = self._subs, []
+        for sub in subs:
+            sub.unsubscribe()
+
+metrics.gauge(
+    "pubsub_backlog_max",
+    lambda: max((s.backlog() for s in global_pubsub.listeners), default=0),
+)
+metrics.gauge("pubsub_subscribers", lambda: len(global_pubsub.listeners))
+metrics.gauge("power_total_watts", lambda: power_accounting.total_w)
+
+# Minden eszközírásról "device" topicú értesítés megy (a UI ebből patchel).
+devices.on_change = lambda dev_id: global_pubsub.publish({"type": "device", "device_id": dev_id})
+
+
+# ---------------------------------------------------------------------
+# 9. ASYNC ESZKÖZ / POWER SZIMULÁTOR (HÁTTÉRTASKOK)
+# ---------------------------------------------------------------------
+
+class ScheduledTask:
+    """Egy periodikus task a közös ütemezőben."""
+
+    __slots__ = ("fn", "args", "interval", "jitter", "base", "cancelled")
+
+    def __init__(self, fn, args, interval: float, jitter: float, base: float):
+        self.fn = fn
+        self.args = args
+        self.interval = interval
+        self.jitter = jitter
+        self.base = base
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Scheduler:
+    """
+    Egyetlen szálon futó, heap alapú időzítő az összes periodikus
+    szimulációs taskhoz. Taskonként saját intervallum és jitter; egy
+    task ütemezése O(log n), így több ezer eszköz sem igényel külön szálat.
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[float, int, ScheduledTask]] = []
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._running = False
+        self._thread: threading.Thread | None = None
+
+    def _push(self, due: float, task: ScheduledTask):
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, task))
+
+    def _due(self, task: ScheduledTask) -> float:
+        if task.jitter:
+            return task.base + random.uniform(-task.jitter, task.jitter)
+        return task.base
+
+    def every(self, interval: float, fn, *args, jitter: float = 0.0, delay: float | None = None) -> ScheduledTask:
+        """fn(*args) futtatása `interval` másodpercenként (±jitter)."""
+        first = time.monotonic() + (interval if delay is None else delay)
+        task = ScheduledTask(fn, args, interval, jitter, first)
+        with self._cond:
+            self._push(self._due(task), task)
+            self._cond.notify()
+        return task
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None):
+        """Leállítja az ütemezőt; a futó task még befejeződik."""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    due, _, task = self._heap[0]
+                    if task.cancelled:
+                        heapq.heappop(self._heap)
+                        continue
+                    wait = due - time.monotonic()
+                    if wait <= 0:
+                        heapq.heappop(self._heap)
+                        break
+                    self._cond.wait(wait)
+                if not self._running:
+                    return
+
+            try:
+                task.fn(*task.args)
+            except Exception as ex:
+                print(f"Scheduler task error: {ex!r}")
+
+            # Fix ütemű újraütemezés; ha lemaradtunk, nem pótoljuk a kihagyott tickeket.
+            now = time.monotonic()
+            task.base += task.interval
+            if task.base < now:
+                task.base = now + task.interval
+            with self._cond:
+                if not task.cancelled:
+                    self._push(self._due(task), task)
+
+
+scheduler = Scheduler()
+
+SIMULATION_INTERVAL = 5.0
+
+# Rögzített seeddel (SMARTHOME_SEED) a szimulált változások sorozata reprodukálható.
+SIM_SEED = os.environ.get("SMARTHOME_SEED")
+sim_random = random.Random(None if SIM_SEED is None else int(SIM_SEED))
+
+
+def simulate_power(ts: float | None = None):
+    """Periodikus task: a ház pillanatnyi fogyasztását mintavételezi (5 mp-enként)."""
+    total = power_accounting.total_w
+    power_series.ingest(time.time() if ts is None else ts, total)
+    global_pubsub.publish({"type": "power", "value": total})
+
+
+def simulate_device_changes():
+    """
+    Periodikus task: Véletlenszerűen változtatja a termosztát és a ventilátor
+    értékeit 5 másodpercenként.
+    """
+    # Olvasás-módosítás-írás a registry zárja alatt (egy közben jött
+    # felhasználói beállítást nem ír felül); naplózás az írás után, a
+    # ténylegesen beírt értékkel.
+    # --- Termosztát ---
+    temp_change = sim_random.choice([-0.5, 0.0, 0.5])
+    old = []
+
+    def step_temp(temp: float) -> float:
+        old.append(temp)
+        return max(16.0, min(30.0, round(temp + temp_change, 1)))
+
+    new_temp = devices.modify("thermo1", step_temp)
+    if new_temp != old[0]:
+        add_log("thermo1", "Auto Change", f"Temp changed to {new_temp:.1f} °C")
+
+    # --- Ventilátor ---
+    speed_change = sim_random.choice([-1, 0, 1])
+    old.clear()
+
+    def step_speed(speed: int) -> int:
+        old.append(speed)
+        return max(0, min(3, speed + speed_change))
+
+    new_speed = devices.modify("fan1", step_speed)
+    if new_speed != old[0]:
+        add_log("fan1", "Auto Change", f"Speed changed to {new_speed}")
+
+
+_simulator_lock = threading.Lock()
+_simulator_tasks: list[ScheduledTask] = []
+
+
+def start_simulator():
+    """
+    Beütemezi a teljesítmény- és az eszközváltozás szimulátorokat.
+    Folyamatonként egyszer: a további munkamenetek hívása csak a már
+    futó közös szimulációhoz csatlakozik.
+    """
+    with _simulator_lock:
+        if not _simulator_tasks:
+            _simulator_tasks.append(scheduler.every(SIMULATION_INTERVAL, simulate_power, delay=0))
+            _simulator_tasks.append(scheduler.every(SIMULATION_INTERVAL, simulate_device_changes))
+            _simulator_tasks.append(scheduler.every(COMPACTION_INTERVAL, compact_setpoint_log))
+            _simulator_tasks.append(scheduler.every(ENERGY_COMPACTION_INTERVAL, energy_ledger.compact))
+            if FLEET_SIZE:
+                fleet = FleetSimulator(FLEET_SIZE, FLEET_SIZE, accounting=power_accounting)
+                _simulator_tasks.append(scheduler.every(SIMULATION_INTERVAL, fleet.tick))
+            if SNAPSHOT_PATH:
+                _simulator_tasks.append(scheduler.every(SNAPSHOT_INTERVAL, snapshotter.request))
+    scheduler.start()
+
+
+# ---------------------------------------------------------------------
+# 16. TÖBBFELBONTÁSÚ TELJESÍTMÉNY IDŐSOR (ROLLUPOK)
+# ---------------------------------------------------------------------
+
+class RollupLevel:
+    """
+    Egy felbontási szint: fix méretű bucket-gyűrű (min, max, összeg, darab).
+    A slot a bucket sorszámát is tárolja, így a lejárt bucketek
+    maguktól felülíródnak; a megőrzés = méret × felbontás.
+    """
+
+    __slots__ = ("resolution", "size", "_bucket", "_min", "_max", "_sum", "_count")
+
+    def __init__(self, resolution: float, retention: float):
+        self.resolution = resolution
+        self.size = max(1, int(retention // resolution))
+        self._bucket = array("q", [-1]) * self.size
+        self._min = array("d", [0.0]) * self.size
+        self._max = array("d", [0.0]) * self.size
+        self._sum = array("d", [0.0]) * self.size
+        self._count = array("I", [0]) * self.size
+
+    @property
+    def retention(self) -> float:
+        return self.size * self.resolution
+
+    def add(self, ts: float, v: float):
+        b = int(ts // self.resolution)
+        i = b % self.size
+        if self._bucket[i] != b:
+            self._bucket[i] = b
+            self._min[i] = self._max[i] = self._sum[i] = v
+            self._count[i] = 1
+            return
+        if v < self._min[i]:
+            self._min[i] = v
+        if v > self._max[i]:
+            self._max[i] = v
+        self._sum[i] += v
+        self._count[i] += 1
+
+    def query(self, since: float, until: float) -> list[tuple[float, float, float, float, int]]:
+        """(bucket kezdete, min, max, átlag, darab) a kitöltött bucketekre, időrendben."""
+        first = int(since // self.resolution)
+        last = int(until // self.resolution)
+        first = max(first, last - self.size + 1)
+        out = []
+        for b in range(first, last + 1):
+            i = b % self.size
+            if self._bucket[i] == b:
+                c = self._count[i]
+                out.append((b * self.resolution, self._min[i], self._max[i], self._sum[i] / c, c))
+        return out
+
+
+class PowerSeries:
+    """
+    Teljesítmény idősor: minden minta bekerül a nyers gyűrűbe és minden
+    rollup szintre (O(szintek száma)). A lekérdezés azt a legfinomabb
+    szintet olvassa, amelyből legfeljebb `max_points` pont jön ki, így a
+    költség a kirajzolt pontokkal arányos, nem a beérkezett mintákkal.
+    """
+
+    # (felbontás mp, megőrzés mp): 1 s / 1 óra, 1 perc / 2 nap, 1 óra / 62 nap
+    DEFAULT_LEVELS = ((1, 3600), (60, 2 * 86400), (3600, 62 * 86400))
+    LEVEL_COLUMNS = ("_bucket", "_min", "_max", "_sum", "_count")
+
+    def __init__(self, raw_capacity: int = 100_000, levels=DEFAULT_LEVELS):
+        self.raw_capacity = raw_capacity
+        self._raw_ts = array("d", [0.0]) * raw_capacity
+        self._raw_v = array("d", [0.0]) * raw_capacity
+        self._raw_count = 0
+        self.levels = [RollupLevel(res, ret) for res, ret in levels]
+        self._lock = threading.Lock()
+
+    def ingest(self, ts: float, v: float):
+        with self._lock:
+            i = self._raw_count % self.raw_capacity
+            self._raw_ts[i] = ts
+            self._raw_v[i] = v
+            self._raw_count += 1
+            for level in self.levels:
+                level.add(ts, v)
+
+    def raw(self, n: int) -> list[tuple[float, float]]:
+        """Az utolsó n nyers minta (ts, érték), időrendben."""
+        with self._lock:
+            n = min(n, self._raw_count, self.raw_capacity)
+            return [
+                (self._raw_ts[s % self.raw_capacity], self._raw_v[s % self.raw_capacity])
+                for s in range(self._raw_count - n, self._raw_count)
+            ]
+
+    def scan(self, since: float | None = None, until: float | None = None, chunk: int = 4096):
+        """
+        A még meglévő nyers minták (ts, érték) időrendben, darabonként
+        zárolva (a betöltés közben sem áll meg). Ami olvasás közben
+        kifordul a gyűrűből, az kimarad.
+        """
+        seq = None
+        while True:
+            with self._lock:
+                oldest = max(0, self._raw_count - self.raw_capacity)
+                seq = oldest if seq is None else max(seq, oldest)
+                end = min(self._raw_count, seq + chunk)
+                batch = [
+                    (self._raw_ts[s % self.raw_capacity], self._raw_v[s % self.raw_capacity])
+                    for s in range(seq, end)
+                ]
+            seq = end
+            for ts, v in batch:
+                if (since is None or ts >= since) and (until is None or ts <= until):
+                    yield ts, v
+            if len(batch) < chunk:
+                return
+
+    def state(self) -> dict:
+        """Nyers gyűrű + rollup szintek másolata pillanatképhez."""
+        with self._lock:
+            state = {
+                "raw_capacity": self.raw_capacity,
+                "count": self._raw_count,
+                "levels": [[level.resolution, level.size] for level in self.levels],
+                "raw_ts": self._raw_ts[:],
+                "raw_v": self._raw_v[:],
+            }
+            for i, level in enumerate(self.levels):
+                for name in self.LEVEL_COLUMNS:
+                    state[f"level{i}{name}"] = getattr(level, name)[:]
+            return state
+
+    def restore(self, state: dict):
+        """state() visszatöltése; eltérő méretezésnél a nyers minták újra bekerülnek."""
+        levels = [[level.resolution, level.size] for level in self.levels]
+        if state["raw_capacity"] == self.raw_capacity and state["levels"] == levels:
+            columns = [[state[f"level{i}{name}"] for name in self.LEVEL_COLUMNS] for i in range(len(levels))]
+            raw_ts, raw_v, count = state["raw_ts"], state["raw_v"], state["count"]
+            with self._lock:
+                self._raw_ts, self._raw_v, self._raw_count = raw_ts, raw_v, count
+                for level, arrays in zip(self.levels, columns):
+                    for name, arr in zip(self.LEVEL_COLUMNS, arrays):
+                        setattr(level, name, arr)
+            return
+        count, capacity = state["count"], state["raw_capacity"]
+        for s in range(max(0, count - capacity), count):
+            self.ingest(state["raw_ts"][s % capacity], state["raw_v"][s % capacity])
+
+    def level_for(self, span: float, max_points: int) -> RollupLevel:
+        for level in self.levels:
+            if span / level.resolution <= max_points and span <= level.retention:
+                return level
+        return self.levels[-1]
+
+    def query(self, since: float, until: float | None = None, max_points: int = 1500):
+        """Rollup bucketek a [since, until] tartományra a megfelelő szintről."""
+        until = time.time() if until is None else until
+        level = self.level_for(until - since, max_points)
+        with self._lock:
+            return level.query(since, until)
+
+
+power_series = PowerSeries()
+_restore("power", power_series.restore)
+
+# Energia (kWh): a felvétel-változásokból integrálva, eszköz / típus / ház szinten
+energy_ledger = _restore("energy", EnergyLedger.from_state) or EnergyLedger()
+energy_ledger.compact()
+energy_ledger.sync(power_accounting.draws())
+power_accounting.on_draw = energy_ledger.record
+del _snapshot, _restored_registry
+
+# Háttér pillanatkép: csak a megváltozott szekciók gyűlnek újra (token alapján)
+snapshotter = state_snapshot.Snapshotter(SNAPSHOT_PATH)
+snapshotter.register("registry", lambda: devices.seq, devices.state)
+snapshotter.register("events", lambda: event_log._count, event_log.state)
+snapshotter.register("power", lambda: power_series._raw_count, power_series.state)
+snapshotter.register("energy", lambda: energy_ledger.changes, energy_ledger.state)
+
+
+def rebuild_energy(since: float | None = None) -> int:
+    """
+    Az energia főkönyv újraépítése az eseménytárból (a registryben ismert
+    eszközök állapotváltozásaiból), majd az élő felvételhez igazítása.
+    A felhasznált események számát adja vissza.
+    """
+    snap = devices.snapshot()
+    keys, types, index = [], [], {}
+    ts, key_index, draw_mw = array("d"), array("q"), array("q")
+    # (eszköz, szöveg) -> (eszköz index, mW) vagy None; a szövegek nagyon ismétlődők
+    cache: dict[tuple[str, str], tuple[int, int] | None] = {}
+    for t, device_id, _, details in event_store.scan(since=since, chunk=50_000):
+        hit = cache.get((device_id, details), False)
+        if hit is False:
+            hit = None
+            dev = snap.get(device_id)
+            value = parse_value(dev["type"], details) if dev is not None else None
+            if value is not None:
+                if device_id not in index:
+                    index[device_id] = len(keys)
+                    keys.append(device_id)
+                    types.append(dev["type"])
+                hit = index[device_id], round(power_draw(dev["type"], dev["power_w"], value) * 1000)
+            cache[device_id, details] = hit
+        if hit is not None:
+            ts.append(t)
+            key_index.append(hit[0])
+            draw_mw.append(hit[1])
+    energy_ledger.load_history(ts, key_index, draw_mw, keys, types)
+    energy_ledger.sync(power_accounting.draws())
+    return len(ts)
+
+
+# ---------------------------------------------------------------------
+# 12. VEKTORIZÁLT FLOTTA SZIMULÁTOR (NUMPY)
+# ---------------------------------------------------------------------
+
+# Terheléses teszthez: ennyi termosztát + ventilátor fut a flottában (0 = ki).
+FLEET_SIZE = int(os.environ.get("SMARTHOME_FLEET_SIZE", "0"))
+# Lépésenként ennyi egyedi flotta-változás kerül a naplóba (a többi csak összesítve)
+FLEET_LOG_SAMPLE = int(os.environ.get("SMARTHOME_FLEET_LOG_SAMPLE", "32"))
+# A flotta eszközeinek névleges teljesítménye (W), mint az alapértelmezett eszközöké
+FLEET_POWER_W = {"thermo": 120.0, "fan": 50.0}
+
+
+class FleetSimulator:
+    """
+    Nagy flották szimulációja: a hőmérsékletek, sebességek és állapotok
+    NumPy tömbökben vannak, egy lépés az egész flottát egyszerre lépteti
+    ugyanazokkal a korlátokkal, mint simulate_device_changes
+    (16–30 °C, sebesség 0–3).
+
+    A flotta oszlopos marad: nem kerül a DeviceRegistrybe, a naplóba
+    lépésenként típusonként egy összesítő és egy kis minta megy, a
+    fogyasztása típusonként egy összesített tétel a PowerAccountingban.
+    """
+
+    def __init__(self, thermostats: int, fans: int, seed: int | None = None, prefix: str = "fleet",
+                 sample: int = FLEET_LOG_SAMPLE, accounting: PowerAccounting | None = None):
+        global np
+        if np is None:
+            try:
+                import numpy as np
+            except ImportError:
+                raise ImportError("FleetSimulator requires numpy (pip install numpy)") from None
+        self.prefix = prefix
+        self.sample = sample
+        self.accounting = accounting
+        self.rng = np.random.default_rng(seed)
+        self.temps = np.full(thermostats, 22.0, dtype=np.float32)
+        self.speeds = np.zeros(fans, dtype=np.int8)
+        self.states = np.zeros(fans, dtype=bool)   # ventilátor jár-e
+
+    def __len__(self) -> int:
+        return len(self.temps) + len(self.speeds)
+
+    def step(self) -> tuple["np.ndarray", "np.ndarray"]:
+        """Egy vektorizált lépés; a megváltozott termosztátok és ventilátorok indexei."""
+        # random.choice([-0.5, 0.0, 0.5]) ill. [-1, 0, 1] megfelelője
+        new_temps = self.temps + self.rng.integers(-1, 2, len(self.temps), dtype=np.int8) * np.float32(0.5)
+        np.clip(new_temps, 16.0, 30.0, out=new_temps)
+        changed_t = np.flatnonzero(new_temps != self.temps)
+        self.temps = new_temps
+
+        new_speeds = self.speeds + self.rng.integers(-1, 2, len(self.speeds), dtype=np.int8)
+        np.clip(new_speeds, 0, 3, out=new_speeds)
+        changed_f = np.flatnonzero(new_speeds != self.speeds)
+        self.speeds = new_speeds
+        self.states = new_speeds > 0
+
+        return changed_t, changed_f
+
+    def _sample(self, changed) -> list[int]:
+        if len(changed) > self.sample:
+            changed = np.unique(self.rng.choice(changed, self.sample))
+        return changed.tolist()
+
+    def events(self, changed_t, changed_f) -> list[tuple[str, str, str]]:
+        """
+        A lépés naplózandó eseményei add_log formátumban: típusonként egy
+        összesítő, plusz legfeljebb `sample` véletlen egyedi változás
+        (ugyanazokkal a szövegekkel). Soronként csak a minta formázódik.
+        """
+        p = self.prefix
+        events = []
+        if len(changed_t):
+            events.append((f"{p}-thermo", "Fleet Step",
+                           f"{len(changed_t)} thermostats changed, mean {float(self.temps.mean()):.2f} °C"))
+        if len(changed_f):
+            events.append((f"{p}-fan", "Fleet Step",
+                           f"{len(changed_f)} fans changed, {int(np.count_nonzero(self.states))} running"))
+        temps, speeds = self.temps, self.speeds
+        events += [(f"{p}-thermo{i}", "Auto Change", f"Temp changed to {temps[i]:.1f} °C")
+                   for i in self._sample(changed_t)]
+        events += [(f"{p}-fan{i}", "Auto Change", f"Speed changed to {speeds[i]}")
+                   for i in self._sample(changed_f)]
+        return events
+
+    def draws_mw(self) -> tuple[int, int]:
+        """A termosztátok és a ventilátorok összes felvétele (mW), a power_draw modelljével."""
+        load = np.clip((self.temps - HEATING_BASE_C) / HEATING_SPAN_C, 0.0, 1.0)
+        thermo = FLEET_POWER_W["thermo"] * float(load.sum(dtype=np.float64))
+        speeds = np.minimum(self.speeds, FAN_MAX_SPEED)
+        fan = FLEET_POWER_W["fan"] * int(speeds.sum(dtype=np.int64)) / FAN_MAX_SPEED
+        return round(thermo * 1000), round(fan * 1000)
+
+    def tick(self):
+        """Ütemezőből hívható: lép, naplózza a lépést, és átvezeti a flotta fogyasztását."""
+        add_log_many(self.events(*self.step()))
+        if self.accounting is not None:
+            thermo_mw, fan_mw = self.draws_mw()
+            self.accounting.set_draw(f"{self.prefix}-thermo", "thermo", thermo_mw)
+            self.accounting.set_draw(f"{self.prefix}-fan", "fan", fan_mw)
+
+
+# Ezek az akciók "beállítás" jellegűek: egy futamukból elég az utolsó.
+SETPOINT_ACTIONS = ("Set temperature", "Set speed")
+COMPACTION_INTERVAL = 60.0
+# Az energia főkönyv régi pontjainak ritkítása (a legfinomabb szint óránkénti)
+ENERGY_COMPACTION_INTERVAL = 3600.0
+_compaction_lock = threading.Lock()
+
+
+def compact_setpoint_log():
+    """
+    Periodikus task: a friss beállítás-futamok összevonása a tartós
+    naplóban. Saját szálon fut (az ütemező nem vár rá), egyszerre egy;
+    a tár vízjele miatt csak az előző futás óta jött sorokat járja be.
+    """
+    if _compaction_lock.acquire(blocking=False):
+        threading.Thread(target=_compact_setpoint_log, daemon=True).start()
+
+
+def _compact_setpoint_log():
+    try:
+        event_store.compact_runs(SETPOINT_ACTIONS)
+    except Exception as ex:
+        print(f"Compaction error: {ex!r}")
+    finally:
+        _compaction_lock.release()
+
+
+def stop_simulator():
+    """Tiszta leállítás: az ütemező szála kilép, a függő események és az állapot kiíródnak."""
+    scheduler.stop()
+    event_store.flush()
+    if SNAPSHOT_PATH:
+        snapshotter.write()
+
+
+# ---------------------------------------------------------------------
+# KÖZÖS SEGÉDFÜGGVÉNYEK (LOG, IDŐ, STB.)
+# ---------------------------------------------------------------------
+
+def add_log(device_id: str, action: str, details: str = "", ts: float | None = None):
+    """Hozzáad egy eseményt a globális eseménynaplóhoz (ts: pl. virtuális óra ideje)."""
+    ns = time.monotonic_ns() if ts is None else event_log.monotonic_ns(ts)
+    event_log.append(ns, device_id, action, details)
+    event_store.append(device_id, action, details, event_log.wall_time(ns))
+    if metrics.ENABLED:
+        metrics.inc("events_total", device=device_id)
+
+
+def add_log_many(events, ts: float | None = None):
+    """(device_id, action, details) események kötegelt naplózása."""
+    events = list(events)
+    ns = time.monotonic_ns() if ts is None else event_log.monotonic_ns(ts)
+    event_log.extend(ns, events)
+    ts = event_log.wall_time(ns)
+    event_store.append_many([(ts, device_id, action, details) for device_id, action, details in events])
+    if metrics.ENABLED:
+        for device_id, _, _ in events:
+            metrics.inc("events_total", device=device_id)
+
+
+def export_history(fmt: str = "csv.gz") -> tuple[str, int, str, int]:
+    """
+    A teljes eseménynapló és a nyers teljesítmény minták exportja az
+    EXPORT_DIR-be (streamelve, a futó app mellett). (fájl, sorok) párok.
+    """
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    events_path = os.path.join(EXPORT_DIR, f"events-{stamp}.{fmt}")
+    power_path = os.path.join(EXPORT_DIR, f"power-{stamp}.{fmt}")
+    n_events = event_archive.export_events(event_store, events_path)
+    n_power = event_archive.export_power(power_series, power_path)
+    return events_path, n_events, power_path, n_power
+
+
+def recent_events(device_id: str, n: int = 10) -> list[dict]:
+    """
+    Egy eszköz utolsó n eseménye megjelenítésre kész alakban, a legújabb
+    elöl: a gyűrűből, és csak ha abból már kiestek, a tartós tárból.
+    """
+    rows, complete = event_log.last_for(device_id, n)
+    if complete:
+        return rows
+    return list(map(format_event, event_store.query(device_id=device_id, limit=n)))
+
+
+def format_event(row: dict) -> dict:
+    """Az eseménytár egy sorát a táblázatok által várt alakra hozza."""
+    dev = devices.get(row["device_id"])
+    return {
+        "time": format_second(int(row["ts"])),
+        "device_id": row["device_id"],
+        "device_name": dev["name"] if dev else row["device_id"],
+        "action": row["action"],
+        "details": row["details"],
+    }
+
+
+# ---------------------------------------------------------------------
+# HEADLESS FUTTATÁS
+# ---------------------------------------------------------------------
+
+def run_headless():
+    """Szimulátorok, naplózás és pub/sub page nélkül, megszakításig."""
+    if metrics.ENABLED:
+        metrics.start_server(int(os.environ.get("SMARTHOME_METRICS_PORT", "9108")))
+    start_simulator()
+    print(f"Smart home engine running with {len(devices)} devices (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_simulator()
+
+
+if __name__ == "__main__":
+    run_headless()
@@ -0,0 +1,172 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+
+# ---------------------------------------------------------------------
+# MEMÓRIÁBA LEKÉPEZHETŐ ÁLLAPOT PILLANATKÉP
+# ---------------------------------------------------------------------
+
+# Fájl: MAGIC + fejléc hossz | JSON fejléc | szekciók bináris adatai.
+# Szekciónként a skalár / szöveglista mezők a fejlécbe kerülnek, a tömbök
+# (array, bytes) 8 bájtra igazítva a szekció adatblokkjába; a blokk
+# CRC32-vel ellenőrzött. Betöltéskor a fájl mmap-pel nyílik, a tömbök
+# egyetlen memóriamásolással jönnek létre belőle.
+MAGIC = b"SHSNAP\x00\x01"
+FORMAT_VERSION = 1
+_PREFIX = struct.Struct("<8sI")
+
+
+def encode_section(state: dict) -> tuple[dict, bytes]:
+    """Egy szekció állapota -> (fejléc leírás, adatblokk)."""
+    fields, blobs, parts, offset = {}, {}, [], 0
+    for key, value in state.items():
+        if isinstance(value, array):
+            typecode, data = value.typecode, value.tobytes()
+        elif isinstance(value, (bytes, bytearray)):
+            typecode, data = "", bytes(value)
+        else:
+            fields[key] = value
+            continue
+        pad = -len(data) % 8
+        blobs[key] = [typecode, offset, len(data)]
+        parts.append(data)
+        parts.append(b"\0" * pad)
+        offset += len(data) + pad
+    payload = b"".join(parts)
+    return {"fields": fields, "blobs": blobs, "size": len(payload), "crc": zlib.crc32(payload)}, payload
+
+
+def write(path: str, sections: dict[str, tuple[dict, bytes]]):
+    """
+    Kódolt szekciók kiírása. Ideiglenes fájlba ír, fsync után nevezi át,
+    így az olvasó mindig vagy a régi, vagy az új teljes pillanatképet látja.
+    """
+    layout, offset = {}, 0
+    for name, (meta, payload) in sections.items():
+        layout[name] = dict(meta, offset=offset)
+        offset += len(payload)
+    header = json.dumps(
+        {"version": FORMAT_VERSION, "created": time.time(), "sections": layout},
+        ensure_ascii=False,
+    ).encode("utf-8")
+    header += b" " * (-(_PREFIX.size + len(header)) % 8)
+
+    tmp = f"{path}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(_PREFIX.pack(MAGIC, len(header)))
+            f.write(header)
+            for _, payload in sections.values():
+                f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def read(path: str) -> dict[str, dict]:
+    """
+    A pillanatkép szekciói ({név: állapot}); a tömbök array / bytes
+    másolatok, a leképezés a visszatéréskor bezárul. Hiányzó vagy
+    sérült fájl esetén üres dict; hibás CRC-jű szekció kimarad.
+    """
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, n = _PREFIX.unpack_from(mm, 0)
+            if magic != MAGIC:
+                raise ValueError("not a state snapshot")
+            header = json.loads(mm[_PREFIX.size:_PREFIX.size + n])
+            if header.get("version") != FORMAT_VERSION:
+                raise ValueError(f"unsupported snapshot version {header.get('version')}")
+            base = _PREFIX.size + n
+            out = {}
+            with memoryview(mm) as view:
+                for name, meta in header["sections"].items():
+                    start = base + meta["offset"]
+                    with view[start:start + meta["size"]] as payload:
+                        if len(payload) != meta["size"] or zlib.crc32(payload) != meta["crc"]:
+                            print(f"Snapshot section {name!r} is corrupt, skipped")
+                            continue
+                        state = dict(meta["fields"])
+                        for key, (typecode, off, size) in meta["blobs"].items():
+                            if typecode:
+                                state[key] = array(typecode)
+                                state[key].frombytes(payload[off:off + size])
+                            else:
+                                state[key] = bytes(payload[off:off + size])
+                    out[name] = state
+            return out
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError, KeyError, TypeError, struct.error) as ex:
+        print(f"Snapshot {path} ignored: {ex!r}")
+        return {}
+
+
+class Snapshotter:
+    """
+    Periodikus háttér pillanatkép. Forrásonként egy olcsó változás-jelző
+    (token) és egy állapotgyűjtő függvény; íráskor csak a megváltozott
+    tokenű szekciók gyűlnek és kódolódnak újra, a többi a legutóbbi
+    kódolt alakjában kerül a fájlba. Ha semmi sem változott, nincs írás.
+
+    A request() csak jelez: a gyűjtés és az írás saját szálon fut, így
+    az ütemező (szimulátorok) és a handlerek nem várnak a lemezre.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._sources: dict[str, tuple] = {}
+        self._encoded: dict[str, tuple] = {}
+        self._lock = threading.Lock()   # egyszerre egy írás
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.writes = 0
+        self.last_write_s = 0.0
+
+    def register(self, name: str, token, capture):
+        """token() -> összehasonlítható változásjelző; capture() -> a szekció állapota."""
+        self._sources[name] = (token, capture)
+
+    def write(self) -> bool:
+        """Szinkron pillanatkép; True, ha íródott fájl."""
+        with self._lock:
+            t0 = time.perf_counter()
+            changed = False
+            for name, (token, capture) in self._sources.items():
+                t = token()
+                cached = self._encoded.get(name)
+                if cached is None or cached[0] != t:
+                    # A token a gyűjtés előtt olvasódik: a közben jött változás a következő körben íródik ki
+                    self._encoded[name] = (t, encode_section(capture()))
+                    changed = True
+            if not changed:
+                return False
+            write(self.path, {name: enc for name, (_, enc) in self._encoded.items()})
+            self.writes += 1
+            self.last_write_s = time.perf_counter() - t0
+            return True
+
+    def request(self):
+        """Háttér pillanatkép kérése (ütemezőből hívható, azonnal visszatér)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self.write()
+            except Exception as ex:
+                print(f"Snapshot error: {ex!r}")
@@ -0,0 +1,13 @@
+"""
+A motor modulszinten nyitja meg az eseménytárat és olvassa a
+pillanatképet: a teszteknél mindkettő egy ideiglenes könyvtárba kerül
+(a munkakönyvtárban lévő valódi napló / pillanatkép érintetlen marad).
+"""
+
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="smarthome-tests-")
+os.environ["SMARTHOME_DB"] = os.path.join(_tmp, "events.db")
+os.environ["SMARTHOME_SNAPSHOT"] = ""
+os.environ["SMARTHOME_EXPORT_DIR"] = os.path.join(_tmp, "exports")
@@ -0,0 +1,53 @@
+"""
+PackedStrings / PackedKeys: a szövegek pontosan visszaállnak, a keresés
+sűrű, ritka és sorszám nélküli kulcsokra is működik.
+
+    python -m pytest -q tests
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from compact_keys import PackedKeys, PackedStrings  # noqa: E402
+
+TRICKY = [
+    "light1", "Living Room Light", "x01", "007", "0", "", "fleet-thermo0",
+    "a" + "9" * 25, "multi\nline 5", "fan1", "fleet-thermo123456789",
+]
+
+
+def test_strings_round_trip():
+    packed = PackedStrings(TRICKY)
+    assert list(packed) == TRICKY
+    assert packed[1:4] == TRICKY[1:4]
+    assert len(packed) == len(TRICKY)
+
+
+def test_keys_lookup_dense_sparse_and_plain():
+    keys = PackedKeys(TRICKY)
+    for i, key in enumerate(TRICKY):
+        assert keys.get(key) == i
+        assert keys.position(key) == i
+    assert "light2" not in keys
+    assert keys.get("x1") is None
+    with pytest.raises(KeyError):
+        keys.position("fleet-thermo1")
+
+
+def test_generated_fleet_uses_dense_slots():
+    keys = PackedKeys(f"fleet-fan{i}" for i in range(10_000))
+    assert not keys._other
+    assert keys.get("fleet-fan9999") == 9999
+    assert keys.get("fleet-fan10000") is None
+
+
+def test_key_is_found_only_after_register():
+    keys = PackedKeys()
+    i = keys.append("door7")
+    assert "door7" not in keys
+    keys.register(i)
+    assert keys.position("door7") == i
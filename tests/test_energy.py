@@ -0,0 +1,92 @@
+"""
+EnergyLedger.compact: a ritkított sorozat egy időpontig felhasznált
+energiája legfeljebb egy (ritkított) időrésnyi felvétellel tér el a
+ritkítatlantól, a réshatárokon pedig pontos; a megőrzési időn túli
+pontok elmaradnak.
+
+    python -m pytest -q tests
+"""
+
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from energy import EnergyLedger, MWS_PER_KWH  # noqa: E402
+
+DAY = 86400.0
+NOW = 1_700_000_000.0 // DAY * DAY
+SPAN = 40 * DAY
+MAX_MW = 2_000_000
+DEVICES = (("light1", "light"), ("thermo1", "thermo"), ("fan1", "fan"))
+
+
+def _ledgers(**kwargs):
+    """Két azonos főkönyv ugyanabból a véletlen változássorból; az elsőt ritkítjuk."""
+    rng = random.Random(7)
+    compacted, reference = EnergyLedger(clock=lambda: NOW, **kwargs), EnergyLedger(clock=lambda: NOW)
+    t = NOW - SPAN
+    while t < NOW:
+        key, dev_type = rng.choice(DEVICES)
+        mw = rng.randrange(MAX_MW + 1)
+        compacted.record(key, dev_type, mw, ts=t)
+        reference.record(key, dev_type, mw, ts=t)
+        t += rng.uniform(30.0, 600.0)
+    return compacted, reference
+
+
+def _sample_times(rng, start, end, n=500):
+    return [rng.uniform(start, end) for _ in range(n)]
+
+
+def test_coarsen_within_one_slot():
+    ledger, reference = _ledgers()
+    before = len(ledger.home.ts)
+    ledger.compact(NOW)
+    assert len(ledger.home.ts) < before / 4
+
+    rng = random.Random(1)
+    home_max = MAX_MW * len(DEVICES)
+    # Szintenként: (a sáv eleje, vége, a sáv felbontása)
+    bands = [(NOW - SPAN, NOW - 35 * DAY, DAY), (NOW - 35 * DAY, NOW - 2 * DAY, 3600.0),
+             (NOW - 2 * DAY, NOW, ledger.resolution)]
+    for start, end, res in bands:
+        for t in _sample_times(rng, start, end):
+            assert abs(ledger.home.energy_at(t) - reference.home.energy_at(t)) <= home_max * res
+        for key, _ in DEVICES:
+            for t in _sample_times(rng, start, end, 50):
+                got = ledger.energy_kwh(t, NOW, device_id=key)
+                want = reference.energy_kwh(t, NOW, device_id=key)
+                assert abs(got - want) * MWS_PER_KWH <= MAX_MW * res
+
+
+def test_coarsen_exact_on_slot_bounds():
+    ledger, reference = _ledgers()
+    ledger.compact(NOW)
+    for k in range(1, 30):
+        t = NOW - SPAN + k * DAY
+        assert ledger.home.energy_at(t) == pytest.approx(reference.home.energy_at(t), rel=1e-9)
+
+
+def test_compact_is_incremental_and_stable():
+    ledger, reference = _ledgers()
+    ledger.compact(NOW - DAY)
+    ledger.compact(NOW)
+    once, _ = _ledgers()
+    once.compact(NOW)
+    assert list(ledger.home.ts) == list(once.home.ts)
+    assert list(ledger.home.cum) == pytest.approx(list(once.home.cum), rel=1e-9)
+    assert ledger.home.energy_at(NOW) == pytest.approx(reference.home.energy_at(NOW), rel=1e-9)
+
+
+def test_trim_past_retention():
+    ledger, reference = _ledgers(retention=10 * DAY)
+    ledger.compact(NOW)
+    cutoff = NOW - 10 * DAY
+    assert ledger.home.ts[0] <= cutoff < ledger.home.ts[1]
+    # A levágott múlt nem számít, az ablakon belüli tartomány változatlan
+    assert ledger.energy_kwh(NOW - SPAN, cutoff - DAY) == 0.0
+    assert ledger.energy_kwh(cutoff + DAY, NOW) == pytest.approx(reference.energy_kwh(cutoff + DAY, NOW), rel=1e-9)
@@ -0,0 +1,82 @@
+"""
+event_archive: az írás + visszaolvasás minden szöveges formátumban
+veszteségmentes (időbélyegek bitre, szabad szövegek sortöréssel,
+idézőjellel, ékezettel együtt), az EventStore-on át is.
+
+    python -m pytest -q tests
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import event_archive  # noqa: E402
+from event_archive import EVENT_FIELDS, POWER_FIELDS  # noqa: E402
+from event_store import EventStore  # noqa: E402
+
+FORMATS = ["events.csv", "events.jsonl", "events.csv.gz", "events.jsonl.gz"]
+
+ROWS = [
+    (1_700_000_000.123456789, "light1", "Toggle", "ON"),
+    (1_700_000_000.1234568, "thermo1", "Temp Change", "New setpoint: 22.5 °C"),
+    (0.1 + 0.2, "fan1", "Speed", ""),
+    (1e-7, "door1", "Lock", 'quoted "value", with comma'),
+    (2.5e9, "fleet-thermo123", "Note", "multi\nline\r\ntext\ttab"),
+    (1_700_000_001.0, "ajtó-ő", "Művelet", "árvíztűrő tükörfúrógép 🔒"),
+    (1_700_000_002.0, " padded ", " x ", "  leading and trailing  "),
+    (1_700_000_003.0, "null", "None", "null"),
+]
+
+
+@pytest.mark.parametrize("name", FORMATS)
+def test_write_read_round_trip(tmp_path, name):
+    path = str(tmp_path / name)
+    assert event_archive.write(ROWS, path, EVENT_FIELDS, chunk=3) == len(ROWS)
+    back = list(event_archive.read(path, EVENT_FIELDS, chunk=3))
+    assert back == ROWS
+    assert [type(v) for v in back[0]] == [float, str, str, str]
+
+
+@pytest.mark.parametrize("name", FORMATS)
+def test_power_round_trip(tmp_path, name):
+    rows = [(1_700_000_000.0 + i / 3, i * 0.1 - 5.0) for i in range(1000)]
+    path = str(tmp_path / name.replace("events", "power"))
+    event_archive.write(rows, path, POWER_FIELDS, chunk=64)
+    assert list(event_archive.read(path, POWER_FIELDS)) == rows
+
+
+def test_parquet_round_trip(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "events.parquet")
+    event_archive.write(ROWS, path, EVENT_FIELDS, chunk=3)
+    assert list(event_archive.read(path, EVENT_FIELDS, chunk=3)) == ROWS
+
+
+@pytest.mark.parametrize("name", FORMATS)
+def test_store_export_import(tmp_path, name):
+    source = EventStore(str(tmp_path / "source.db"))
+    target = EventStore(str(tmp_path / "target.db"))
+    try:
+        source.append_many(ROWS)
+        path = str(tmp_path / name)
+        assert event_archive.export_events(source, path, chunk=3) == len(ROWS)
+        assert event_archive.import_events(target, path, chunk=3) == len(ROWS)
+        assert list(target.scan()) == list(source.scan()) == sorted(ROWS)
+    finally:
+        source.close()
+        target.close()
+
+
+def test_failed_write_leaves_no_file(tmp_path):
+    path = tmp_path / "events.csv"
+
+    def rows():
+        yield ROWS[0]
+        raise RuntimeError("interrupted")
+
+    with pytest.raises(RuntimeError):
+        event_archive.write(rows(), str(path), EVENT_FIELDS, chunk=1)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,112 @@
+"""
+EventStore: a before / after kurzoros lapok diszjunktak és rendezettek, a
+compact_runs futamonként az utolsó sort tartja meg, és a vízjel alá nem
+néz vissza.
+
+    python -m pytest -q tests
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from event_store import EventStore  # noqa: E402
+
+PAGE = 7
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = EventStore(str(tmp_path / "events.db"))
+    yield s
+    s.close()
+
+
+def _key(row):
+    return row["ts"], row["id"]
+
+
+def _fill(store, n=100):
+    # Sok azonos időbélyeg: a lapozásnak az id-n kell továbblépnie
+    store.append_many((1000.0 + i // 4, f"dev{i % 3}", "Set", str(i)) for i in range(n))
+
+
+def test_paging_before_after_disjoint_and_ordered(store):
+    _fill(store)
+    newest_first = sorted(store.query(limit=1000), key=_key, reverse=True)
+
+    pages = [store.query(limit=PAGE)]
+    while len(pages[-1]) == PAGE:
+        pages.append(store.query(limit=PAGE, before=_key(pages[-1][-1])))
+    down = [r for p in pages for r in p]
+    assert [r["id"] for r in down] == [r["id"] for r in newest_first]
+    for p in pages:
+        assert p == sorted(p, key=_key, reverse=True)
+
+    # Visszafelé az `after` kurzorral ugyanazok a lapok jönnek, fordított sorrendben
+    up = [pages[-1]]
+    while True:
+        page = store.query(limit=PAGE, after=_key(up[-1][0]))
+        if not page:
+            break
+        assert page == sorted(page, key=_key, reverse=True)
+        assert _key(page[-1]) > _key(up[-1][0])
+        up.append(page)
+    assert [r["id"] for p in reversed(up) for r in p] == [r["id"] for r in newest_first]
+
+
+def test_paging_with_filter(store):
+    _fill(store)
+    expected = [r["id"] for r in store.query(device_id="dev1", limit=1000)]
+    seen, cursor = [], None
+    while page := store.query(device_id="dev1", limit=PAGE, before=cursor):
+        assert all(r["device_id"] == "dev1" for r in page)
+        seen.extend(r["id"] for r in page)
+        cursor = _key(page[-1])
+    assert seen == expected
+    assert len(set(seen)) == len(seen)
+
+
+def test_compact_runs_keeps_last_of_each_run(store):
+    store.append_many([
+        (10.0, "lamp", "Brightness", "10"),
+        (11.0, "lamp", "Brightness", "20"),
+        (12.0, "fan", "Speed", "1"),        # másik eszköz: nem szakítja meg a futamot
+        (13.0, "lamp", "Brightness", "30"),
+        (14.0, "lamp", "Toggle", "off"),    # más esemény: új futam kezdődik
+        (15.0, "lamp", "Brightness", "40"),
+        (30.0, "lamp", "Brightness", "50"),  # max_gap-en túl: külön futam
+    ])
+    deleted = store.compact_runs(["Brightness"], max_gap=5.0)
+    assert deleted == 2
+    rows = [(r[1], r[2], r[3]) for r in store.scan()]
+    assert rows == [
+        ("fan", "Speed", "1"),
+        ("lamp", "Brightness", "30"),
+        ("lamp", "Toggle", "off"),
+        ("lamp", "Brightness", "40"),
+        ("lamp", "Brightness", "50"),
+    ]
+
+
+def test_compact_runs_watermark(store):
+    store.append_many([(100.0 + i, "lamp", "Brightness", str(i)) for i in range(3)])
+    assert store.compact_runs(["Brightness"], max_gap=5.0) == 2
+
+    # A vízjel (102 - max_gap) alá utólag beírt futamhoz a következő futás
+    # nem nyúl, a határon átnyúló futamot viszont összevonja
+    store.append_many([
+        (12.0, "lamp", "Brightness", "a"),
+        (13.0, "lamp", "Brightness", "b"),
+        (103.0, "lamp", "Brightness", "3"),
+    ])
+    assert store.compact_runs(["Brightness"], max_gap=5.0) == 1
+    assert [r[3] for r in store.scan(device_id="lamp")] == ["a", "b", "3"]
+    assert store.compact_runs(["Brightness"], max_gap=5.0) == 0
+
+    # Kifejezett `since`-szel a teljes tár bejárható
+    assert store.compact_runs(["Brightness"], since=float("-inf"), max_gap=5.0) == 1
+    assert [r[3] for r in store.scan(device_id="lamp")] == ["b", "3"]
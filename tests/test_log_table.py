@@ -0,0 +1,101 @@
+"""
+LogTable: lefelé és visszafelé lapozva az ablak legfeljebb MAX_PAGES lap,
+a sorok folytonosak, ismétlés és kihagyás nélkül, az újabb elöl.
+
+    python -m pytest -q tests
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from render_scheduler import RenderScheduler  # noqa: E402
+
+
+class FakePage:
+    def update(self, *controls):
+        pass
+
+
+@pytest.fixture(scope="module")
+def app():
+    pytest.importorskip("flet")
+    spec = importlib.util.spec_from_file_location("smart_home_app", ROOT / "Coding Day Individual Task.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _table(app, device_id: str, n: int):
+    # Háromsoronként azonos időbélyeg: a kurzornak az id-n kell továbblépnie
+    app.event_store.append_many((1_700_000_000.0 + i // 3, device_id, "Set", str(i)) for i in range(n))
+    table = app.LogTable(RenderScheduler(FakePage()))
+    table.device_filter = device_id
+    table.reset()
+    return table
+
+
+def _window(table) -> list[int]:
+    return [int(row.controls[3].value) for row in table.list_view.controls]
+
+
+def _check(table, n: int):
+    rows = _window(table)
+    assert 0 < len(rows) <= table.MAX_PAGES * table.PAGE_SIZE
+    assert rows == list(range(rows[0], rows[0] - len(rows), -1))
+    assert 0 <= rows[-1] and rows[0] < n
+    return rows
+
+
+def test_scroll_down_then_up(app):
+    page_size, max_pages = app.LogTable.PAGE_SIZE, app.LogTable.MAX_PAGES
+    n = page_size * max_pages * 2 + 13
+    table = _table(app, "logtable-a", n)
+    assert _check(table, n)[0] == n - 1
+
+    seen = list(_window(table))
+    while True:
+        before = _window(table)
+        dropped = table.load_next_page()
+        if dropped < 0:
+            break
+        rows = _check(table, n)
+        assert rows[:len(before) - dropped] == before[dropped:]
+        seen.extend(rows[len(before) - dropped:])
+    assert seen == list(range(n - 1, -1, -1))
+    assert _window(table)[-1] == 0
+
+    while True:
+        before = _window(table)
+        added = table.load_previous_page()
+        if not added:
+            break
+        rows = _check(table, n)
+        assert rows[added:added + len(before)] == before[:len(rows) - added]
+    assert _window(table)[0] == n - 1
+
+
+def test_new_rows_appear_on_scroll_up(app):
+    page_size, max_pages = app.LogTable.PAGE_SIZE, app.LogTable.MAX_PAGES
+    n = page_size * (max_pages + 2)
+    table = _table(app, "logtable-b", n)
+    while table.load_next_page() >= 0:
+        pass
+    # Közben érkezett újabb sorok: felfelé lapozva sorban, hézag nélkül jönnek
+    app.event_store.append_many((1_700_100_000.0, "logtable-b", "Set", str(n + i)) for i in range(7))
+    while table.load_previous_page():
+        pass
+    rows = _check(table, n + 7)
+    assert rows[0] == n + 6
+
+
+def test_short_log_fits_one_page(app):
+    table = _table(app, "logtable-c", 5)
+    assert _window(table) == [4, 3, 2, 1, 0]
+    assert table.load_next_page() == -1
+    assert table.load_previous_page() == 0
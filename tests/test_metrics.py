@@ -0,0 +1,78 @@
+"""
+Histogram: párhuzamos observe() nem veszít mintát; a címke értékek
+escape-elése a Prometheus szöveges formátum szerint.
+
+    python -m pytest -q tests
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import metrics  # noqa: E402
+
+
+def test_concurrent_observations_are_not_lost():
+    h = metrics.Histogram()
+
+    def worker():
+        for _ in range(20_000):
+            h.observe(0.001)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    counts, total, count = h.snapshot()
+    assert count == sum(counts) == 160_000
+    assert abs(total - 160.0) < 1e-6
+
+
+def test_label_values_are_escaped():
+    assert metrics._labels([("path", 'C:\\a "b"\nc')]) == '{path="C:\\\\a \\"b\\"\\nc"}'
+
+
+def test_render_emits_one_type_line_per_family(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    monkeypatch.setattr(metrics, "_histograms", {})
+    monkeypatch.setattr(metrics, "_counters", {})
+    monkeypatch.setattr(metrics, "_gauges", {})
+    metrics.observe("route_build_seconds", 0.01, route="overview")
+    metrics.observe("route_build_seconds", 0.02, route="details")
+    metrics.inc("events_total", device="a")
+    metrics.inc("events_total", device="b")
+    metrics.gauge("queue_size", lambda: 3)
+    lines = metrics.render().splitlines()
+    types = [line for line in lines if line.startswith("# TYPE")]
+    assert types == [
+        "# TYPE route_build_seconds histogram",
+        "# TYPE events_total counter",
+        "# TYPE queue_size gauge",
+    ]
+    # A TYPE sor a család első mintája előtt áll
+    assert lines.index(types[0]) < lines.index(next(l for l in lines if l.startswith("route_build_seconds_bucket")))
+
+
+def test_profiling_from_several_threads_at_once():
+    metrics.start_profile()
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(200):
+                with metrics._profiled():
+                    sum(range(100))
+        except Exception as ex:
+            errors.append(ex)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    report = metrics.stop_profile()
+    assert not errors
+    assert "function calls" in report or report == "No profiled calls.\n"
@@ -0,0 +1,67 @@
+"""
+ChangeCoalescer: a húzás végi commit a cél aktuális értékéhez mér.
+
+    python -m pytest -q tests
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from render_scheduler import ChangeCoalescer  # noqa: E402
+
+
+def make(device: dict):
+    committed = []
+
+    def commit(value):
+        committed.append(value)
+        device["temp"] = value
+
+    # Hosszú settle: az időzítő nem fut le a teszt alatt, csak az end() commitol
+    return ChangeCoalescer(commit, settle=60, current=lambda: device["temp"]), committed
+
+
+def test_commits_once_per_drag():
+    device = {"temp": 20.0}
+    coalescer, committed = make(device)
+    for v in (20.5, 21.0, 22.0):
+        coalescer.change(v)
+    coalescer.end(22.0)
+    coalescer.end(22.0)
+    assert committed == [22.0]
+
+
+def test_drag_back_after_external_change_commits():
+    device = {"temp": 20.0}
+    coalescer, committed = make(device)
+    coalescer.change(22.0)
+    coalescer.end(22.0)
+
+    # Közben a szimulátor / másik munkamenet átírja az eszközt
+    device["temp"] = 23.5
+
+    coalescer.change(22.5)
+    coalescer.end(22.0)
+    assert committed == [22.0, 22.0]
+    assert device["temp"] == 22.0
+
+
+def test_no_commit_when_device_already_has_value():
+    device = {"temp": 21.0}
+    coalescer, committed = make(device)
+    coalescer.change(21.5)
+    coalescer.end(21.0)
+    assert committed == []
+
+
+def test_without_current_every_drag_end_commits():
+    committed = []
+    coalescer = ChangeCoalescer(committed.append, settle=60)
+    coalescer.change(1)
+    coalescer.end(1)
+    coalescer.change(1)
+    coalescer.end(1)
+    coalescer.end()
+    assert committed == [1, 1]
@@ -0,0 +1,126 @@
+"""
+Pillanatkép: a kiírt és visszaolvasott registry, eseménygyűrű és
+teljesítmény idősor azonos állapotot ad, a sérült szekció kimarad.
+
+    python -m pytest -q tests
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import state_snapshot  # noqa: E402
+from power_accounting import PowerAccounting  # noqa: E402
+from smart_home_engine import DeviceRegistry, EventRing, PowerSeries  # noqa: E402
+
+
+def _round_trip(tmp_path, **states):
+    path = str(tmp_path / "state.snap")
+    state_snapshot.write(path, {name: state_snapshot.encode_section(s) for name, s in states.items()})
+    return state_snapshot.read(path)
+
+
+def _registry():
+    reg = DeviceRegistry()
+    reg.add("light1", "Living Room Light", "light", power_w=60, room="Living Room")
+    reg.add("thermo1", "Thermostat", "thermo", power_w=120, value=22.0)
+    for i in range(200):
+        reg.add(f"fleet-fan{i}", f"Fan {i}", "fan", power_w=50, value=i % 4, room=f"Room {i % 7}")
+    accounting = PowerAccounting()
+    reg.attach_power(accounting)
+    reg.modify("light1", lambda _: True)
+    reg.modify("thermo1", lambda _: 25.5)
+    reg.modify("fleet-fan3", lambda _: 0)
+    return reg, accounting
+
+
+def _rows(reg):
+    fields = ("name", "type", "power_w", "room", "version", "state", "temp", "speed")
+    return [(k, [v.get(f) for f in fields]) for k, v in reg.items()]
+
+
+def test_registry_and_power_draw_restore_identically(tmp_path):
+    reg, accounting = _registry()
+    state = reg.state()
+    restored_state = _round_trip(tmp_path, registry=state)["registry"]
+    restored = DeviceRegistry.from_state(restored_state)
+    restored_accounting = PowerAccounting()
+    restored.attach_power(restored_accounting, restored_state["power_draw_mw"])
+
+    assert restored.state() == state
+    assert restored_accounting.draws() == accounting.draws()
+    assert restored_accounting.total_w == accounting.total_w
+    assert _rows(restored) == _rows(reg)
+    assert restored.version("thermo1") == reg.version("thermo1")
+    assert [k for k, _ in restored.of_type("thermo")] == ["thermo1"]
+    assert [k for k, _ in restored.in_room("Room 3")] == [k for k, _ in reg.in_room("Room 3")]
+
+    # A visszatöltött registry tovább írható, az elszámolás követi
+    restored.modify("fleet-fan3", lambda _: 3)
+    reg.modify("fleet-fan3", lambda _: 3)
+    assert restored_accounting.device_w("fleet-fan3") == accounting.device_w("fleet-fan3") > 0
+
+
+def _ring(capacity=64, events=150):
+    ring = EventRing(capacity)
+    ns = time.monotonic_ns()
+    for i in range(events):
+        ring.append(ns + i * 1_000_000, f"dev{i % 5}", "Toggle" if i % 3 else "Set", f"value {i % 11}")
+    return ring
+
+
+def _comparable(rows):
+    # A visszatöltés a mostani monoton órára tol: az időbélyeg ns-re kerekítve egyezik
+    return [{**r, "ts": round(r["ts"], 6)} for r in rows]
+
+
+def test_event_ring_restores_identically(tmp_path):
+    ring = _ring()
+    state = _round_trip(tmp_path, events=ring.state())["events"]
+
+    same = EventRing(ring.capacity)
+    same.restore(state)
+    assert len(same) == len(ring)
+    assert _comparable(same.last(len(ring))) == _comparable(ring.last(len(ring)))
+    for dev in ("dev0", "dev4", "missing"):
+        assert _comparable(same.last_for(dev, 20)[0]) == _comparable(ring.last_for(dev, 20)[0])
+        assert same.last_for(dev, 20)[1] == ring.last_for(dev, 20)[1]
+
+    # Eltérő kapacitásnál a megmaradt rekordok egyenként fűződnek be
+    smaller = EventRing(16)
+    smaller.restore(state)
+    assert _comparable(smaller.last(16)) == _comparable(ring.last(16))
+
+
+def test_power_series_restores_identically(tmp_path):
+    series = PowerSeries(raw_capacity=500, levels=((1, 60), (60, 3600)))
+    t0 = 1_700_000_000.0
+    for i in range(1200):
+        series.ingest(t0 + i * 0.5, float(i % 97))
+    state = series.state()
+    restored_state = _round_trip(tmp_path, power=state)["power"]
+
+    same = PowerSeries(raw_capacity=500, levels=((1, 60), (60, 3600)))
+    same.restore(restored_state)
+    assert same.state() == state
+    assert same.raw(500) == series.raw(500)
+    assert same.levels[1].query(t0, t0 + 600) == series.levels[1].query(t0, t0 + 600)
+
+
+def test_corrupt_section_is_skipped(tmp_path):
+    path = str(tmp_path / "state.snap")
+    reg_state = _registry()[0].state()
+    reg_meta, reg_payload = state_snapshot.encode_section(reg_state)
+    ring_meta, ring_payload = state_snapshot.encode_section(_ring().state())
+    state_snapshot.write(path, {"registry": (reg_meta, reg_payload), "events": (ring_meta, ring_payload)})
+
+    data = bytearray(Path(path).read_bytes())
+    data[-1] ^= 0xFF   # az utolsó szekció (events) adatblokkja
+    Path(path).write_bytes(data)
+
+    sections = state_snapshot.read(path)
+    assert "events" not in sections
+    assert sections["registry"] == reg_state
+    assert state_snapshot.read(str(tmp_path / "missing.snap")) == {}